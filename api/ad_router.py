@@ -3,41 +3,33 @@ Advertisement data API router.
 """
 
 import logging
-from typing import Dict, Optional
-from fastapi import APIRouter, Request, Header, HTTPException
+from typing import Dict
+from fastapi import APIRouter, Depends, Request, Response
+
+from auth.auth_context import AuthContext, get_auth_context
+from core.precomputed import PrecomputedJSON, PrecomputedJSONCache
 
 router = APIRouter(tags=["advertisement"])
 
+# Serialized advertisement documents by DID; only "created_by" differs between DIDs
+_AD_DOCUMENTS = PrecomputedJSONCache(max_entries=10000)
 
-@router.get("/ad.json", summary="Get advertisement data")
-async def get_ad_data(request: Request) -> Dict:
+
+def build_ad_data(did: str) -> Dict:
     """
-    Get advertisement data. This endpoint requires authentication.
-    User data is automatically added to request.state by authentication middleware.
+    Build the advertisement data returned to a DID.
 
     Args:
-        request: FastAPI request object
+        did: DID of the requester
 
     Returns:
         Dict: Advertisement data
     """
-    # User is already authenticated by middleware
-    # Middleware adds user data to request.state.user
-    user = request.state.user
-
-    if not user:
-        # This should not happen as middleware should catch this case
-        raise HTTPException(status_code=401, detail="Authentication required")
-
-    # Log access
-    logging.info(f"Advertisement data accessed by DID: {user.get('did')}")
-
-    # Return advertisement data
     return {
         "id": "123456",
         "name": "Example Advertisement",
         "description": "This is an example advertisement data that requires DID WBA authentication to access",
-        "created_by": user.get("did"),
+        "created_by": did,
         "timestamp": "2025-04-21T00:00:00Z",
         "content": {
             "title": "Example Product",
@@ -47,3 +39,31 @@ async def get_ad_data(request: Request) -> Dict:
             "tags": ["sample", "product", "did-wba"],
         },
     }
+
+
+@router.get("/ad.json", summary="Get advertisement data")
+async def get_ad_data(
+    request: Request, auth: AuthContext = Depends(get_auth_context)
+) -> Response:
+    """
+    Get advertisement data. This endpoint requires authentication.
+    The authentication context is added to request.state by authentication middleware.
+
+    The document is serialized once per DID and answered with 304 when the
+    client sends a matching If-None-Match header.
+
+    Args:
+        request: FastAPI request object
+        auth: Authentication context set by the middleware
+
+    Returns:
+        Response: Advertisement data
+    """
+    # Log access
+    logging.info(f"Advertisement data accessed by DID: {auth.did}")
+
+    document = _AD_DOCUMENTS.get(
+        auth.did,
+        lambda: PrecomputedJSON(build_ad_data(auth.did), "private, max-age=300"),
+    )
+    return document.to_response(request.headers)
@@ -0,0 +1,112 @@
+"""
+Administration API router.
+"""
+
+import hmac
+import logging
+from typing import Dict, Optional
+
+import jwt
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from auth.did_cache import invalidate_did_document
+from auth.jwt_keys import get_jwt_verification_key
+from auth.revocation import revocation_list
+from core.config import settings
+from core.domains import get_request_tenant
+
+router = APIRouter(tags=["admin"])
+
+
+def check_admin_key(admin_key: Optional[str]) -> None:
+    """
+    Check the admin API key of a request.
+
+    Args:
+        admin_key: Value of the X-Admin-Key header
+
+    Raises:
+        HTTPException: 404 when the admin API is disabled, 403 when the key is wrong
+    """
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not admin_key or not hmac.compare_digest(
+        admin_key.encode(), settings.ADMIN_API_KEY.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin key")
+
+
+@router.post("/admin/revoke", summary="Revoke access tokens")
+async def revoke(
+    payload: Dict, request: Request, x_admin_key: Optional[str] = Header(default=None)
+) -> Dict:
+    """
+    Revoke a single access token, or every token issued to a DID so far.
+
+    Revoking a DID also invalidates its cached DID document, so a compromised
+    key is not trusted for new handshakes either.
+
+    Args:
+        payload: {"token": "<jwt>"} or {"did": "did:wba:..."}
+        request: Request, whose host selects the key verifying the token
+        x_admin_key: Admin API key
+
+    Returns:
+        Dict: Revocation result
+    """
+    check_admin_key(x_admin_key)
+
+    token = payload.get("token")
+    did = payload.get("did")
+    if isinstance(token, str) and token:
+        if token.startswith("Bearer "):
+            token = token[7:]
+        try:
+            claims = jwt.decode(
+                token,
+                get_jwt_verification_key(get_request_tenant(request).jwt_public_key_path),
+                algorithms=[settings.JWT_ALGORITHM],
+                options={"verify_exp": False},
+            )
+        except jwt.InvalidTokenError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid token: {e}")
+        if "jti" not in claims or "exp" not in claims:
+            raise HTTPException(
+                status_code=400, detail="Token has no jti claim, revoke by DID instead"
+            )
+        revocation_list.revoke_token(claims["jti"], float(claims["exp"]))
+        logging.info(f"Admin revoked token {claims['jti']} of {claims.get('sub')}")
+        return {"revoked": "token", "jti": claims["jti"], "did": claims.get("sub")}
+
+    if isinstance(did, str) and did.startswith("did:"):
+        revocation_list.revoke_did(did)
+        await invalidate_did_document(did)
+        logging.info(f"Admin revoked tokens of DID {did}")
+        return {"revoked": "did", "did": did}
+
+    raise HTTPException(status_code=400, detail="Provide a token or a did")
+
+
+@router.post("/admin/did-cache/invalidate", summary="Invalidate a cached DID document")
+async def invalidate_did_cache(
+    payload: Dict, x_admin_key: Optional[str] = Header(default=None)
+) -> Dict:
+    """
+    Invalidate the cached DID document of a DID on every worker, e.g. after
+    its keys were rotated. Tokens already issued to the DID stay valid.
+
+    Args:
+        payload: {"did": "did:wba:..."}
+        x_admin_key: Admin API key
+
+    Returns:
+        Dict: Invalidation result
+    """
+    check_admin_key(x_admin_key)
+
+    did = payload.get("did")
+    if not isinstance(did, str) or not did.startswith("did:"):
+        raise HTTPException(status_code=400, detail="Provide a did")
+    await invalidate_did_document(did)
+    logging.info(f"Admin invalidated cached DID document of {did}")
+    return {"invalidated": did}
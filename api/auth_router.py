@@ -2,105 +2,94 @@
 Authentication API router.
 """
 
-import logging
-import json
-from typing import Dict, Optional
-from fastapi import APIRouter, Request, Header, HTTPException, Depends
-
-from auth.did_auth import get_and_validate_domain, handle_did_auth
-from auth.token_auth import handle_bearer_auth
+import asyncio
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+
+from api.admin_router import check_admin_key
+
+from auth.auth_context import (
+    AuthContext,
+    SCHEME_BEARER,
+    SCHEME_DID_WBA,
+    get_auth_context,
+    get_optional_auth_context,
+)
+
+from auth.token_auth import verified_token_cache, verify_access_token
+from core.body_limit import register_body_limit
+from core.config import settings
+from core.domains import Tenant, get_request_tenant
 
 router = APIRouter(tags=["authentication"])
 
+# Uncached tokens of an introspection batch verified per executor job
+INTROSPECT_CHUNK_SIZE = 16
+
+# Access tokens are about 520 bytes
+register_body_limit("POST", "/auth/introspect", settings.INTROSPECT_MAX_TOKENS * 1024)
+
 
 @router.post("/auth/did-wba", summary="Authenticate using DID WBA")
-async def did_wba_auth(
-    request: Request, authorization: Optional[str] = Header(None)
-) -> Dict:
+async def did_wba_auth(auth: AuthContext = Depends(get_auth_context)) -> Dict:
     """
     Authenticate using DID WBA method.
 
+    The DID WBA header is verified once by the authentication middleware,
+    this endpoint returns the token issued by that handshake.
+
     Args:
-        request: FastAPI request object
-        authorization: DID WBA authorization header
+        auth: Authentication context set by the middleware
 
     Returns:
         Dict: Authentication result with token
     """
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-
-    # Get and validate domain
-    domain = get_and_validate_domain(request)
+    if auth.scheme != SCHEME_DID_WBA:
+        raise HTTPException(
+            status_code=401, detail="Invalid authorization format, must use DIDWba scheme"
+        )
 
-    # Process DID WBA authentication
-    return await handle_did_auth(authorization, domain)
+    return auth.to_token_response()
 
 
 @router.get("/auth/verify", summary="Verify bearer token")
-async def verify_token(
-    request: Request, authorization: Optional[str] = Header(None)
-) -> Dict:
+async def verify_token(auth: AuthContext = Depends(get_auth_context)) -> Dict:
     """
     Verify JWT bearer token.
 
     Args:
-        request: FastAPI request object
-        authorization: Bearer token header
+        auth: Authentication context set by the middleware
 
     Returns:
         Dict: Token verification result
     """
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-
-    if not authorization.startswith("Bearer "):
+    if auth.scheme != SCHEME_BEARER:
         raise HTTPException(
             status_code=401, detail="Invalid token format, must use Bearer scheme"
         )
 
-    # Verify bearer token
-    user_data = await handle_bearer_auth(authorization)
-
     return {
         "verified": True,
-        "did": user_data["did"],
+        "did": auth.did,
         "message": "Token verified successfully",
     }
 
 
 @router.get("/wba/test", summary="Test endpoint for DID WBA authentication")
-async def test_endpoint(request: Request) -> Dict:
+async def test_endpoint(
+    auth: Optional[AuthContext] = Depends(get_optional_auth_context),
+) -> Dict:
     """
     Test endpoint for DID WBA authentication.
 
     Args:
-        request: FastAPI request object
+        auth: Authentication context set by the middleware
 
     Returns:
         Dict: Test result
     """
-    user = None
-
-    auth_data = request.state.headers.get("authorization", "")
-    print(auth_data)
-
-    try:
-        if auth_data != "":
-            if auth_data.startswith("DIDWba"):  # DID WBA authentication header
-                auth_data = auth_data.split(" ", 1)[1]
-                auth_dict = parse_auth_str_to_dict(auth_data)
-                user = auth_dict.get("did")
-            elif auth_data.startswith("Bearer "):  # Bearer token authentication header
-                auth_data = auth_data.split(" ", 1)[1]
-                user = await handle_bearer_auth(auth_data)
-                user = user.get("did")
-
-    except Exception as e:
-        logging.warning(f"Error parsing authentication data: {e}")
-        user = None
-
-    if not user:
+    if auth is None:
         return {
             "status": "warning",
             "message": "No authentication provided, but access allowed",
@@ -109,22 +98,127 @@ async def test_endpoint(request: Request) -> Dict:
     return {
         "status": "success",
         "message": "Successfully authenticated",
-        "did": user,
+        "did": auth.did,
         "authenticated": True,
     }
 
 
-def parse_auth_str_to_dict(auth_str: str) -> dict:
+@lru_cache(maxsize=1)
+def get_introspection_dids() -> FrozenSet[str]:
+    """
+    Get the DIDs allowed to introspect tokens, from INTROSPECT_ALLOWED_DIDS.
+
+    Returns:
+        FrozenSet[str]: Service DIDs
+    """
+    return frozenset(
+        did.strip() for did in settings.INTROSPECT_ALLOWED_DIDS.split(",") if did.strip()
+    )
+
+
+def check_introspection_caller(auth: AuthContext, admin_key: Optional[str]) -> None:
+    """
+    Check that the caller is a downstream service: an allowed DID or the admin key.
+
+    Args:
+        auth: Authentication context of the caller
+        admin_key: Value of the X-Admin-Key header
+
+    Raises:
+        HTTPException: 403 for any other caller
+    """
+    if auth.did in get_introspection_dids():
+        return
+    try:
+        check_admin_key(admin_key)
+    except HTTPException:
+        raise HTTPException(
+            status_code=403, detail="Token introspection is restricted to downstream services"
+        )
+
+
+def introspect_token(token: str, tenant: Tenant) -> Dict:
     """
-    Parse a string like 'key1="value1", key2="value2"' into a dictionary.
+    Verify one token of an introspection batch.
+
+    Args:
+        token: JWT token string
+        tenant: Tenant whose key verifies the token
+
+    Returns:
+        Dict: {"active": True, "did", "iat", "exp", "jti"} or {"active": False, "error"}
     """
-    result = {}
     try:
-        # Split by comma first, then by equals sign
-        for kv in auth_str.split(", "):
-            if "=" in kv:
-                k, v = kv.split("=", 1)
-                result[k.strip()] = v.strip('"')
-    except Exception as e:
-        logging.warning(f"Error parsing authentication string to dictionary: {e}")
+        claims = verify_access_token(token, tenant)
+    except HTTPException as exc:
+        return {"active": False, "error": exc.detail}
+    result = {"active": True, "did": claims["sub"], "iat": claims["iat"], "exp": claims["exp"]}
+    if "jti" in claims:
+        result["jti"] = claims["jti"]
     return result
+
+
+def _introspect_chunk(tokens: List[str], tenant: Tenant) -> List[Dict]:
+    return [introspect_token(token, tenant) for token in tokens]
+
+
+@router.post("/auth/introspect", summary="Verify a batch of bearer tokens")
+async def introspect(
+    payload: Dict,
+    request: Request,
+    auth: AuthContext = Depends(get_auth_context),
+    x_admin_key: Optional[str] = Header(default=None),
+) -> Dict:
+    """
+    Verify up to INTROSPECT_MAX_TOKENS access tokens in one request, e.g. for
+    an API gateway validating a burst of client tokens.
+
+    Only downstream services may call it: DIDs listed in INTROSPECT_ALLOWED_DIDS,
+    or callers presenting the admin API key.
+
+    Identical tokens are verified once. Tokens already verified are answered
+    from the verified-token cache; the signatures of the others are verified
+    concurrently in executor threads, off the event loop.
+
+    Args:
+        payload: {"tokens": ["<jwt>", ...]}
+        request: Request, whose host selects the key verifying the tokens
+        auth: Authentication context of the caller
+        x_admin_key: Admin API key, required unless the caller's DID is allowed
+
+    Returns:
+        Dict: {"results": [...]}, one introspect_token result per token, in order
+    """
+    check_introspection_caller(auth, x_admin_key)
+
+    tokens = payload.get("tokens")
+    if not isinstance(tokens, list) or not all(isinstance(token, str) for token in tokens):
+        raise HTTPException(status_code=400, detail="tokens must be a list of strings")
+    if len(tokens) > settings.INTROSPECT_MAX_TOKENS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.INTROSPECT_MAX_TOKENS} tokens per request",
+        )
+
+    tenant = get_request_tenant(request)
+    results: Dict[str, Dict] = {}
+    uncached: List[str] = []
+    for token in dict.fromkeys(tokens):
+        if verified_token_cache.contains(tenant.jwt_public_key_path, token):
+            results[token] = introspect_token(token, tenant)
+        else:
+            uncached.append(token)
+
+    if uncached:
+        loop = asyncio.get_running_loop()
+        chunks = [
+            uncached[i : i + INTROSPECT_CHUNK_SIZE]
+            for i in range(0, len(uncached), INTROSPECT_CHUNK_SIZE)
+        ]
+        verified = await asyncio.gather(
+            *(loop.run_in_executor(None, _introspect_chunk, chunk, tenant) for chunk in chunks)
+        )
+        for chunk, chunk_results in zip(chunks, verified):
+            results.update(zip(chunk, chunk_results))
+
+    return {"results": [results[token] for token in tokens]}
@@ -2,106 +2,173 @@
 DID document API router.
 """
 
-import json
+import asyncio
 import logging
-from typing import Dict
-from pathlib import Path
-from fastapi import APIRouter, HTTPException
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, Header, HTTPException, Request
 
+from api.admin_router import check_admin_key
 from core.config import settings
+from core.did_store import validate_user_id
+from core.domains import get_request_tenant
+from core.precomputed import register_precomputed_document
 
 router = APIRouter(tags=["did"])
 
+# Agent description document, served precomputed by PrecomputedResponseMiddleware
+AGENT_DESCRIPTION = {
+    "id": "example-agent-123",
+    "name": "DID WBA Example Agent",
+    "description": "An example agent implementing DID WBA authentication",
+    "version": "0.1.0",
+    "capabilities": ["did-wba-authentication", "token-authentication"],
+    "endpoints": {
+        "auth": "/auth/did-wba",
+        "verify": "/auth/verify",
+        "test": "/wba/test",
+    },
+    "owner": "DID WBA Example",
+    "created_at": "2025-04-21T00:00:00Z",
+}
+register_precomputed_document("/agents/example/ad.json", AGENT_DESCRIPTION)
+
 
 @router.get("/wba/user/{user_id}/did.json", summary="Get DID document")
-async def get_did_document(user_id: str) -> Dict:
+async def get_did_document(user_id: str, request: Request) -> Dict:
     """
     Retrieve a DID document by user ID.
 
     Args:
         user_id: User identifier
+        request: Request, whose host selects the tenant's DID storage
 
     Returns:
         Dict: DID document
     """
-    # Build DID document path
-    current_dir = Path(__file__).parent.parent.absolute()
-    did_path = (
-        current_dir
-        / settings.DID_DOCUMENTS_PATH
-        / f"user_{user_id}"
-        / settings.DID_DOCUMENT_FILENAME
-    )
-
-    if not did_path.exists():
-        raise HTTPException(
-            status_code=404, detail=f"DID document not found for user {user_id}"
-        )
-
-    # Load DID document
+    store = get_request_tenant(request).did_store
     try:
-        with open(did_path, "r", encoding="utf-8") as f:
-            did_document = json.load(f)
-        return did_document
+        did_document = store.load(user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Error loading DID document: {e}")
         raise HTTPException(status_code=500, detail="Error loading DID document")
 
+    if did_document is None:
+        raise HTTPException(
+            status_code=404, detail=f"DID document not found for user {user_id}"
+        )
+    return did_document
+
 
 @router.put("/wba/user/{user_id}/did.json", summary="Store DID document")
-async def store_did_document(user_id: str, did_document: Dict) -> Dict:
+async def store_did_document(
+    user_id: str,
+    did_document: Dict,
+    request: Request,
+    x_admin_key: Optional[str] = Header(default=None),
+) -> Dict:
     """
     Store a DID document for a user.
 
+    Self-hosted DID documents are trusted for authentication, so this
+    endpoint requires the admin API key.
+
     Args:
         user_id: User identifier
         did_document: DID document to store
+        request: Request, whose host selects the tenant's DID storage
+        x_admin_key: Admin API key
 
     Returns:
         Dict: Operation result
     """
-    # Build storage path
-    current_dir = Path(__file__).parent.parent.absolute()
-    user_dir = current_dir / settings.DID_DOCUMENTS_PATH / f"user_{user_id}"
-    did_path = user_dir / settings.DID_DOCUMENT_FILENAME
-
-    # Create directory if it doesn't exist
-    user_dir.mkdir(parents=True, exist_ok=True)
+    check_admin_key(x_admin_key)
 
-    # Save DID document
+    store = get_request_tenant(request).did_store
     try:
-        with open(did_path, "w", encoding="utf-8") as f:
-            json.dump(did_document, f, indent=2)
+        did_path = store.save(user_id, did_document)
 
         return {
             "status": "success",
             "message": f"DID document stored for user {user_id}",
             "path": str(did_path),
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Error storing DID document: {e}")
         raise HTTPException(status_code=500, detail="Error storing DID document")
 
 
+@router.post("/wba/user/_bulk", summary="Store DID documents in bulk")
+async def store_did_documents_bulk(
+    payload: Dict, request: Request, x_admin_key: Optional[str] = Header(default=None)
+) -> Dict:
+    """
+    Store a batch of DID documents, e.g. from the bulk provisioning CLI.
+
+    Storing is idempotent: documents that already exist are overwritten.
+    Self-hosted DID documents are trusted for authentication, so this
+    endpoint requires the admin API key.
+
+    Args:
+        payload: {"documents": [{"user_id": ..., "did_document": {...}}, ...]}
+        request: Request, whose host selects the tenant's DID storage
+        x_admin_key: Admin API key
+
+    Returns:
+        Dict: Operation result with the number of stored documents
+    """
+    check_admin_key(x_admin_key)
+
+    store = get_request_tenant(request).did_store
+    documents = payload.get("documents")
+    if not isinstance(documents, list):
+        raise HTTPException(status_code=400, detail="documents must be a list")
+    if len(documents) > settings.DID_BULK_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.DID_BULK_MAX_DOCUMENTS} documents per request",
+        )
+
+    items: List[Tuple[str, Dict]] = []
+    for entry in documents:
+        if (
+            not isinstance(entry, dict)
+            or not isinstance(entry.get("user_id"), str)
+            or not isinstance(entry.get("did_document"), dict)
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail="Each entry needs a user_id string and a did_document object",
+            )
+        try:
+            validate_user_id(entry["user_id"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        items.append((entry["user_id"], entry["did_document"]))
+
+    # File writes run in a worker thread to keep the event loop responsive
+    try:
+        stored = await asyncio.to_thread(store.save_many, items)
+    except Exception as e:
+        logging.error(f"Error storing DID documents: {e}")
+        raise HTTPException(status_code=500, detail="Error storing DID documents")
+
+    logging.info(f"Stored {stored} DID documents in bulk")
+    return {"status": "success", "stored": stored}
+
+
 @router.get("/agents/example/ad.json", summary="Get agent description")
 async def get_agent_description() -> Dict:
     """
     Get agent description document.
 
+    Requests are normally answered by PrecomputedResponseMiddleware, this
+    handler only runs when the middleware is not installed.
+
     Returns:
         Dict: Agent description
     """
-    return {
-        "id": "example-agent-123",
-        "name": "DID WBA Example Agent",
-        "description": "An example agent implementing DID WBA authentication",
-        "version": "0.1.0",
-        "capabilities": ["did-wba-authentication", "token-authentication"],
-        "endpoints": {
-            "auth": "/auth/did-wba",
-            "verify": "/auth/verify",
-            "test": "/wba/test",
-        },
-        "owner": "DID WBA Example",
-        "created_at": "2025-04-21T00:00:00Z",
-    }
+    return AGENT_DESCRIPTION
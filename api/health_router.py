@@ -0,0 +1,38 @@
+"""
+Liveness and readiness API router for load balancers and orchestrators.
+"""
+
+from typing import Dict
+
+from fastapi import APIRouter
+
+from core.lifecycle import lifecycle
+from utils.fast_json import FastJSONResponse
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/health", summary="Liveness probe")
+async def get_health() -> Dict:
+    """
+    Report that the worker process is serving requests, including while it
+    starts and drains.
+
+    Returns:
+        Dict: Lifecycle state
+    """
+    return {"status": "ok", "state": lifecycle.state}
+
+
+@router.get("/ready", summary="Readiness probe")
+async def get_ready() -> FastJSONResponse:
+    """
+    Report whether the worker should receive traffic: 200 once startup has
+    loaded keys and warmed caches, 503 while starting and draining.
+
+    Returns:
+        FastJSONResponse: Lifecycle state, startup duration and requests in flight
+    """
+    return FastJSONResponse(
+        status_code=200 if lifecycle.ready else 503, content=lifecycle.stats()
+    )
@@ -0,0 +1,69 @@
+"""
+Operational metrics API router.
+"""
+
+from typing import Dict
+
+from fastapi import APIRouter
+
+from auth.did_cache import did_document_cache
+from auth.did_verification import verification_stats
+from auth.audit_log import audit_log
+from auth.revocation import revocation_list
+from auth.token_auth import verified_token_cache
+from core.admission import admission_controller
+from auth.resolver_guard import resolver_guard
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics/resolver", summary="Remote DID resolution metrics")
+async def get_resolver_metrics() -> Dict:
+    """
+    Get per-host DID resolution metrics of this worker: circuit breaker state,
+    in-flight requests, outcomes and latency.
+
+    Returns:
+        Dict: Metrics by host
+    """
+    return {"hosts": resolver_guard.metrics()}
+
+
+@router.get("/metrics/did-cache", summary="DID document cache metrics")
+async def get_did_cache_metrics() -> Dict:
+    """
+    Get DID document cache metrics of this worker.
+
+    Returns:
+        Dict: Entries, hits, misses and background refreshes
+    """
+    return did_document_cache.stats()
+
+
+@router.get("/metrics/auth", summary="DID WBA verification metrics")
+async def get_auth_metrics() -> Dict:
+    """
+    Get DID WBA verification outcomes, revocations known to this worker,
+    verified-token cache usage and audit log events.
+
+    Returns:
+        Dict: Accepted count, rejections by verification stage, revoked tokens and DIDs,
+        verified-token cache entries, hits and misses, audit log events
+    """
+    return {
+        **verification_stats.stats(),
+        "revocations": revocation_list.stats(),
+        "token_cache": verified_token_cache.stats(),
+        "audit_log": audit_log.stats(),
+    }
+
+
+@router.get("/metrics/admission", summary="Admission control metrics")
+async def get_admission_metrics() -> Dict:
+    """
+    Get the load of this worker and the requests shed by admission control.
+
+    Returns:
+        Dict: Overload state, in-flight requests, event loop lag, admitted and shed counts
+    """
+    return admission_controller.stats()
@@ -0,0 +1,216 @@
+"""
+WebSocket API router for agents exchanging many small messages.
+
+A connection is authenticated once, at connect time, with the same DID WBA or
+Bearer logic as HTTP requests. Messages on the connection then skip the
+middleware, header parsing and token verification. The connection is closed
+when the token authenticating it expires or is revoked (checked before every
+message and after every revocation sync), and new connections are refused
+while the worker drains before a shutdown.
+
+Protocol (JSON text frames):
+    -> {"id": 1, "method": "test"}
+    <- {"id": 1, "result": {"status": "success", "did": "...", ...}}
+    <- {"id": 2, "error": "Unknown method"}
+
+The first frame sent by the server describes the session:
+    <- {"type": "session", "did": "...", "expires_at": 1700000000.0,
+        "access_token": "..."}  (access_token only after a DID WBA handshake)
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict
+
+from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi.responses import JSONResponse
+
+from api.ad_router import build_ad_data
+from auth.auth_context import AuthContext
+from auth.auth_middleware import verify_auth_header
+from auth.rate_limit import rate_limiter
+from auth.revocation import revocation_list
+from core.admission import admission_controller, classify_request
+from core.config import settings
+from core.lifecycle import lifecycle
+from utils import fast_json
+
+router = APIRouter(tags=["websocket"])
+
+# Close codes (RFC 6455)
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_MESSAGE_TOO_BIG = 1009
+
+
+def _test_result(auth: AuthContext, message: Dict) -> Dict:
+    """Same result as GET /wba/test."""
+    return {
+        "status": "success",
+        "message": "Successfully authenticated",
+        "did": auth.did,
+        "authenticated": True,
+    }
+
+
+def _ad_result(auth: AuthContext, message: Dict) -> Dict:
+    """Same result as GET /ad.json."""
+    return build_ad_data(auth.did)
+
+
+def _ping_result(auth: AuthContext, message: Dict) -> Dict:
+    return {"pong": True}
+
+
+WS_METHODS: Dict[str, Callable[[AuthContext, Dict], Dict]] = {
+    "test": _test_result,
+    "ad": _ad_result,
+    "ping": _ping_result,
+}
+
+
+async def _deny(websocket: WebSocket, status_code: int, detail: str, headers=None) -> None:
+    """Reject a connection before accepting it, with an HTTP error response."""
+    try:
+        await websocket.send_denial_response(
+            JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers)
+        )
+    except RuntimeError:
+        # Server without the WebSocket denial response extension
+        await websocket.close(code=CLOSE_POLICY_VIOLATION, reason=detail)
+
+
+def handle_message(auth: AuthContext, data) -> str:
+    """
+    Handle one request frame.
+
+    Args:
+        auth: Authentication context of the connection
+        data: Frame payload (str or bytes)
+
+    Returns:
+        str: Response frame
+    """
+    try:
+        message = fast_json.loads(data)
+    except ValueError:
+        return fast_json.dumps_str({"error": "Invalid JSON"})
+    if not isinstance(message, dict):
+        return fast_json.dumps_str({"error": "Message must be a JSON object"})
+
+    handler = WS_METHODS.get(message.get("method"))
+    if handler is None:
+        return fast_json.dumps_str({"id": message.get("id"), "error": "Unknown method"})
+    return fast_json.dumps_str({"id": message.get("id"), "result": handler(auth, message)})
+
+
+def is_session_revoked(auth: AuthContext) -> bool:
+    """Check whether the token authenticating a session was revoked (no I/O)."""
+    if auth.issued_at is None:
+        return False
+    return revocation_list.is_revoked(auth.jti, auth.did, auth.issued_at)
+
+
+@router.websocket("/wba/ws")
+async def agent_websocket(websocket: WebSocket) -> None:
+    """
+    Authenticated message channel, see the module docstring for the protocol.
+
+    Args:
+        websocket: WebSocket connection
+    """
+    # Sessions outlive the drain, open them on a worker that is not going away
+    if lifecycle.draining:
+        await _deny(
+            websocket,
+            503,
+            "Server shutting down, retry later",
+            {"Retry-After": str(admission_controller.retry_after)},
+        )
+        return
+
+    # Same admission, rate limit and authentication as HTTP requests
+    if not admission_controller.admit(classify_request(websocket.scope)):
+        await _deny(
+            websocket,
+            503,
+            "Server overloaded, retry later",
+            {"Retry-After": str(admission_controller.retry_after)},
+        )
+        return
+    try:
+        rate_limiter.check_ip(websocket.client.host if websocket.client else None)
+        auth = await verify_auth_header(websocket)
+    except HTTPException as exc:
+        logging.info(f"WebSocket authentication failed: {exc.detail}")
+        await _deny(websocket, exc.status_code, exc.detail, exc.headers)
+        return
+
+    await websocket.accept()
+    session = {"type": "session", "did": auth.did, "expires_at": auth.expires_at}
+    if auth.access_token:
+        session["access_token"] = auth.access_token
+    await websocket.send_text(fast_json.dumps_str(session))
+    logging.info(f"WebSocket session opened for {auth.did}")
+
+    # Timers cancel the receive loop when the token expires, and when it is
+    # found revoked after a revocation sync while the session is idle
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    close_reason = None
+
+    def end_session(reason: str) -> None:
+        nonlocal close_reason
+        if close_reason is None:
+            close_reason = reason
+            task.cancel()
+
+    timer = None
+    if auth.expires_at is not None:
+        timer = loop.call_at(
+            loop.time() + max(0.0, auth.expires_at - time.time()),
+            end_session,
+            "Token expired",
+        )
+
+    revocation_timer = None
+
+    def check_revocation() -> None:
+        nonlocal revocation_timer
+        if is_session_revoked(auth):
+            end_session("Token revoked")
+        else:
+            revocation_timer = loop.call_later(
+                settings.REVOCATION_SYNC_INTERVAL_SECONDS, check_revocation
+            )
+
+    check_revocation()
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                logging.info(f"WebSocket session closed by {auth.did}")
+                return
+
+            data = message.get("text") or message.get("bytes") or ""
+            if len(data) > settings.MAX_JSON_SIZE:
+                await websocket.close(code=CLOSE_MESSAGE_TOO_BIG, reason="Message too big")
+                return
+            if is_session_revoked(auth):
+                logging.info(f"WebSocket token revoked for {auth.did}, closing")
+                await websocket.close(code=CLOSE_POLICY_VIOLATION, reason="Token revoked")
+                return
+            await websocket.send_text(handle_message(auth, data))
+    except asyncio.CancelledError:
+        if close_reason is None:
+            raise
+        if hasattr(task, "uncancel"):
+            task.uncancel()
+        logging.info(f"WebSocket {close_reason.lower()} for {auth.did}, closing")
+        await websocket.close(code=CLOSE_POLICY_VIOLATION, reason=close_reason)
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if revocation_timer is not None:
+            revocation_timer.cancel()
@@ -0,0 +1,304 @@
+"""
+Append-only audit log of authentications.
+
+Every DID WBA handshake and bearer token authentication is recorded with its
+DID, outcome, reason, domain and latency. Recording only appends a tuple to an
+in-memory ring buffer; a background writer thread drains the buffer every
+AUDIT_LOG_FLUSH_INTERVAL_MS and writes the batch as JSON lines with a single
+fsync (group commit), so the event loop never waits for the disk. When the
+buffer is full the oldest events are dropped and counted.
+
+Each worker writes its own segment files, audit-{start time}-{pid}-{seq}.jsonl
+in AUDIT_LOG_DIR, and starts a new segment once the current one reaches
+AUDIT_LOG_SEGMENT_BYTES. Segment names sort in time order.
+
+Reading the log:
+
+    python -m auth.audit_log [--dir audit_logs] [--did DID] [--outcome rejected]
+                             [--scheme DIDWba] [--domain example.com]
+                             [--since 2025-01-01T00:00:00] [--until ...] [--follow]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from core.config import settings
+from utils import fast_json
+
+OUTCOME_ACCEPTED = "accepted"
+OUTCOME_REJECTED = "rejected"
+
+SEGMENT_PREFIX = "audit-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class AuditLog:
+    """Ring buffer of audit events drained to segment files by a writer thread."""
+
+    def __init__(
+        self,
+        directory: str,
+        buffer_size: int = 65536,
+        flush_interval: float = 0.1,
+        segment_bytes: int = 64 * 1024 * 1024,
+        enabled: bool = True,
+    ):
+        """
+        Args:
+            directory: Directory of the segment files
+            buffer_size: Events buffered before the oldest are dropped
+            flush_interval: Seconds between two batches written by the writer thread
+            segment_bytes: Size from which the writer starts a new segment
+            enabled: Whether events are recorded
+        """
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.enabled = enabled
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._segment_size = 0
+        self._segment_seq = 0
+
+    def record(
+        self,
+        scheme: str,
+        did: Optional[str],
+        outcome: str,
+        reason: str = "",
+        domain: str = "",
+        latency: float = 0.0,
+    ) -> None:
+        """
+        Record an authentication, without blocking.
+
+        Args:
+            scheme: Authentication scheme (DIDWba or Bearer)
+            did: Authenticated or claimed DID, None when unknown
+            outcome: OUTCOME_ACCEPTED or OUTCOME_REJECTED
+            reason: Rejection reason
+            domain: Domain of the request
+            latency: Seconds spent authenticating
+        """
+        if not self.enabled:
+            return
+        buffer = self._buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped += 1
+        buffer.append((time.time(), scheme, did, outcome, reason, domain, latency))
+        self.recorded += 1
+
+    def start(self) -> None:
+        """Start the writer thread (in the worker process, after forking)."""
+        if not self.enabled or self._thread is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        """Write the buffered events and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._write_batch()
+        self._write_batch()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_batch(self) -> None:
+        """Write the buffered events with one fsync."""
+        buffer = self._buffer
+        lines: List[bytes] = []
+        while buffer:
+            ts, scheme, did, outcome, reason, domain, latency = buffer.popleft()
+            lines.append(
+                fast_json.dumps(
+                    {
+                        "ts": round(ts, 6),
+                        "scheme": scheme,
+                        "did": did,
+                        "outcome": outcome,
+                        "reason": reason,
+                        "domain": domain,
+                        "latency_ms": round(latency * 1000, 3),
+                    }
+                )
+                + b"\n"
+            )
+        if not lines:
+            return
+
+        data = b"".join(lines)
+        try:
+            if self._file is None or self._segment_size >= self.segment_bytes:
+                self._open_segment()
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            logging.error(f"Failed to write {len(lines)} audit events: {e}")
+            return
+        self._segment_size += len(data)
+        self.written += len(lines)
+        self.batches += 1
+
+    def _open_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._segment_seq += 1
+        started = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        path = self.directory / (
+            f"{SEGMENT_PREFIX}{started}-{os.getpid()}-{self._segment_seq:06d}{SEGMENT_SUFFIX}"
+        )
+        self._file = open(path, "ab")
+        self._segment_size = self._file.tell()
+        logging.info(f"Audit log segment opened: {path}")
+
+    def stats(self) -> Dict:
+        return {
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "buffered": len(self._buffer),
+        }
+
+
+audit_log = AuditLog(
+    directory=settings.AUDIT_LOG_DIR,
+    buffer_size=settings.AUDIT_LOG_BUFFER_SIZE,
+    flush_interval=settings.AUDIT_LOG_FLUSH_INTERVAL_MS / 1000,
+    segment_bytes=settings.AUDIT_LOG_SEGMENT_BYTES,
+    enabled=settings.AUDIT_LOG_ENABLED,
+)
+
+
+def list_segments(directory: str) -> List[Path]:
+    """
+    List the segment files of an audit log directory, oldest first.
+
+    Args:
+        directory: Audit log directory
+
+    Returns:
+        List[Path]: Segment files
+    """
+    return sorted(Path(directory).glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+
+def _matches(event: Dict, filters: Dict) -> bool:
+    if filters.get("since") is not None and event["ts"] < filters["since"]:
+        return False
+    if filters.get("until") is not None and event["ts"] >= filters["until"]:
+        return False
+    for field in ("did", "outcome", "scheme", "domain"):
+        if filters.get(field) is not None and event.get(field) != filters[field]:
+            return False
+    return True
+
+
+def read_events(directory: str, follow: bool = False, poll_interval: float = 0.5, **filters) -> Iterator[Dict]:
+    """
+    Stream the events of an audit log directory.
+
+    Args:
+        directory: Audit log directory
+        follow: Keep waiting for new events and segments
+        poll_interval: Seconds between polls when following
+        **filters: did, outcome, scheme, domain, and since/until (Unix time)
+
+    Yields:
+        Dict: Matching events, in segment order
+    """
+    offsets: Dict[Path, int] = {}
+    while True:
+        for path in list_segments(directory):
+            with open(path, "rb") as f:
+                f.seek(offsets.get(path, 0))
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Batch still being written, read it on the next poll
+                        break
+                    offsets[path] = offsets.get(path, 0) + len(line)
+                    try:
+                        event = fast_json.loads(line)
+                    except ValueError:
+                        continue
+                    if _matches(event, filters):
+                        yield event
+        if not follow:
+            return
+        time.sleep(poll_interval)
+
+
+def _parse_time(value: str) -> float:
+    """Parse a Unix time or an ISO 8601 date (UTC when no offset is given)."""
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            return (parsed - datetime(1970, 1, 1)).total_seconds()
+        return parsed.timestamp()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Stream and filter the authentication audit log")
+    parser.add_argument("--dir", default=settings.AUDIT_LOG_DIR, help="Audit log directory")
+    parser.add_argument("--did", help="Only events of this DID")
+    parser.add_argument("--outcome", choices=[OUTCOME_ACCEPTED, OUTCOME_REJECTED])
+    parser.add_argument("--scheme", help="DIDWba or Bearer")
+    parser.add_argument("--domain", help="Only events of this domain")
+    parser.add_argument("--since", type=_parse_time, help="Unix time or ISO date (UTC)")
+    parser.add_argument("--until", type=_parse_time, help="Unix time or ISO date (UTC)")
+    parser.add_argument("--follow", "-f", action="store_true", help="Wait for new events")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout.buffer
+    try:
+        for event in read_events(
+            args.dir,
+            follow=args.follow,
+            did=args.did,
+            outcome=args.outcome,
+            scheme=args.scheme,
+            domain=args.domain,
+            since=args.since,
+            until=args.until,
+        ):
+            out.write(fast_json.dumps(event) + b"\n")
+            if args.follow:
+                out.flush()
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Authentication context shared between the authentication middleware and routes.
+"""
+
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+
+# Authentication schemes
+SCHEME_DID_WBA = "DIDWba"
+SCHEME_BEARER = "Bearer"
+
+
+class AuthContext:
+    """
+    Result of authenticating a request, computed once by the middleware and
+    attached to request.state.auth.
+    """
+
+    __slots__ = ("did", "scheme", "access_token", "expires_at", "jti", "issued_at")
+
+    def __init__(
+        self,
+        did: str,
+        scheme: str,
+        access_token: Optional[str] = None,
+        expires_at: Optional[float] = None,
+        jti: Optional[str] = None,
+        issued_at: Optional[float] = None,
+    ):
+        """
+        Args:
+            did: Authenticated DID
+            scheme: Authentication scheme used by the request (DIDWba or Bearer)
+            access_token: Access token issued by a DID WBA handshake, if any
+            expires_at: Unix time at which the token authenticating the DID expires
+            jti: jti claim of that token, None for tokens issued without one
+            issued_at: iat claim of that token as a Unix timestamp
+        """
+        self.did = did
+        self.scheme = scheme
+        self.access_token = access_token
+        self.expires_at = expires_at
+        self.jti = jti
+        self.issued_at = issued_at
+
+    @classmethod
+    def from_did_auth(cls, auth_result: Dict) -> "AuthContext":
+        """Build a context from the result of handle_did_auth."""
+        return cls(
+            did=auth_result["did"],
+            scheme=SCHEME_DID_WBA,
+            access_token=auth_result["access_token"],
+            expires_at=auth_result.get("expires_at"),
+            jti=auth_result.get("jti"),
+            issued_at=auth_result.get("issued_at"),
+        )
+
+    @classmethod
+    def from_bearer_auth(cls, auth_result: Dict) -> "AuthContext":
+        """Build a context from the result of handle_bearer_auth."""
+        return cls(
+            did=auth_result["did"],
+            scheme=SCHEME_BEARER,
+            expires_at=auth_result.get("expires_at"),
+            jti=auth_result.get("jti"),
+            issued_at=auth_result.get("issued_at"),
+        )
+
+    def to_token_response(self) -> Dict:
+        """Return the token response of a DID WBA handshake."""
+        return {
+            "access_token": self.access_token,
+            "token_type": "bearer",
+            "did": self.did,
+        }
+
+    def __repr__(self) -> str:
+        return f"AuthContext(did={self.did!r}, scheme={self.scheme!r})"
+
+
+def get_optional_auth_context(request: Request) -> Optional[AuthContext]:
+    """
+    FastAPI dependency returning the authentication context, or None for
+    requests the middleware did not authenticate (exempt paths).
+
+    Args:
+        request: FastAPI request object
+
+    Returns:
+        Optional[AuthContext]: Authentication context
+    """
+    return getattr(request.state, "auth", None)
+
+
+def get_auth_context(request: Request) -> AuthContext:
+    """
+    FastAPI dependency returning the authentication context of the request.
+
+    Args:
+        request: FastAPI request object
+
+    Returns:
+        AuthContext: Authentication context
+
+    Raises:
+        HTTPException: When the request was not authenticated
+    """
+    context = getattr(request.state, "auth", None)
+    if context is None:
+        # This should not happen as middleware should catch this case
+        raise HTTPException(status_code=401, detail="Authentication required")
+    return context
@@ -5,10 +5,14 @@ Authentication middleware module.
 import logging
 from typing import Optional, Callable
 from fastapi import Request, HTTPException, Response
+from fastapi.requests import HTTPConnection
 from fastapi.responses import JSONResponse
 
-from auth.did_auth import handle_did_auth, get_and_validate_domain
+from auth.did_auth import handle_did_auth
 from auth.token_auth import handle_bearer_auth
+from auth.rate_limit import rate_limiter
+from auth.auth_context import AuthContext
+from core.domains import get_request_tenant
 
 
 # Define exempt paths that don't require authentication
@@ -19,22 +23,29 @@ EXEMPT_PATHS = [
     "/wba/user/",  # Allow access to DID documents
     "/",  # Allow access to root endpoint
     "/agents/example/ad.json",  # Allow access to agent description
+    "/metrics/",  # Allow access to operational metrics
+    "/admin/",  # Admin endpoints check their own API key
+    "/health",  # Liveness probe
+    "/ready",  # Readiness probe
 ]  # "/wba/test" path removed from exempt list, now requires authentication
 
 
-async def verify_auth_header(request: Request) -> dict:
+async def verify_auth_header(request: HTTPConnection) -> AuthContext:
     """
-    Verify authentication header and return authenticated user data.
+    Verify authentication header and return the authentication context.
 
     Args:
-        request: FastAPI request object
+        request: FastAPI request or WebSocket
 
     Returns:
-        dict: Authenticated user data
+        AuthContext: Authentication context
 
     Raises:
         HTTPException: When authentication fails
     """
+    # Unknown domains are rejected with one lookup, before any crypto
+    tenant = get_request_tenant(request)
+
     # Get authorization header
     auth_header = request.headers.get("Authorization")
 
@@ -43,22 +54,23 @@ async def verify_auth_header(request: Request) -> dict:
 
     # Handle DID WBA authentication
     if not auth_header.startswith("Bearer "):
-        domain = get_and_validate_domain(request)
-        return await handle_did_auth(auth_header, domain)
+        return AuthContext.from_did_auth(
+            await handle_did_auth(auth_header, tenant.domain, tenant)
+        )
 
     # Handle Bearer token authentication
-    return await handle_bearer_auth(auth_header)
+    return AuthContext.from_bearer_auth(await handle_bearer_auth(auth_header, tenant))
 
 
-async def authenticate_request(request: Request) -> Optional[dict]:
+async def authenticate_request(request: Request) -> Optional[AuthContext]:
     """
-    Authenticate a request and return user data if successful.
+    Authenticate a request and return its authentication context if successful.
 
     Args:
         request: FastAPI request object
 
     Returns:
-        Optional[dict]: Authenticated user data or None for exempt paths
+        Optional[AuthContext]: Authentication context or None for exempt paths
 
     Raises:
         HTTPException: When authentication fails
@@ -94,6 +106,9 @@ async def authenticate_request(request: Request) -> Optional[dict]:
 
     logging.info(f"Path {request.url.path} requires authentication")
 
+    # Admission control by source IP before any header parsing or crypto
+    rate_limiter.check_ip(request.client.host if request.client else None)
+
     # Verify authentication
     return await verify_auth_header(request)
 
@@ -110,24 +125,20 @@ async def auth_middleware(request: Request, call_next: Callable) -> Response:
         Response: API response
     """
     try:
-        # Add user data to request state if authenticated
-        response_auth = await authenticate_request(request)
-        headers = dict(request.headers)  # Read request headers
-        request.state.headers = headers
-        logging.info(f"Authenticated user: {request.state.headers}")
-        headers = dict(request.headers)  # Read request headers
-        request.state.headers = headers  # Store in request.state
-        
-        if response_auth is not None:
+        # Authenticate once and share the result with routes via request.state
+        auth_context = await authenticate_request(request)
+        request.state.auth = auth_context
+
+        if auth_context is not None:
+            logging.info(f"Authenticated DID: {auth_context.did}")
             response = await call_next(request)
-            if response_auth.get("token_type", " ") == "bearer":
+            if auth_context.access_token:
                 response.headers["authorization"] = (
-                    "bearer " + response_auth["access_token"]
+                    "bearer " + auth_context.access_token
                 )
-                return response
             else:
-                response.headers["authorization"] = headers["authorization"]
-                return response
+                response.headers["authorization"] = request.headers["authorization"]
+            return response
 
         else:
             logging.info("Authentication skipped for exempt path")
@@ -135,7 +146,11 @@ async def auth_middleware(request: Request, call_next: Callable) -> Response:
 
     except HTTPException as exc:
         logging.error(f"Authentication error: {exc.detail}")
-        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={"detail": exc.detail},
+            headers=exc.headers,
+        )
 
     except Exception as e:
         logging.error(f"Unexpected error in auth middleware: {e}")
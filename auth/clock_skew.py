@@ -0,0 +1,227 @@
+"""
+Client-side clock skew estimation for DID WBA authentication.
+
+Servers reject DID WBA headers whose timestamp is outside
+TIMESTAMP_EXPIRATION_MINUTES of their own clock. Every response carries the
+server time (X-Server-Time), from which the client keeps a per-server offset
+and applies it to header timestamps and token expiry checks.
+"""
+
+import hashlib
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+import jcs
+from agent_connect.authentication import DIDWbaAuthHeader
+from agent_connect.authentication.did_wba import _select_authentication_method
+from agent_connect.authentication.verification_methods import (
+    create_verification_method,
+)
+
+from core.server_time import SERVER_TIME_HEADER
+
+# Detail of the 401 response sent when a DID WBA timestamp is rejected
+TIMESTAMP_ERROR_DETAIL = "Timestamp expired or invalid"
+
+# Header timestamps have second precision, smaller offsets are not corrected
+MIN_CORRECTION_SECONDS = 1.0
+
+
+def _get_domain(server_url: str) -> str:
+    """Extract the domain from a URL, as DIDWbaAuthHeader does."""
+    return urlparse(server_url).netloc.split(":")[0]
+
+
+class ClockSkewEstimator:
+    """
+    Per-server estimate of (server clock - local clock) in seconds.
+
+    Each response gives a sample: the server time minus the local midpoint of
+    the request. Samples are smoothed with an exponential moving average, and a
+    sample far from the estimate (a clock step on either side) replaces it.
+    """
+
+    def __init__(self, alpha: float = 0.3, step_threshold: float = 5.0, max_servers: int = 10000):
+        """
+        Args:
+            alpha: Weight of a new sample in the moving average
+            step_threshold: Seconds of disagreement after which a sample replaces the estimate
+            max_servers: Maximum number of servers tracked
+        """
+        self.alpha = alpha
+        self.step_threshold = step_threshold
+        self.max_servers = max_servers
+        self._offsets: "OrderedDict[str, float]" = OrderedDict()
+
+    def observe(
+        self,
+        server_url: str,
+        headers: Mapping[str, str],
+        sent_at: float,
+        received_at: float,
+    ) -> Optional[float]:
+        """
+        Update the estimate of a server from its response headers.
+
+        Args:
+            server_url: Server URL
+            headers: Response headers
+            sent_at: Local time.time() when the request was sent
+            received_at: Local time.time() when the response headers arrived
+
+        Returns:
+            Optional[float]: Updated offset, or None if the server sent no time
+        """
+        value = headers.get(SERVER_TIME_HEADER) or headers.get(SERVER_TIME_HEADER.lower())
+        if not value:
+            return None
+        try:
+            server_time = float(value)
+        except ValueError:
+            return None
+
+        sample = server_time - (sent_at + received_at) / 2
+        domain = _get_domain(server_url)
+        offset = self._offsets.get(domain)
+        if offset is None or abs(sample - offset) > self.step_threshold:
+            offset = sample
+        else:
+            offset += self.alpha * (sample - offset)
+
+        self._offsets[domain] = offset
+        self._offsets.move_to_end(domain)
+        if len(self._offsets) > self.max_servers:
+            self._offsets.popitem(last=False)
+        return offset
+
+    def get_offset(self, domain: str) -> float:
+        """Get the estimated clock offset of a server domain in seconds."""
+        return self._offsets.get(domain, 0.0)
+
+    def server_time(self, domain: str) -> float:
+        """Get the estimated current Unix time on a server domain."""
+        return time.time() + self.get_offset(domain)
+
+
+# Shared estimate used by the client helpers
+clock_skew = ClockSkewEstimator()
+
+
+def is_timestamp_error(status: int, response_data: Dict) -> bool:
+    """Check whether a response rejected a DID WBA header for its timestamp."""
+    return status == 401 and response_data.get("detail") == TIMESTAMP_ERROR_DETAIL
+
+
+def generate_auth_header_at(
+    did_document: Dict,
+    service_domain: str,
+    sign_callback: Callable[[bytes, str], bytes],
+    timestamp: datetime,
+) -> str:
+    """
+    Generate a DID WBA Authorization header with a given timestamp.
+
+    Same header as agent_connect's generate_auth_header, which always uses the
+    local clock.
+
+    Args:
+        did_document: DID document
+        service_domain: Server domain
+        sign_callback: callback(content_hash, verification_method_fragment) -> signature
+        timestamp: Timestamp to sign
+
+    Returns:
+        str: Value of the Authorization header
+    """
+    did = did_document.get("id")
+    if not did:
+        raise ValueError("DID document is missing the id field.")
+
+    method_dict, verification_method_fragment = _select_authentication_method(
+        did_document
+    )
+    nonce = secrets.token_hex(16)
+    timestamp_str = timestamp.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    data_to_sign = {
+        "nonce": nonce,
+        "timestamp": timestamp_str,
+        "service": service_domain,
+        "did": did,
+    }
+    content_hash = hashlib.sha256(jcs.canonicalize(data_to_sign)).digest()
+
+    verifier = create_verification_method(method_dict)
+    signature = verifier.encode_signature(
+        sign_callback(content_hash, verification_method_fragment)
+    )
+
+    return (
+        f'DIDWba did="{did}", '
+        f'nonce="{nonce}", '
+        f'timestamp="{timestamp_str}", '
+        f'verification_method="{verification_method_fragment}", '
+        f'signature="{signature}"'
+    )
+
+
+def generate_skew_adjusted_auth_header(
+    auth_client: DIDWbaAuthHeader,
+    domain: str,
+    estimator: Optional[ClockSkewEstimator] = None,
+) -> str:
+    """
+    Generate a DID WBA header for a domain, timestamped with the estimated server time.
+
+    Args:
+        auth_client: DID WBA auth client holding the DID document and key
+        domain: Server domain
+        estimator: Clock skew estimator (default: the shared clock_skew)
+
+    Returns:
+        str: Value of the Authorization header
+    """
+    offset = (estimator or clock_skew).get_offset(domain)
+    if abs(offset) < MIN_CORRECTION_SECONDS:
+        return DIDWbaAuthHeader._generate_auth_header(auth_client, domain)
+
+    logging.info(f"Adjusting DID WBA timestamp for {domain} by {offset:.1f}s")
+    return generate_auth_header_at(
+        auth_client._load_did_document(),
+        domain,
+        auth_client._sign_callback,
+        datetime.now(timezone.utc) + timedelta(seconds=offset),
+    )
+
+
+class SkewAwareDIDWbaAuthHeader(DIDWbaAuthHeader):
+    """
+    DIDWbaAuthHeader that timestamps headers with the estimated server time.
+
+    Unlike the base class, a DID authentication header is never reused: the
+    server accepts each nonce only once.
+    """
+
+    def _generate_auth_header(self, domain: str) -> str:
+        return generate_skew_adjusted_auth_header(self, domain)
+
+    def get_auth_header(self, server_url: str, force_new: bool = False) -> Dict[str, str]:
+        """
+        Get authentication header.
+
+        Args:
+            server_url: Server URL
+            force_new: Whether to ignore a stored token
+
+        Returns:
+            Dict[str, str]: HTTP header dictionary
+        """
+        domain = self._get_domain(server_url)
+        if not force_new and domain in self.tokens:
+            return {"Authorization": f"Bearer {self.tokens[domain]}"}
+        return {"Authorization": self._generate_auth_header(domain)}
@@ -1,19 +1,104 @@
 """
-Custom DID document resolver for local testing environment.
+Custom DID document resolver.
+
+DIDs hosted by this server (WBA_SERVER_DOMAINS or LOCAL_HOST:LOCAL_PORT) are
+resolved in-process from the DID document store, other DIDs over the network.
 """
 
-import json
 import logging
-import aiohttp
-from pathlib import Path
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from urllib.parse import unquote
 
+from agent_connect.authentication import resolve_did_wba_document
+
+from auth.resolver_guard import resolver_guard
+from core.config import settings
+from core.did_store import did_store
+from core.domains import get_tenant
+
+
+@lru_cache(maxsize=1)
+def get_self_hosted_hosts() -> FrozenSet[str]:
+    """
+    Get the hosts (with port) whose DIDs are served by this server:
+    WBA_SERVER_DOMAINS and LOCAL_HOST:LOCAL_PORT.
+
+    Returns:
+        FrozenSet[str]: Lowercase hosts
+    """
+    hosts = {domain.lower() for domain in settings.WBA_SERVER_DOMAINS if domain}
+    hosts.add(f"{settings.LOCAL_HOST}:{settings.LOCAL_PORT}".lower())
+    # DIDs generated by this example use localhost even when binding to all interfaces
+    hosts.add(f"localhost:{settings.LOCAL_PORT}")
+    return frozenset(hosts)
+
+
+def _parse_did(did: str) -> Optional[Tuple[str, List[str]]]:
+    """Split a did:wba identifier into its decoded host and path segments."""
+    parts = did.split(":")
+    if len(parts) < 5 or parts[0] != "did" or parts[1] != "wba":
+        return None
+    return unquote(parts[2]).lower(), parts[3:]
+
+
+def is_self_hosted_did(did: str) -> bool:
+    """
+    Check whether a DID is hosted by this server.
+
+    Args:
+        did: DID identifier
+
+    Returns:
+        bool: Whether the DID's host is one of the self-hosted hosts
+    """
+    parsed = _parse_did(did)
+    return parsed is not None and parsed[0] in get_self_hosted_hosts()
+
+
+def resolve_self_hosted_did_document(did: str) -> Optional[Dict]:
+    """
+    Resolve a DID hosted by this server from the DID document store, without
+    going through the network.
+
+    Args:
+        did: DID identifier, e.g., did:wba:localhost%3A8000:wba:user:123456
+
+    Returns:
+        Optional[Dict]: DID document, or None if it does not exist
+    """
+    parsed = _parse_did(did)
+    if parsed is None:
+        return None
+    host, path_segments = parsed
+
+    # Only /wba/user/{user_id}/did.json documents are served by this server
+    if len(path_segments) != 3 or path_segments[:2] != ["wba", "user"]:
+        logging.error(f"DID path not served by this server: {did}")
+        return None
+
+    try:
+        tenant = get_tenant(host)
+        store = tenant.did_store if tenant else did_store
+        did_document = store.load(path_segments[2])
+    except ValueError as e:
+        logging.error(f"Invalid DID user ID: {e}")
+        return None
+    if did_document is None:
+        logging.error(f"No DID document stored for self-hosted DID: {did}")
+    elif did_document.get("id") != did:
+        logging.error(f"Stored DID document does not belong to {did}")
+        return None
+    return did_document
+
 
 async def resolve_local_did_document(did: str) -> Optional[Dict]:
     """
     Resolve local DID document.
 
+    DIDs hosted by this server are read from the DID document store, other
+    DIDs are fetched via HTTP from their host.
+
     Args:
         did: DID identifier, e.g., did:wba:localhost%3A8000:wba:user:123456
 
@@ -24,47 +109,61 @@ async def resolve_local_did_document(did: str) -> Optional[Dict]:
         logging.info(f"Resolving local DID document: {did}")
 
         # Parse DID identifier
-        parts = did.split(":")
-        if len(parts) < 5 or parts[0] != "did" or parts[1] != "wba":
+        parsed = _parse_did(did)
+        if parsed is None:
             logging.error(f"Invalid DID format: {did}")
             return None
+        hostname, path_segments = parsed
 
-        # Extract hostname, port and user ID
-        hostname = parts[2]
-        # Decode port part if present
-        if "%3A" in hostname:
-            hostname = unquote(hostname)  # Decode %3A to :
+        if hostname in get_self_hosted_hosts():
+            return resolve_self_hosted_did_document(did)
 
-        path_segments = parts[3:]
         user_id = path_segments[-1]
-
         logging.info(f"DID resolution result - hostname: {hostname}, user ID: {user_id}")
 
-        # Search for DID document in local filesystem
-        current_dir = Path(__file__).parent.parent.absolute()
-        did_path = current_dir / "did_keys" / f"user_{user_id}" / "did.json"
-
-        if did_path.exists():
-            logging.info(f"Found local DID document: {did_path}")
-            with open(did_path, "r", encoding="utf-8") as f:
-                did_document = json.load(f)
-            return did_document
-
-        # If not found locally, try to get via HTTP request
         http_url = f"http://{hostname}/wba/user/{user_id}/did.json"
         logging.info(f"Attempting to fetch DID document via HTTP: {http_url}")
 
-        # Use async HTTP request here
-        async with aiohttp.ClientSession() as session:
-            async with session.get(http_url, ssl=False) as response:
-                if response.status == 200:
-                    did_document = await response.json()
-                    logging.info("Successfully fetched DID document via HTTP")
-                    return did_document
-                else:
-                    logging.error(f"HTTP request failed, status code: {response.status}")
-                    return None
+        # Fetch under the per-host concurrency cap, deadlines and circuit breaker
+        did_document = await resolver_guard.fetch_json(http_url)
+        if did_document is not None:
+            logging.info("Successfully fetched DID document via HTTP")
+        return did_document
 
     except Exception as e:
         logging.error(f"Error resolving DID document: {e}")
         return None
+
+
+async def resolve_did_document(did: str) -> Optional[Dict]:
+    """
+    Resolve a DID document with the custom resolver, falling back to the
+    standard did:wba resolver.
+
+    Args:
+        did: DID identifier
+
+    Returns:
+        Optional[Dict]: Resolved DID document, or None if resolution fails
+    """
+    # DIDs hosted by this server never loop back over the network
+    if is_self_hosted_did(did):
+        return resolve_self_hosted_did_document(did)
+
+    # Try to resolve DID document using custom resolver
+    did_document = await resolve_local_did_document(did)
+    if did_document:
+        return did_document
+
+    # If custom resolver fails, try using standard resolver
+    logging.info(f"Local DID resolution failed, trying standard resolver for DID: {did}")
+    try:
+        # agent_connect reports every failure as None, so None counts against the host
+        return await resolver_guard.call(
+            unquote(did.split(":")[2]),
+            lambda: resolve_did_wba_document(did),
+            none_is_failure=True,
+        )
+    except Exception as e:
+        logging.error(f"Standard DID resolver also failed: {e}")
+        return None
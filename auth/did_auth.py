@@ -2,125 +2,73 @@
 DID WBA authentication module with both client and server capabilities.
 """
 
-import json
 import logging
 import traceback
 import secrets
+import time
+from datetime import timedelta
 import aiohttp
 from typing import Dict, Tuple, Optional, Any
-from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
-from fastapi import Request, HTTPException
+from fastapi import HTTPException
+from fastapi.requests import HTTPConnection
 from agent_connect.authentication import (
-    verify_auth_header_signature,
-    resolve_did_wba_document,
-    extract_auth_header_parts,
     create_did_wba_document,
     DIDWbaAuthHeader,
 )
 
-from auth.custom_did_resolver import resolve_local_did_document
-
 from core.config import settings
+from core.did_store import write_file_atomic
+from core.domains import DEFAULT_TENANT, Tenant, get_request_tenant, get_tenant
+from auth.audit_log import OUTCOME_ACCEPTED, OUTCOME_REJECTED, audit_log
+from auth.auth_context import SCHEME_DID_WBA
 from auth.token_auth import create_access_token
-
-# Store server-generated nonces
-VALID_SERVER_NONCES: Dict[str, datetime] = {}
-
-
-def is_valid_server_nonce(nonce: str) -> bool:
-    """
-    Check if a nonce is valid and not expired.
-    Each nonce can only be used once (proper nonce behavior).
-
-    Args:
-        nonce: The nonce to check
-
-    Returns:
-        bool: Whether the nonce is valid
-    """
-    current_time = datetime.now(timezone.utc)
-    
-    # Clean up expired nonces first
-    expired_nonces = [
-        n for n, t in VALID_SERVER_NONCES.items()
-        if current_time - t > timedelta(minutes=settings.NONCE_EXPIRATION_MINUTES)
-    ]
-    for n in expired_nonces:
-        del VALID_SERVER_NONCES[n]
-    
-    # If nonce was already used, reject it
-    if nonce in VALID_SERVER_NONCES:
-        logging.warning(f"Nonce already used: {nonce}")
-        return False
-    
-    # Mark nonce as used
-    VALID_SERVER_NONCES[nonce] = current_time
-    logging.info(f"Nonce accepted and marked as used: {nonce}")
-    return True
-
-
-def verify_timestamp(timestamp_str: str) -> bool:
-    """
-    Verify if a timestamp is within the valid period.
-
-    Args:
-        timestamp_str: ISO format timestamp string
-
-    Returns:
-        bool: Whether the timestamp is valid
-    """
-    try:
-        # Parse the timestamp string
-        request_time = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-
-        # Get current time
-        current_time = datetime.now(timezone.utc)
-
-        # Calculate time difference
-        time_diff = abs((current_time - request_time).total_seconds() / 60)
-
-        # Verify timestamp is within valid period
-        if time_diff > settings.TIMESTAMP_EXPIRATION_MINUTES:
-            logging.error(
-                f"Timestamp expired. Current time: {current_time}, Request time: {request_time}, Difference: {time_diff} minutes"
-            )
-            return False
-
-        return True
-
-    except ValueError as e:
-        logging.error(f"Invalid timestamp format: {e}")
-        return False
-    except Exception as e:
-        logging.error(f"Error verifying timestamp: {e}")
-        return False
+from auth.token_store import attach_token_store
+from auth.clock_skew import (
+    clock_skew,
+    generate_skew_adjusted_auth_header,
+    is_timestamp_error,
+)
+# The nonce store and timestamp check live with the verification stages
+from auth.did_verification import (
+    VALID_SERVER_NONCES,
+    is_valid_server_nonce,
+    verify_did_wba_header,
+    verify_timestamp,
+)
+from utils import fast_json
 
 
-def get_and_validate_domain(request: Request) -> str:
+def get_and_validate_domain(request: HTTPConnection) -> str:
     """
     Get the domain from the request.
 
     Args:
-        request: FastAPI request object
+        request: FastAPI request or WebSocket
 
     Returns:
-        str: Domain from request host header
+        str: Domain from request host header, without port
+
+    Raises:
+        HTTPException: 421 when the domain is not served by this server
     """
-    # Get host from request
-    host = request.headers.get("host", "")
-    domain = host.split(":")[0]
-    return domain
+    return get_request_tenant(request).domain
 
 
-async def handle_did_auth(authorization: str, domain: str) -> Dict:
+async def handle_did_auth(
+    authorization: str, domain: str, tenant: Optional[Tenant] = None
+) -> Dict:
     """
     Handle DID WBA authentication and return token.
 
+    Verification runs in stages ordered by cost (see auth.did_verification);
+    the nonce is only marked as used once the signature has been verified.
+
     Args:
         authorization: DID WBA authorization header
         domain: Domain for DID WBA verification
+        tenant: Tenant issuing the token (default: the tenant of domain)
 
     Returns:
         Dict: Authentication result with token
@@ -128,92 +76,110 @@ async def handle_did_auth(authorization: str, domain: str) -> Dict:
     Raises:
         HTTPException: When authentication fails
     """
+    started = time.perf_counter()
+    did = None
     try:
-        logging.info(
-            f"Processing DID WBA authentication - domain: {domain}, Authorization header: {authorization}"
+        logging.info(f"Processing DID WBA authentication - domain: {domain}")
+
+        result = await verify_did_wba_header(authorization, domain)
+        did = result.did
+        if not result.ok:
+            raise result.rejection.to_http_exception()
+
+        # Generate access token (expiry taken before issuance, never later than the token's)
+        tenant = tenant or get_tenant(domain) or DEFAULT_TENANT
+        lifetime = timedelta(minutes=tenant.token_lifetime_minutes)
+        now = time.time()
+        expires_at = now + lifetime.total_seconds()
+        jti = secrets.token_hex(16)
+        access_token = create_access_token(
+            data={"sub": did, "jti": jti},
+            expires_delta=lifetime,
+            key_path=tenant.jwt_private_key_path,
         )
 
-        # Extract header parts
-        header_parts = extract_auth_header_parts(authorization)
-
-        if not header_parts:
-            raise HTTPException(
-                status_code=401, detail="Invalid authorization header format"
-            )
-
-        # Unpack order: (did, nonce, timestamp, verification_method, signature)
-        did, nonce, timestamp, verification_method, signature = header_parts
-
-        logging.info(f"Processing DID WBA authentication - DID: {did}, Verification Method: {verification_method}")
-
-        # Verify timestamp
-        if not verify_timestamp(timestamp):
-            raise HTTPException(status_code=401, detail="Timestamp expired or invalid")
-
-        # Verify nonce validity
-        if not is_valid_server_nonce(nonce):
-            logging.error(f"Invalid or expired nonce: {nonce}")
-            raise HTTPException(status_code=401, detail="Invalid or expired nonce")
+        logging.info(f"Authentication successful, access token generated - DID: {did}")
+        audit_log.record(
+            SCHEME_DID_WBA, did, OUTCOME_ACCEPTED, "", domain, time.perf_counter() - started
+        )
 
-        # Try to resolve DID document using custom resolver
-        did_document = await resolve_local_did_document(did)
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "did": did,
+            "expires_at": expires_at,
+            "jti": jti,
+            # iat has second precision and is never earlier than this
+            "issued_at": float(int(now)),
+        }
+
+    except HTTPException as exc:
+        audit_log.record(
+            SCHEME_DID_WBA, did, OUTCOME_REJECTED, exc.detail, domain, time.perf_counter() - started
+        )
+        raise
+    except Exception as e:
+        logging.error(f"Error during DID authentication: {e}")
+        logging.error(traceback.format_exc())
+        audit_log.record(
+            SCHEME_DID_WBA,
+            did,
+            OUTCOME_REJECTED,
+            "Authentication error",
+            domain,
+            time.perf_counter() - started,
+        )
+        raise HTTPException(status_code=500, detail="Authentication error")
 
-        # If custom resolver fails, try using standard resolver
-        if not did_document:
-            logging.info(f"Local DID resolution failed, trying standard resolver for DID: {did}")
-            try:
-                did_document = await resolve_did_wba_document(did)
-            except Exception as e:
-                logging.error(f"Standard DID resolver also failed: {e}")
-                did_document = None
 
-        if not did_document:
-            raise HTTPException(
-                status_code=401, detail="Failed to resolve DID document"
-            )
+# Client-related functions
+def create_did_identity(unique_id: str) -> Tuple[Dict, Dict]:
+    """
+    Create a DID document and key pair for a user hosted on the local server.
 
-        logging.info(f"Successfully resolved DID document: {did}")
+    Args:
+        unique_id: User unique identifier
 
-        # Verify signature
-        try:
-            # Reconstruct the complete authorization header
-            full_auth_header = authorization
+    Returns:
+        Tuple[Dict, Dict]: DID document and keys ({fragment: (private_key_pem, public_key_pem)})
+    """
+    host = "localhost"
+    return create_did_wba_document(
+        hostname=host,
+        port=settings.LOCAL_PORT,
+        path_segments=["wba", "user", unique_id],
+        agent_description_url=f"http://{host}:{settings.LOCAL_PORT}/agents/example/ad.json",
+    )
 
-            # Call verification function
-            is_valid, message = verify_auth_header_signature(
-                auth_header=full_auth_header,
-                did_document=did_document,
-                service_domain=domain,
-            )
 
-            logging.info(f"Signature verification result: {is_valid}, message: {message}")
+def save_did_identity(user_dir: Path, did_document: Dict, keys: Dict) -> Path:
+    """
+    Save the private keys and DID document of an identity.
 
-            if not is_valid:
-                raise HTTPException(
-                    status_code=401, detail=f"Invalid signature: {message}"
-                )
-        except Exception as e:
-            logging.error(f"Error verifying signature: {e}")
-            raise HTTPException(
-                status_code=401, detail=f"Error verifying signature: {str(e)}"
-            )
+    The private keys are written first and the DID document is written
+    atomically last, so an existing DID document marks a complete identity.
 
-        # Generate access token
-        access_token = create_access_token(data={"sub": did})
+    Args:
+        user_dir: User directory
+        did_document: DID document
+        keys: Keys returned by create_did_identity
 
-        logging.info("Authentication successful, access token generated")
+    Returns:
+        Path: Path of the DID document
+    """
+    user_dir.mkdir(parents=True, exist_ok=True)
 
-        return {"access_token": access_token, "token_type": "bearer", "did": did}
+    # Save private key
+    for method_fragment, (private_key_bytes, _) in keys.items():
+        private_key_path = user_dir / f"{method_fragment}_private.pem"
+        write_file_atomic(private_key_path, private_key_bytes)
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logging.error(f"Error during DID authentication: {e}")
-        logging.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail="Authentication error")
+    # Save DID document
+    did_path = user_dir / settings.DID_DOCUMENT_FILENAME
+    write_file_atomic(did_path, fast_json.dumps(did_document, indent=True))
+    return did_path
 
 
-# Client-related functions
 async def generate_or_load_did(unique_id: str = None) -> Tuple[Dict, Dict, str]:
     """
     Generate a new DID document or load an existing DID document.
@@ -236,8 +202,7 @@ async def generate_or_load_did(unique_id: str = None) -> Tuple[Dict, Dict, str]:
         logging.info(f"Loading existing DID document from {did_path}")
 
         # Load DID document
-        with open(did_path, "r", encoding="utf-8") as f:
-            did_document = json.load(f)
+        did_document = fast_json.load_file(did_path)
 
         # Create empty keys dictionary since we already have private key file
         keys = {}
@@ -246,28 +211,11 @@ async def generate_or_load_did(unique_id: str = None) -> Tuple[Dict, Dict, str]:
 
     # Create DID document
     logging.info("Creating new DID document...")
-    host = "localhost"
-    did_document, keys = create_did_wba_document(
-        hostname=host,
-        port=settings.LOCAL_PORT,
-        path_segments=["wba", "user", unique_id],
-        agent_description_url=f"http://{host}:{settings.LOCAL_PORT}/agents/example/ad.json",
-    )
+    did_document, keys = create_did_identity(unique_id)
 
     # Save private key and DID document
-    user_dir.mkdir(parents=True, exist_ok=True)
-
-    # Save private key
-    for method_fragment, (private_key_bytes, _) in keys.items():
-        private_key_path = user_dir / f"{method_fragment}_private.pem"
-        with open(private_key_path, "wb") as f:
-            f.write(private_key_bytes)
-        logging.info(f"Saved private key '{method_fragment}' to {private_key_path}")
-
-    # Save DID document
-    with open(did_path, "w", encoding="utf-8") as f:
-        json.dump(did_document, f, indent=2)
-    logging.info(f"Saved DID document to {did_path}")
+    save_did_identity(user_dir, did_document, keys)
+    logging.info(f"Saved private keys and DID document to {user_dir}")
 
     return did_document, keys, str(user_dir)
 
@@ -281,6 +229,13 @@ async def send_authenticated_request(
     """
     Send request with DID WBA authentication.
 
+    A stored bearer token for the target is used first: from the auth client,
+    or from the persistent token store when CLIENT_TOKEN_STORE_PATH is set. If
+    the server rejects the token, it is cleared and the request is retried
+    once with a DID WBA header. If the server rejects the DID WBA header for
+    its timestamp, the request is retried once with a header timestamped by
+    the server clock estimated from the X-Server-Time response header.
+
     Args:
         target_url: Target URL
         auth_client: DID WBA authentication client
@@ -290,34 +245,70 @@ async def send_authenticated_request(
     Returns:
         Tuple[int, Dict[str, Any], Optional[str]]: Status code, response, and token
     """
+    if method.upper() not in ("GET", "POST"):
+        logging.error(f"Unsupported HTTP method: {method}")
+        return 400, {"error": "Unsupported HTTP method"}, None
+
     try:
+        # Reuse tokens obtained by earlier runs or other client processes
+        attach_token_store(auth_client)
+
         # Get authentication headers
         auth_headers = auth_client.get_auth_header(target_url)
 
-        logging.info(
-            f"Sending authenticated request to {target_url} with headers: {auth_headers}"
-        )
+        async with aiohttp.ClientSession(
+            json_serialize=fast_json.dumps_str
+        ) as session:
+            for attempt in range(2):
+                used_token = auth_headers["Authorization"].startswith("Bearer ")
 
-        async with aiohttp.ClientSession() as session:
-            if method.upper() == "GET":
-                async with session.get(target_url, headers=auth_headers) as response:
-                    status = response.status
-                    response_data = await response.json() if status == 200 else {}
-                    # x = dict(response.headers)
-                    token = auth_client.update_token(target_url, dict(response.headers))
-                    # token = auth_client.update_token(target_url, response_data )
-                    return status, response_data, token
-            elif method.upper() == "POST":
-                async with session.post(
-                    target_url, headers=auth_headers, json=json_data
+                logging.info(
+                    f"Sending authenticated request to {target_url} with headers: {auth_headers}"
+                )
+
+                sent_at = time.time()
+                async with session.request(
+                    method.upper(),
+                    target_url,
+                    headers=auth_headers,
+                    json=json_data if method.upper() == "POST" else None,
                 ) as response:
+                    clock_skew.observe(
+                        target_url, response.headers, sent_at, time.time()
+                    )
                     status = response.status
-                    response_data = await response.json() if status == 200 else {}
+                    response_data = (
+                        await response.json(loads=fast_json.loads)
+                        if status == 200
+                        or (status == 401 and response.content_type == "application/json")
+                        else {}
+                    )
+
+                    if status == 401 and attempt == 0:
+                        if used_token:
+                            logging.info(
+                                f"Stored token rejected by {target_url}, authenticating with DID WBA"
+                            )
+                            auth_client.clear_token(target_url)
+                            auth_headers = auth_client.get_auth_header(target_url)
+                            continue
+                        if is_timestamp_error(status, response_data) and isinstance(
+                            auth_client, DIDWbaAuthHeader
+                        ):
+                            logging.info(
+                                f"DID WBA timestamp rejected by {target_url}, retrying with server time"
+                            )
+                            auth_headers = {
+                                "Authorization": generate_skew_adjusted_auth_header(
+                                    auth_client, auth_client._get_domain(target_url)
+                                )
+                            }
+                            continue
+
+                    if status != 200:
+                        response_data = {}
                     token = auth_client.update_token(target_url, dict(response.headers))
                     return status, response_data, token
-            else:
-                logging.error(f"Unsupported HTTP method: {method}")
-                return 400, {"error": "Unsupported HTTP method"}, None
     except Exception as e:
         logging.error(f"Error sending authenticated request: {e}", exc_info=True)
         return 500, {"error": str(e)}, None
@@ -340,19 +331,36 @@ async def send_request_with_token(
     """
     try:
         headers = {"Authorization": f"Bearer {token}"}
+        sent_at = time.time()
 
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(
+            json_serialize=fast_json.dumps_str
+        ) as session:
             if method.upper() == "GET":
                 async with session.get(target_url, headers=headers) as response:
+                    clock_skew.observe(
+                        target_url, response.headers, sent_at, time.time()
+                    )
                     status = response.status
-                    response_data = await response.json() if status == 200 else {}
+                    response_data = (
+                        await response.json(loads=fast_json.loads)
+                        if status == 200
+                        else {}
+                    )
                     return status, response_data
             elif method.upper() == "POST":
                 async with session.post(
                     target_url, headers=headers, json=json_data
                 ) as response:
+                    clock_skew.observe(
+                        target_url, response.headers, sent_at, time.time()
+                    )
                     status = response.status
-                    response_data = await response.json() if status == 200 else {}
+                    response_data = (
+                        await response.json(loads=fast_json.loads)
+                        if status == 200
+                        else {}
+                    )
                     return status, response_data
             else:
                 logging.error(f"Unsupported HTTP method: {method}")
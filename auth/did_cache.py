@@ -0,0 +1,345 @@
+"""
+DID document cache with refresh-ahead and startup warmup.
+
+Resolved DID documents are kept for DID_CACHE_TTL_SECONDS. Hot documents
+(used at least DID_CACHE_HOT_THRESHOLD times during their current TTL) are
+re-fetched in the background once they are within
+DID_CACHE_REFRESH_AHEAD_SECONDS of expiry, so handshakes for active DIDs never
+wait on resolution after the first one.
+
+Access counts are persisted to DID_CACHE_STATS_PATH on shutdown, so the next
+start can warm up the most used DIDs of the previous run.
+
+With DID_CACHE_L2_BACKEND set, misses and refreshes go through the shared
+second-level cache (auth/did_cache_l2.py) before resolving over the network.
+
+invalidate_did_document() flushes a document, e.g. after a key rotation or
+compromise: the shared copy at once, the copies of the other workers at their
+next revocation sync (auth/revocation.py).
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from auth.custom_did_resolver import is_self_hosted_did, resolve_did_document
+from auth.did_cache_l2 import L2DocumentCache, create_l2_cache
+from auth.revocation import revocation_list
+from core.config import settings
+from core.did_store import write_file_atomic
+from utils import fast_json
+
+Resolver = Callable[[str], Awaitable[Optional[Dict]]]
+
+
+class _CacheEntry:
+    __slots__ = ("document", "expires_at", "hits")
+
+    def __init__(self, document: Dict, expires_at: float):
+        self.document = document
+        self.expires_at = expires_at
+        self.hits = 0
+
+
+class DIDDocumentCache:
+    """TTL cache of resolved DID documents with single-flight resolution."""
+
+    def __init__(
+        self,
+        resolver: Resolver = resolve_did_document,
+        should_cache: Callable[[str], bool] = lambda did: not is_self_hosted_did(did),
+        ttl: float = 300.0,
+        refresh_ahead: float = 30.0,
+        hot_threshold: int = 2,
+        max_entries: int = 10000,
+        stats_path: str = "",
+        l2: Optional[L2DocumentCache] = None,
+    ):
+        """
+        Args:
+            resolver: Coroutine function resolving a DID to its document
+            should_cache: Whether a DID's document is cached; self-hosted DIDs
+                are read from the local store, which is always current
+            ttl: Seconds a resolved document is used
+            refresh_ahead: Seconds before expiry at which hot documents are re-fetched
+            hot_threshold: Uses during the current TTL that make a document hot
+            max_entries: Maximum number of cached documents
+            stats_path: File for access statistics, empty disables persistence
+            l2: Cache shared with other workers, consulted before the resolver
+        """
+        self.resolver = resolver
+        self.should_cache = should_cache
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.hot_threshold = hot_threshold
+        self.max_entries = max_entries
+        self.stats_path = stats_path
+        self.l2 = l2
+
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh_tasks: set = set()
+        self._refreshing: set = set()
+        self.access_counts: Counter = Counter()
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    async def get(self, did: str) -> Optional[Dict]:
+        """
+        Get the DID document of a DID, resolving it on a miss.
+
+        Args:
+            did: DID identifier
+
+        Returns:
+            Optional[Dict]: DID document, or None if resolution fails
+        """
+        if not self.should_cache(did):
+            return await self.resolver(did)
+
+        self._count_access(did)
+        now = time.monotonic()
+        entry = self._entries.get(did)
+        if entry is not None and now < entry.expires_at:
+            self.hits += 1
+            entry.hits += 1
+            self._entries.move_to_end(did)
+            if (
+                entry.hits >= self.hot_threshold
+                and now >= entry.expires_at - self.refresh_ahead
+            ):
+                self._schedule_refresh(did)
+            return entry.document
+
+        self.misses += 1
+        return await self._resolve(did)
+
+    def _count_access(self, did: str) -> None:
+        """Count a use of a DID, keeping the statistics bounded."""
+        self.access_counts[did] += 1
+        if len(self.access_counts) > 10 * self.max_entries:
+            self.access_counts = Counter(
+                dict(self.access_counts.most_common(self.max_entries))
+            )
+
+    async def _resolve(self, did: str) -> Optional[Dict]:
+        """Resolve a DID once for all concurrent callers and store the result."""
+        pending = self._inflight.get(did)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[did] = future
+        try:
+            if self.l2 is None:
+                document, ttl = await self.resolver(did), self.ttl
+            else:
+                # A shared document about to expire is refreshed instead of reused
+                document, ttl = await self.l2.get_or_resolve(
+                    did, self.resolver, min_remaining=self.refresh_ahead
+                )
+            if document is not None:
+                self.put(did, document, min(ttl, self.ttl))
+            future.set_result(document)
+            return document
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting
+            future.exception()
+            raise
+        finally:
+            # Concurrent callers must not wait forever if this call is cancelled
+            if not future.done():
+                future.cancel()
+            del self._inflight[did]
+
+    def _schedule_refresh(self, did: str) -> None:
+        """Re-fetch a hot document in the background, keeping the current one meanwhile."""
+        if did in self._refreshing or did in self._inflight:
+            return
+        self.refreshes += 1
+        self._refreshing.add(did)
+        task = asyncio.get_running_loop().create_task(self._resolve(did))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(lambda task: self._refresh_done(did, task))
+
+    def _refresh_done(self, did: str, task: asyncio.Task) -> None:
+        self._refresh_tasks.discard(task)
+        self._refreshing.discard(did)
+        if not task.cancelled() and task.exception() is not None:
+            logging.warning(f"Background DID document refresh failed: {task.exception()}")
+
+    def put(self, did: str, document: Dict, ttl: Optional[float] = None) -> None:
+        """
+        Store a resolved DID document.
+
+        Args:
+            did: DID identifier
+            document: DID document
+            ttl: Seconds the document is used (default: the cache TTL)
+        """
+        self._entries[did] = _CacheEntry(
+            document, time.monotonic() + (self.ttl if ttl is None else ttl)
+        )
+        self._entries.move_to_end(did)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, did: str) -> None:
+        """
+        Drop the cached document of a DID from this worker only.
+
+        Args:
+            did: DID identifier
+        """
+        self._entries.pop(did, None)
+
+    async def invalidate(self, did: str) -> None:
+        """
+        Drop the cached document of a DID, and its shared copy for all workers.
+
+        Args:
+            did: DID identifier
+        """
+        self.discard(did)
+        if self.l2 is not None:
+            await self.l2.invalidate(did)
+
+    async def warmup(
+        self, dids: Iterable[str], concurrency: int = 10, timeout: float = 10.0
+    ) -> int:
+        """
+        Preload DID documents, bounded by a deadline so startup never hangs.
+
+        Args:
+            dids: DIDs to preload
+            concurrency: Concurrent resolutions
+            timeout: Seconds after which the warmup is abandoned
+
+        Returns:
+            int: Number of documents loaded
+        """
+        dids = [
+            did
+            for did in dict.fromkeys(dids)
+            if did not in self._entries and self.should_cache(did)
+        ]
+        if not dids:
+            return 0
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def load(did: str) -> bool:
+            async with semaphore:
+                try:
+                    return await self._resolve(did) is not None
+                except Exception as e:
+                    logging.warning(f"Error warming up DID document {did}: {e}")
+                    return False
+
+        started = time.monotonic()
+        tasks = [asyncio.ensure_future(load(did)) for did in dids]
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        loaded = sum(1 for task in done if task.result())
+        logging.info(
+            f"Warmed up {loaded}/{len(dids)} DID documents in "
+            f"{time.monotonic() - started:.2f}s"
+        )
+        return loaded
+
+    def load_access_stats(self) -> None:
+        """Load the access counts persisted by the previous run."""
+        if not self.stats_path or not Path(self.stats_path).exists():
+            return
+        try:
+            counts = fast_json.load_file(self.stats_path)
+            # Halve old counts so the ranking follows current usage
+            self.access_counts.update(
+                {did: count // 2 for did, count in counts.items() if count > 1}
+            )
+        except Exception as e:
+            logging.warning(f"Error loading DID access statistics: {e}")
+
+    def save_access_stats(self) -> None:
+        """Persist the access counts of the most used DIDs."""
+        if not self.stats_path:
+            return
+        try:
+            write_file_atomic(
+                Path(self.stats_path),
+                fast_json.dumps(dict(self.access_counts.most_common(self.max_entries))),
+            )
+        except Exception as e:
+            logging.warning(f"Error saving DID access statistics: {e}")
+
+    def top_dids(self, count: int) -> List[str]:
+        """Return the most used DIDs."""
+        return [did for did, _ in self.access_counts.most_common(count)]
+
+    async def close(self) -> None:
+        """Cancel background refreshes and close the shared cache connection."""
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        if self._refresh_tasks:
+            await asyncio.gather(*self._refresh_tasks, return_exceptions=True)
+        if self.l2 is not None:
+            await self.l2.close()
+
+    def stats(self) -> Dict:
+        """Return cache statistics."""
+        stats = {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+        }
+        if self.l2 is not None:
+            stats["l2"] = self.l2.stats()
+        return stats
+
+
+did_document_cache = DIDDocumentCache(
+    ttl=settings.DID_CACHE_TTL_SECONDS,
+    refresh_ahead=settings.DID_CACHE_REFRESH_AHEAD_SECONDS,
+    hot_threshold=settings.DID_CACHE_HOT_THRESHOLD,
+    max_entries=settings.DID_CACHE_MAX_ENTRIES,
+    stats_path=settings.DID_CACHE_STATS_PATH,
+    l2=create_l2_cache(),
+)
+revocation_list.add_document_listener(did_document_cache.discard)
+
+
+async def invalidate_did_document(did: str) -> None:
+    """
+    Invalidate the cached DID document of a DID on every worker: on this
+    worker and in the shared cache now, on the others at their next
+    revocation sync.
+
+    Args:
+        did: DID identifier
+    """
+    await did_document_cache.invalidate(did)
+    revocation_list.invalidate_document(did, did_document_cache.ttl)
+
+
+async def warmup_did_cache() -> int:
+    """
+    Warm up the DID document cache: the DIDs in DID_CACHE_WARMUP_DIDS, then
+    the DID_CACHE_WARMUP_TOP_N most used DIDs of the previous run.
+
+    Returns:
+        int: Number of documents loaded
+    """
+    did_document_cache.load_access_stats()
+    dids = [did.strip() for did in settings.DID_CACHE_WARMUP_DIDS.split(",") if did.strip()]
+    dids += did_document_cache.top_dids(settings.DID_CACHE_WARMUP_TOP_N)
+    return await did_document_cache.warmup(
+        dids, timeout=settings.DID_CACHE_WARMUP_TIMEOUT
+    )
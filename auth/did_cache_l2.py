@@ -0,0 +1,579 @@
+"""
+Second-level DID document cache shared by workers and nodes.
+
+The in-process DIDDocumentCache (L1) asks this cache before resolving a remote
+DID, and stores what it resolves here, so a DID is resolved once per TTL for
+all workers instead of once per worker. Backends:
+
+- "redis": any Redis-protocol server (Redis, Valkey, KeyDB...), shared by
+  nodes, through a minimal pipelined RESP client (no extra dependency)
+- "sqlite": a SQLite file shared by the workers of one host
+- "memory": an in-process fake with the same semantics, for tests
+
+Invalidation is versioned: every DID has a version counter next to its
+document, and a document is only used when it was written under the current
+version. invalidate() increments the counter, so a worker still writing a
+document resolved before the invalidation cannot bring it back.
+
+Lookups are micro-batched: those made within DID_CACHE_L2_BATCH_WINDOW_MS are
+sent as one multi-key read. When a document is missing, one worker takes a
+short resolution lease and the others wait for its result instead of
+resolving the same DID, which keeps outbound resolution traffic constant as
+workers are added. Any backend error is logged and treated as a miss: the L2
+cache never fails an authentication.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from core.config import settings
+from utils import fast_json
+
+Resolver = Callable[[str], Awaitable[Optional[Dict]]]
+
+
+class MemoryL2Backend:
+    """In-process key-value store with the semantics of the shared backends."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    def _get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.time():
+            del self._data[key]
+            return None
+        return item[0]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self._get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._data[key] = (value, time.time() + ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        if self._get(key) is not None:
+            return False
+        self._data[key] = (value, time.time() + ttl)
+        return True
+
+    async def incr(self, key: str) -> int:
+        value = int(self._get(key) or 0) + 1
+        self._data[key] = (str(value).encode(), None)
+        return value
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteL2Backend:
+    """
+    Key-value store in a SQLite file shared by all workers on one host.
+
+    Statements are short and run on the event loop like the SQLite rate limit
+    backend, with a short busy timeout.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._operations = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection of the current thread, opened on first use.
+
+        A connection must not be used on both sides of a fork(), so one opened
+        by another process (the pre-fork parent) is replaced.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS did_cache_l2 ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        rows = self._connect().execute(
+            f"SELECT key, value FROM did_cache_l2 WHERE key IN ({','.join('?' * len(keys))}) "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, now),
+        )
+        values = dict(rows.fetchall())
+        return [values.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO did_cache_l2 (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl),
+        )
+        self._operations += 1
+        if self._operations % 1000 == 0:
+            self._connect().execute(
+                "DELETE FROM did_cache_l2 WHERE expires_at <= ?", (time.time(),)
+            )
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT expires_at FROM did_cache_l2 WHERE key = ?", (key,)
+            ).fetchone()
+            added = row is None or (row[0] is not None and row[0] <= now)
+            if added:
+                conn.execute(
+                    "INSERT OR REPLACE INTO did_cache_l2 (key, value, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, value, now + ttl),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    async def incr(self, key: str) -> int:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM did_cache_l2 WHERE key = ?", (key,)).fetchone()
+            value = int(row[0] if row else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO did_cache_l2 (key, value, expires_at) VALUES (?, ?, NULL)",
+                (key, str(value).encode()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    async def delete(self, key: str) -> None:
+        self._connect().execute("DELETE FROM did_cache_l2 WHERE key = ?", (key,))
+
+    async def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+
+class RedisError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+class RedisL2Backend:
+    """
+    Minimal client of a Redis-protocol server (RESP2), pipelining commands on
+    a single connection opened on first use.
+    """
+
+    def __init__(self, url: str, timeout: float = 0.5):
+        """
+        Args:
+            url: Server URL, redis://[:password@]host[:port][/db]
+            timeout: Seconds to connect or to wait for a reply
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._replies: deque = deque()
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        """Encode a command as a RESP array of bulk strings."""
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    @classmethod
+    async def read_reply(cls, reader: asyncio.StreamReader):
+        """Read one RESP reply; error replies are returned as RedisError."""
+        line = await reader.readuntil(b"\r\n")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            return RedisError(payload.decode(errors="replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            return (await reader.readexactly(length + 2))[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await cls.read_reply(reader) for _ in range(length)]
+        raise ConnectionError(f"Invalid RESP reply: {line[:32]!r}")
+
+    async def _connect(self) -> None:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+            setup = []
+            if self.password:
+                setup.append(self.encode("AUTH", self.password))
+            if self.db:
+                setup.append(self.encode("SELECT", self.db))
+            if setup:
+                writer.write(b"".join(setup))
+                for _ in setup:
+                    reply = await asyncio.wait_for(self.read_reply(reader), self.timeout)
+                    if isinstance(reply, RedisError):
+                        writer.close()
+                        raise reply
+            self._reader, self._writer = reader, writer
+            self._read_task = asyncio.get_running_loop().create_task(self._read_loop(reader))
+            logging.info(f"Connected to DID cache L2 server {self.host}:{self.port}/{self.db}")
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        """Resolve pending commands with their replies, in order."""
+        try:
+            while True:
+                reply = await self.read_reply(reader)
+                if self._replies:
+                    future = self._replies.popleft()
+                    if not future.done():
+                        future.set_result(reply)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            self._reset(ConnectionError(f"DID cache L2 connection lost: {e}"))
+
+    def _reset(self, error: Exception) -> None:
+        """Drop the connection, failing the commands waiting for a reply."""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        if self._read_task is not None and self._read_task is not asyncio.current_task():
+            self._read_task.cancel()
+        self._read_task = None
+        while self._replies:
+            future = self._replies.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    async def execute(self, *args):
+        """
+        Send a command and wait for its reply.
+
+        Raises:
+            RedisError: When the server answers with an error
+            ConnectionError, asyncio.TimeoutError: When the server is unavailable
+        """
+        if self._writer is None:
+            await self._connect()
+        future = asyncio.get_running_loop().create_future()
+        self._replies.append(future)
+        self._writer.write(self.encode(*args))
+        try:
+            reply = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            # Replies of later commands would be matched to the wrong callers
+            self._reset(ConnectionError("DID cache L2 server timed out"))
+            raise
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await self.execute("MGET", *keys)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.execute("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return await self.execute("SET", key, value, "NX", "PX", max(1, int(ttl * 1000))) is not None
+
+    async def incr(self, key: str) -> int:
+        return await self.execute("INCR", key)
+
+    async def delete(self, key: str) -> None:
+        await self.execute("DEL", key)
+
+    async def close(self) -> None:
+        self._reset(ConnectionError("DID cache L2 connection closed"))
+
+
+class _Lookup:
+    """Result of an L2 lookup: the document if usable, and the DID's current version."""
+
+    __slots__ = ("document", "expires_at", "version")
+
+    def __init__(
+        self,
+        document: Optional[Dict] = None,
+        expires_at: float = 0.0,
+        version: Optional[int] = None,
+    ):
+        self.document = document
+        self.expires_at = expires_at
+        # None when the backend is unavailable
+        self.version = version
+
+
+class L2DocumentCache:
+    """Versioned, batched DID document cache on a shared key-value backend."""
+
+    def __init__(
+        self,
+        backend,
+        ttl: float = 300.0,
+        batch_window: float = 0.002,
+        batch_size: int = 100,
+        lease: float = 5.0,
+        prefix: str = "didcache",
+    ):
+        """
+        Args:
+            backend: MemoryL2Backend, SQLiteL2Backend or RedisL2Backend
+            ttl: Seconds a resolved document is shared
+            batch_window: Seconds lookups are collected into one read
+            batch_size: Lookups that trigger a read before the window ends
+            lease: Seconds a worker may take to resolve a missing document
+                before others resolve it themselves
+            prefix: Key prefix
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.lease = lease
+        self.prefix = prefix
+
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: set = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.resolutions = 0
+        self.batches = 0
+        self.errors = 0
+
+    def _doc_key(self, did: str) -> str:
+        return f"{self.prefix}:doc:{did}"
+
+    def _version_key(self, did: str) -> str:
+        return f"{self.prefix}:ver:{did}"
+
+    def _lease_key(self, did: str) -> str:
+        return f"{self.prefix}:lease:{did}"
+
+    def _error(self, operation: str, e: Exception) -> None:
+        self.errors += 1
+        logging.warning(f"DID cache L2 {operation} failed, resolving without it: {e!r}")
+
+    def lookup(self, did: str) -> "asyncio.Future[_Lookup]":
+        """Queue a lookup into the next batched read."""
+        future = self._pending.get(did)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[did] = future
+            if len(self._pending) >= self.batch_size:
+                self._start_flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.batch_window, self._start_flush)
+        return future
+
+    def _start_flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._flush(pending))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, pending: Dict[str, asyncio.Future]) -> None:
+        """Read the documents and versions of a batch of DIDs at once."""
+        dids = list(pending)
+        keys = []
+        for did in dids:
+            keys += [self._doc_key(did), self._version_key(did)]
+        self.batches += 1
+        try:
+            values = await self.backend.get_many(keys)
+            now = time.time()
+            for i, did in enumerate(dids):
+                raw_document, raw_version = values[2 * i], values[2 * i + 1]
+                result = _Lookup(version=int(raw_version or 0))
+                if raw_document is not None:
+                    try:
+                        envelope = fast_json.loads(raw_document)
+                        if envelope["version"] == result.version and envelope["expires_at"] > now:
+                            result.document = envelope["document"]
+                            result.expires_at = envelope["expires_at"]
+                    except (ValueError, KeyError, TypeError):
+                        pass
+                if not pending[did].done():
+                    pending[did].set_result(result)
+        except Exception as e:
+            self._error("read", e)
+        finally:
+            # Lookups left unanswered proceed as if the backend were unavailable
+            for future in pending.values():
+                if not future.done():
+                    future.set_result(_Lookup())
+
+    async def _store(self, did: str, document: Dict, version: int) -> float:
+        """Share a resolved document under the version read before resolving it."""
+        expires_at = time.time() + self.ttl
+        envelope = {"version": version, "expires_at": expires_at, "document": document}
+        try:
+            await self.backend.set(self._doc_key(did), fast_json.dumps(envelope), self.ttl)
+        except Exception as e:
+            self._error("write", e)
+        return expires_at
+
+    async def get_or_resolve(
+        self, did: str, resolver: Resolver, min_remaining: float = 0.0
+    ) -> Tuple[Optional[Dict], float]:
+        """
+        Get a DID document from the shared cache, or resolve and share it.
+
+        Args:
+            did: DID identifier
+            resolver: Coroutine function resolving a DID to its document
+            min_remaining: Seconds a shared document must still be valid to be used
+
+        Returns:
+            Tuple[Optional[Dict], float]: DID document (None if resolution fails)
+            and the seconds it may be cached
+        """
+        found = await self.lookup(did)
+        if found.document is not None and found.expires_at - time.time() >= min_remaining:
+            self.hits += 1
+            return found.document, found.expires_at - time.time()
+        self.misses += 1
+        if found.version is None:
+            return await resolver(did), self.ttl
+
+        # One worker resolves the DID, the others wait for its result
+        try:
+            leased = await self.backend.add(self._lease_key(did), b"1", self.lease)
+        except Exception as e:
+            self._error("lease", e)
+            leased = True
+
+        if not leased:
+            self.waits += 1
+            deadline = time.monotonic() + self.lease
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                shared = await self.lookup(did)
+                if shared.document is not None and shared.expires_at > found.expires_at:
+                    return shared.document, shared.expires_at - time.time()
+                if shared.version is None:
+                    break
+
+        self.resolutions += 1
+        try:
+            document = await resolver(did)
+            if document is None:
+                return None, self.ttl
+            expires_at = await self._store(did, document, found.version)
+            return document, expires_at - time.time()
+        finally:
+            if leased:
+                try:
+                    await self.backend.delete(self._lease_key(did))
+                except Exception as e:
+                    self._error("lease release", e)
+
+    async def invalidate(self, did: str) -> None:
+        """
+        Invalidate the shared document of a DID for all workers.
+
+        Args:
+            did: DID identifier
+        """
+        try:
+            await self.backend.incr(self._version_key(did))
+            await self.backend.delete(self._doc_key(did))
+        except Exception as e:
+            self._error("invalidation", e)
+
+    async def close(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._start_flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "waits": self.waits,
+            "resolutions": self.resolutions,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+
+def create_l2_cache() -> Optional[L2DocumentCache]:
+    """
+    Create the L2 cache configured in settings.
+
+    Returns:
+        Optional[L2DocumentCache]: The L2 cache, or None when DID_CACHE_L2_BACKEND is empty
+    """
+    kind = settings.DID_CACHE_L2_BACKEND
+    if not kind:
+        return None
+    if kind == "redis":
+        backend = RedisL2Backend(settings.DID_CACHE_L2_URL or "redis://localhost:6379/0")
+    elif kind == "sqlite":
+        # Opened by each worker on first use, never by the pre-fork parent
+        backend = SQLiteL2Backend(settings.DID_CACHE_L2_URL or "did_cache_l2.sqlite3")
+    elif kind == "memory":
+        backend = MemoryL2Backend()
+    else:
+        raise ValueError(f"Unknown DID_CACHE_L2_BACKEND: {kind}")
+    return L2DocumentCache(
+        backend,
+        ttl=settings.DID_CACHE_TTL_SECONDS,
+        batch_window=settings.DID_CACHE_L2_BATCH_WINDOW_MS / 1000,
+        lease=settings.DID_CACHE_L2_LEASE_SECONDS,
+    )
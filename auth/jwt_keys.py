@@ -4,8 +4,12 @@ JWT configuration module providing functions to get JWT public and private keys.
 
 import os
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
+
+from cryptography.hazmat.primitives import serialization
+
 from core.config import settings
+from core.domains import TENANTS
 
 # Ensure key files exist
 if not os.path.exists(settings.JWT_PRIVATE_KEY_PATH):
@@ -17,31 +21,56 @@ if not os.path.exists(settings.JWT_PUBLIC_KEY_PATH):
         f"JWT public key not found at: {settings.JWT_PUBLIC_KEY_PATH}"
     )
 
+# Key file contents and parsed key objects by path. Keys are read and parsed
+# once per process; preload_jwt_keys() fills the caches before workers fork so
+# they are shared copy-on-write.
+_PEM_CACHE: Dict[str, str] = {}
+_KEY_OBJECT_CACHE: Dict[str, Any] = {}
 
-def get_jwt_private_key(key_path: str = settings.JWT_PRIVATE_KEY_PATH) -> Optional[str]:
+
+def _read_key_file(key_path: str, key_kind: str) -> Optional[str]:
     """
-    Get the JWT private key from a PEM file.
+    Read a PEM key file, caching its content.
 
     Args:
-        key_path: Path to the private key PEM file (default: from config)
+        key_path: Path to the PEM file
+        key_kind: "private" or "public", used for logging
 
     Returns:
-        Optional[str]: The private key content as a string, or None if the file cannot be read
+        Optional[str]: The key content as a string, or None if the file cannot be read
     """
+    cached = _PEM_CACHE.get(key_path)
+    if cached is not None:
+        return cached
+
     if not os.path.exists(key_path):
-        logging.error(f"Private key file not found: {key_path}")
+        logging.error(f"{key_kind.capitalize()} key file not found: {key_path}")
         return None
 
     try:
         with open(key_path, "r") as f:
-            private_key = f.read()
-        logging.info(f"Successfully read private key from {key_path}")
-        return private_key
+            key_content = f.read()
+        logging.info(f"Successfully read {key_kind} key from {key_path}")
+        _PEM_CACHE[key_path] = key_content
+        return key_content
     except Exception as e:
-        logging.error(f"Error reading private key file: {e}")
+        logging.error(f"Error reading {key_kind} key file: {e}")
         return None
 
 
+def get_jwt_private_key(key_path: str = settings.JWT_PRIVATE_KEY_PATH) -> Optional[str]:
+    """
+    Get the JWT private key from a PEM file.
+
+    Args:
+        key_path: Path to the private key PEM file (default: from config)
+
+    Returns:
+        Optional[str]: The private key content as a string, or None if the file cannot be read
+    """
+    return _read_key_file(key_path, "private")
+
+
 def get_jwt_public_key(key_path: str = settings.JWT_PUBLIC_KEY_PATH) -> Optional[str]:
     """
     Get the JWT public key from a PEM file.
@@ -52,15 +81,83 @@ def get_jwt_public_key(key_path: str = settings.JWT_PUBLIC_KEY_PATH) -> Optional
     Returns:
         Optional[str]: The public key content as a string, or None if the file cannot be read
     """
-    if not os.path.exists(key_path):
-        logging.error(f"Public key file not found: {key_path}")
+    return _read_key_file(key_path, "public")
+
+
+def get_jwt_signing_key(key_path: str = settings.JWT_PRIVATE_KEY_PATH) -> Optional[Any]:
+    """
+    Get the parsed JWT private key object used to sign tokens.
+
+    Parsing an RSA private key is expensive, so the parsed object is cached.
+
+    Args:
+        key_path: Path to the private key PEM file (default: from config)
+
+    Returns:
+        Optional[Any]: The private key object, or None if it cannot be loaded
+    """
+    key = _KEY_OBJECT_CACHE.get(key_path)
+    if key is not None:
+        return key
+
+    private_key = get_jwt_private_key(key_path)
+    if not private_key:
         return None
 
     try:
-        with open(key_path, "r") as f:
-            public_key = f.read()
-        logging.info(f"Successfully read public key from {key_path}")
-        return public_key
+        key = serialization.load_pem_private_key(private_key.encode(), password=None)
     except Exception as e:
-        logging.error(f"Error reading public key file: {e}")
+        logging.error(f"Error parsing private key: {e}")
         return None
+    _KEY_OBJECT_CACHE[key_path] = key
+    return key
+
+
+def get_jwt_verification_key(
+    key_path: str = settings.JWT_PUBLIC_KEY_PATH,
+) -> Optional[Any]:
+    """
+    Get the parsed JWT public key object used to verify tokens.
+
+    Args:
+        key_path: Path to the public key PEM file (default: from config)
+
+    Returns:
+        Optional[Any]: The public key object, or None if it cannot be loaded
+    """
+    key = _KEY_OBJECT_CACHE.get(key_path)
+    if key is not None:
+        return key
+
+    public_key = get_jwt_public_key(key_path)
+    if not public_key:
+        return None
+
+    try:
+        key = serialization.load_pem_public_key(public_key.encode())
+    except Exception as e:
+        logging.error(f"Error parsing public key: {e}")
+        return None
+    _KEY_OBJECT_CACHE[key_path] = key
+    return key
+
+
+def preload_jwt_keys() -> None:
+    """
+    Read and parse the configured JWT keys, and those of every tenant.
+
+    Raises:
+        RuntimeError: If a key cannot be loaded
+    """
+    private_paths = {settings.JWT_PRIVATE_KEY_PATH}
+    public_paths = {settings.JWT_PUBLIC_KEY_PATH}
+    for tenant in TENANTS.values():
+        private_paths.add(tenant.jwt_private_key_path)
+        public_paths.add(tenant.jwt_public_key_path)
+
+    for key_path in sorted(private_paths):
+        if get_jwt_signing_key(key_path) is None:
+            raise RuntimeError(f"Cannot load JWT private key: {key_path}")
+    for key_path in sorted(public_paths):
+        if get_jwt_verification_key(key_path) is None:
+            raise RuntimeError(f"Cannot load JWT public key: {key_path}")
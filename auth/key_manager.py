@@ -0,0 +1,346 @@
+"""
+Client key manager for acting on behalf of many DID identities in one process.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from auth.clock_skew import SkewAwareDIDWbaAuthHeader, clock_skew
+from auth.token_store import SQLiteTokenStore, get_default_token_store, get_token_expiry
+from core.config import settings
+from utils import fast_json
+
+
+class _DomainTokens(MutableMapping):
+    """
+    Per-DID view of the key manager token store, keyed by domain.
+
+    DIDWbaAuthHeader keeps its tokens in self.tokens; this view stores them in
+    the manager instead, so tokens survive eviction of the parsed keys.
+    """
+
+    def __init__(self, manager: "ClientKeyManager", did: str):
+        self._manager = manager
+        self._did = did
+
+    def __getitem__(self, domain: str) -> str:
+        return self._manager._get_token(self._did, domain)
+
+    def __setitem__(self, domain: str, token: str) -> None:
+        self._manager._set_token(self._did, domain, token)
+
+    def __delitem__(self, domain: str) -> None:
+        self._manager._delete_token(self._did, domain)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(
+            [domain for did, domain in self._manager._tokens if did == self._did]
+        )
+
+    def __len__(self) -> int:
+        return sum(1 for did, _ in self._manager._tokens if did == self._did)
+
+    def __contains__(self, domain) -> bool:
+        return self._manager._has_token(self._did, domain)
+
+
+class ManagedDIDWbaAuthHeader(SkewAwareDIDWbaAuthHeader):
+    """
+    DIDWbaAuthHeader backed by an already parsed DID document and private key,
+    ready to sign without touching the filesystem.
+
+    Headers are timestamped with the estimated server time and never reused.
+    """
+
+    def __init__(
+        self,
+        did_document: Dict,
+        private_key: ec.EllipticCurvePrivateKey,
+        did_document_path: str = "",
+        private_key_path: str = "",
+    ):
+        super().__init__(did_document_path, private_key_path)
+        self.did_document = did_document
+        self.private_key = private_key
+
+    @property
+    def did(self) -> str:
+        """DID of this identity."""
+        return self.did_document["id"]
+
+    def _load_did_document(self) -> Dict:
+        return self.did_document
+
+    def _load_private_key(self) -> ec.EllipticCurvePrivateKey:
+        return self.private_key
+
+
+def _get_domain(server_url: str) -> str:
+    """Extract the domain a token belongs to, as DIDWbaAuthHeader does."""
+    return urlparse(server_url).netloc.split(":")[0]
+
+
+def _did_to_unique_id(did: str) -> str:
+    """Extract the user ID (last path segment) from a did:wba identifier."""
+    parts = did.split(":")
+    if len(parts) < 4 or parts[0] != "did" or parts[1] != "wba":
+        raise ValueError(f"Invalid DID format: {did}")
+    return parts[-1]
+
+
+def _load_identity(
+    did_document_path: Path, private_key_path: Path
+) -> Tuple[Dict, ec.EllipticCurvePrivateKey]:
+    """Read and parse a DID document and its private key (blocking)."""
+    did_document = fast_json.load_file(did_document_path)
+    with open(private_key_path, "rb") as f:
+        private_key = serialization.load_pem_private_key(f.read(), password=None)
+    return did_document, private_key
+
+
+class ClientKeyManager:
+    """
+    Lazily loads DID documents and private keys, keeping the parsed identities
+    in a bounded LRU keyed by DID, and stores bearer tokens per (DID, domain).
+
+    Concurrent requests for the same DID share a single load, and loads run in
+    a worker thread so the event loop is never blocked on file I/O or key parsing.
+    """
+
+    def __init__(
+        self,
+        did_documents_path: Optional[str] = None,
+        max_identities: int = 10000,
+        max_tokens: int = 100000,
+        token_store: Optional[SQLiteTokenStore] = None,
+    ):
+        """
+        Args:
+            did_documents_path: Directory containing user_{id} identity folders
+                (default: DID_DOCUMENTS_PATH relative to the project root)
+            max_identities: Maximum number of parsed identities kept in memory
+            max_tokens: Maximum number of (DID, domain) tokens kept in memory
+            token_store: Persistent token store shared with other processes
+                (default: the store configured by CLIENT_TOKEN_STORE_PATH, if any)
+        """
+        base_dir = Path(__file__).parent.parent.absolute()
+        self.did_documents_path = base_dir / (
+            did_documents_path or settings.DID_DOCUMENTS_PATH
+        )
+        self.max_identities = max_identities
+        self.max_tokens = max_tokens
+        self.token_store = token_store or get_default_token_store()
+
+        self._identities: "OrderedDict[str, ManagedDIDWbaAuthHeader]" = OrderedDict()
+        # (DID, domain) -> (token, exp claim or None)
+        self._tokens: "OrderedDict[Tuple[str, str], Tuple[str, Optional[float]]]" = (
+            OrderedDict()
+        )
+        self._paths: Dict[str, Tuple[Path, Path]] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def register(self, did: str, did_document_path: str, private_key_path: str) -> None:
+        """
+        Register the files of an identity stored outside the default layout.
+
+        Args:
+            did: DID identifier
+            did_document_path: Path to the DID document
+            private_key_path: Path to the private key
+        """
+        self._paths[did] = (Path(did_document_path), Path(private_key_path))
+
+    def _identity_paths(self, did: str) -> Tuple[Path, Path]:
+        """Locate the DID document and private key files of a DID."""
+        paths = self._paths.get(did)
+        if paths is not None:
+            return paths
+        user_dir = self.did_documents_path / f"user_{_did_to_unique_id(did)}"
+        return (
+            user_dir / settings.DID_DOCUMENT_FILENAME,
+            user_dir / settings.PRIVATE_KEY_FILENAME,
+        )
+
+    async def get(self, did: str) -> ManagedDIDWbaAuthHeader:
+        """
+        Get a ready-to-sign header builder for a DID, loading it on first use.
+
+        Args:
+            did: DID identifier
+
+        Returns:
+            ManagedDIDWbaAuthHeader: Header builder for the DID
+
+        Raises:
+            ValueError: If the DID document does not match the DID
+            OSError: If the identity files cannot be read
+        """
+        identity = self._identities.get(did)
+        if identity is not None:
+            self._identities.move_to_end(did)
+            self.hits += 1
+            return identity
+
+        pending = self._loading.get(did)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[did] = future
+        try:
+            did_document_path, private_key_path = self._identity_paths(did)
+            did_document, private_key = await asyncio.to_thread(
+                _load_identity, did_document_path, private_key_path
+            )
+            if did_document.get("id") != did:
+                raise ValueError(
+                    f"DID document {did_document_path} belongs to {did_document.get('id')}, not {did}"
+                )
+
+            identity = ManagedDIDWbaAuthHeader(
+                did_document,
+                private_key,
+                str(did_document_path),
+                str(private_key_path),
+            )
+            identity.tokens = _DomainTokens(self, did)
+            self._store_identity(did, identity)
+            self.loads += 1
+            future.set_result(identity)
+            return identity
+        except Exception as e:
+            logging.error(f"Error loading identity {did}: {e}")
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting
+            future.exception()
+            raise
+        finally:
+            # Concurrent callers must not wait forever if this call is cancelled
+            if not future.done():
+                future.cancel()
+            del self._loading[did]
+
+    def _store_identity(self, did: str, identity: ManagedDIDWbaAuthHeader) -> None:
+        """Insert an identity, evicting the least recently used one when full."""
+        self._identities[did] = identity
+        if len(self._identities) > self.max_identities:
+            self._identities.popitem(last=False)
+            self.evictions += 1
+
+    async def get_auth_header(
+        self, did: str, server_url: str, force_new: bool = False
+    ) -> Dict[str, str]:
+        """
+        Get the authorization header a DID should send to a server: its bearer
+        token for the server domain if it has one, otherwise a fresh DID WBA header.
+
+        Args:
+            did: DID identifier
+            server_url: Server URL
+            force_new: Whether to ignore a stored token
+
+        Returns:
+            Dict[str, str]: HTTP header dictionary
+        """
+        identity = await self.get(did)
+        return identity.get_auth_header(server_url, force_new)
+
+    def update_token(
+        self, did: str, server_url: str, headers: Dict[str, str]
+    ) -> Optional[str]:
+        """
+        Store the bearer token returned by a server for a DID.
+
+        Args:
+            did: DID identifier
+            server_url: Server URL
+            headers: Response header dictionary
+
+        Returns:
+            Optional[str]: Stored token, or None if no valid token is found
+        """
+        auth_header = headers.get("Authorization") or headers.get("authorization")
+        if auth_header and auth_header.lower().startswith("bearer "):
+            token = auth_header[7:]
+            domain = _get_domain(server_url)
+            self._set_token(did, domain, token)
+            return token
+        return None
+
+    def clear_token(self, did: str, server_url: str) -> None:
+        """
+        Clear the token of a DID for a server, e.g. after it was rejected.
+
+        Args:
+            did: DID identifier
+            server_url: Server URL
+        """
+        domain = _get_domain(server_url)
+        self._delete_token(did, domain)
+
+    def _get_token(self, did: str, domain: str) -> str:
+        cached = self._tokens.get((did, domain))
+        if cached is not None:
+            token, expires_at = cached
+            # Token expiry is judged on the server clock, as by the token store
+            if expires_at is None or (
+                expires_at - settings.CLIENT_TOKEN_EXPIRY_LEEWAY_SECONDS
+                > clock_skew.server_time(domain)
+            ):
+                self._tokens.move_to_end((did, domain))
+                return token
+            del self._tokens[(did, domain)]
+
+        # Tokens obtained by earlier runs or other processes
+        token = None
+        if self.token_store is not None:
+            token = self.token_store.get(did, domain, clock_skew.server_time(domain))
+        if token is None:
+            raise KeyError(domain)
+        self._cache_token(did, domain, token)
+        return token
+
+    def _has_token(self, did: str, domain: str) -> bool:
+        try:
+            self._get_token(did, domain)
+        except KeyError:
+            return False
+        return True
+
+    def _cache_token(self, did: str, domain: str, token: str) -> None:
+        self._tokens[(did, domain)] = (token, get_token_expiry(token))
+        self._tokens.move_to_end((did, domain))
+        if len(self._tokens) > self.max_tokens:
+            self._tokens.popitem(last=False)
+
+    def _set_token(self, did: str, domain: str, token: str) -> None:
+        self._cache_token(did, domain, token)
+        if self.token_store is not None:
+            self.token_store.put(did, domain, token)
+
+    def _delete_token(self, did: str, domain: str) -> None:
+        self._tokens.pop((did, domain), None)
+        if self.token_store is not None:
+            self.token_store.delete(did, domain)
+
+    def stats(self) -> Dict[str, int]:
+        """Return identity cache and token store statistics."""
+        return {
+            "identities": len(self._identities),
+            "tokens": len(self._tokens),
+            "loads": self.loads,
+            "hits": self.hits,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,210 @@
+"""
+Client-side pool of pre-signed DID WBA authorization headers.
+
+Signing a DID WBA header is an asymmetric signature on the request path of the
+first contact with a server. The pool keeps a few ready-signed headers per
+target domain, each with its own nonce and timestamp, and a background task
+refills it. Headers are discarded before their timestamp leaves the server's
+TIMESTAMP_EXPIRATION_MINUTES window.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+from agent_connect.authentication import DIDWbaAuthHeader
+
+from core.config import settings
+
+
+def _get_domain(server_url: str) -> str:
+    """Extract the domain a header is signed for, as DIDWbaAuthHeader does."""
+    return urlparse(server_url).netloc.split(":")[0]
+
+
+class PresignedHeaderPool:
+    """
+    Keeps pool_size pre-signed headers per domain for a DID WBA auth client.
+
+    The pool exposes the get_auth_header/update_token/clear_token interface of
+    DIDWbaAuthHeader, so it can be passed wherever an auth client is expected
+    (for example to send_authenticated_request).
+    """
+
+    def __init__(
+        self,
+        auth_client: DIDWbaAuthHeader,
+        server_urls: Iterable[str] = (),
+        pool_size: Optional[int] = None,
+        max_age: Optional[float] = None,
+        refill_interval: float = 1.0,
+    ):
+        """
+        Args:
+            auth_client: Auth client signing the headers
+            server_urls: Servers to keep headers ready for
+            pool_size: Headers kept per domain (default: PRESIGN_POOL_SIZE)
+            max_age: Seconds after which a pooled header is discarded
+                (default: TIMESTAMP_EXPIRATION_MINUTES minus PRESIGN_SAFETY_MARGIN_SECONDS)
+            refill_interval: Seconds between checks for expired headers
+        """
+        self.auth_client = auth_client
+        self.pool_size = pool_size or settings.PRESIGN_POOL_SIZE
+        if max_age is None:
+            max_age = (
+                settings.TIMESTAMP_EXPIRATION_MINUTES * 60
+                - settings.PRESIGN_SAFETY_MARGIN_SECONDS
+            )
+        if max_age <= 0:
+            raise ValueError("Pre-signed header max age must be positive")
+        self.max_age = max_age
+        self.refill_interval = refill_interval
+
+        # domain -> deque of (signed_at, header), oldest first
+        self._pools: Dict[str, Deque[Tuple[float, str]]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        for server_url in server_urls:
+            self.add_server(server_url)
+
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def add_server(self, server_url: str) -> None:
+        """
+        Start keeping headers ready for a server.
+
+        Args:
+            server_url: Server URL
+        """
+        self._pools.setdefault(_get_domain(server_url), deque())
+        self._wakeup.set()
+
+    def _discard_expired(self, pool: Deque[Tuple[float, str]], now: float) -> None:
+        """Drop headers that are too old to be accepted by the server."""
+        while pool and now - pool[0][0] > self.max_age:
+            pool.popleft()
+            self.discarded += 1
+
+    def take(self, server_url: str) -> Optional[str]:
+        """
+        Take a pre-signed header for a server.
+
+        Args:
+            server_url: Server URL
+
+        Returns:
+            Optional[str]: Authorization header value, or None if the pool is empty
+        """
+        domain = _get_domain(server_url)
+        pool = self._pools.get(domain)
+        if pool is None:
+            self.add_server(server_url)
+            self.misses += 1
+            return None
+
+        self._discard_expired(pool, time.monotonic())
+        self._wakeup.set()
+        if not pool:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pool.popleft()[1]
+
+    def get_auth_header(self, server_url: str, force_new: bool = False) -> Dict[str, str]:
+        """
+        Get authentication header: the stored token for the server, otherwise a
+        pre-signed header, otherwise a header signed inline.
+
+        Args:
+            server_url: Server URL
+            force_new: Whether to ignore a stored token
+
+        Returns:
+            Dict[str, str]: HTTP header dictionary
+        """
+        domain = _get_domain(server_url)
+        if not force_new and domain in self.auth_client.tokens:
+            return {"Authorization": f"Bearer {self.auth_client.tokens[domain]}"}
+
+        header = self.take(server_url)
+        if header is None:
+            header = self.auth_client._generate_auth_header(domain)
+        return {"Authorization": header}
+
+    def update_token(self, server_url: str, headers: Dict[str, str]) -> Optional[str]:
+        """Store the token returned by a server, see DIDWbaAuthHeader.update_token."""
+        return self.auth_client.update_token(server_url, headers)
+
+    def clear_token(self, server_url: str) -> None:
+        """Clear the token of a server, see DIDWbaAuthHeader.clear_token."""
+        self.auth_client.clear_token(server_url)
+
+    async def refill(self) -> int:
+        """
+        Discard expired headers and sign new ones until every pool is full.
+
+        Returns:
+            int: Number of headers signed
+        """
+        signed = 0
+        for domain, pool in list(self._pools.items()):
+            self._discard_expired(pool, time.monotonic())
+            while len(pool) < self.pool_size:
+                # Timestamp taken before signing, so the age is never underestimated
+                signed_at = time.monotonic()
+                header = await asyncio.to_thread(
+                    self.auth_client._generate_auth_header, domain
+                )
+                pool.append((signed_at, header))
+                signed += 1
+        return signed
+
+    async def _run(self) -> None:
+        """Background task keeping the pools full."""
+        while True:
+            # Cleared before refilling so a take() during the refill is not lost
+            self._wakeup.clear()
+            try:
+                await self.refill()
+            except Exception as e:
+                logging.error(f"Error refilling pre-signed header pool: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start the background refill task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background refill task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def __aenter__(self) -> "PresignedHeaderPool":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool statistics."""
+        return {
+            "ready": sum(len(pool) for pool in self._pools.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "discarded": self.discarded,
+        }
@@ -0,0 +1,249 @@
+"""
+Token bucket rate limiting for the authentication admission path.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException
+
+from core.config import settings
+
+
+class TokenBucket:
+    """Token bucket state: available tokens and the time they were last refilled."""
+
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class MemoryRateLimitBackend:
+    """
+    In-process token buckets kept in a bounded LRU.
+
+    Every operation is O(1): a dict lookup, a move to the LRU tail and, when the
+    table is full, eviction of the least recently used (idle) bucket. An evicted
+    bucket simply starts full again on its next use.
+    """
+
+    def __init__(self, max_buckets: int):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def acquire(self, key: str, rate: float, burst: float, now: float) -> float:
+        """
+        Take one token from the bucket identified by key.
+
+        Args:
+            key: Bucket key
+            rate: Refill rate in tokens per second
+            burst: Bucket capacity
+            now: Current monotonic time
+
+        Returns:
+            float: 0.0 if the token was granted, otherwise seconds until one is available
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(burst, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated_at) * rate)
+            bucket.updated_at = now
+
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            return 0.0
+        return (1.0 - bucket.tokens) / rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteRateLimitBackend:
+    """
+    Token buckets stored in a SQLite file shared by all workers on one host.
+
+    Buckets are updated in a single short write transaction. Wall-clock time is
+    used because monotonic clocks are not comparable between processes. If the
+    database is busy or unavailable the request is admitted (fail open) so that
+    rate limiting never turns into an outage.
+    """
+
+    def __init__(self, path: str, max_buckets: int):
+        self.path = path
+        self.max_buckets = max_buckets
+        self._local = threading.local()
+        self._operations = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection of the current thread, opened on first use.
+
+        A connection must not be used on both sides of a fork(), so one opened
+        by another process (the pre-fork parent) is replaced.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS rate_limit_buckets_updated_at "
+                "ON rate_limit_buckets (updated_at)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def acquire(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Take one token from the shared bucket, see MemoryRateLimitBackend.acquire."""
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    tokens = burst
+                else:
+                    tokens = min(burst, row[0] + max(0.0, now - row[1]) * rate)
+
+                retry_after = 0.0
+                if tokens >= 1.0:
+                    tokens -= 1.0
+                else:
+                    retry_after = (1.0 - tokens) / rate
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, tokens, now),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            self._operations += 1
+            if self._operations % 1000 == 0:
+                self._evict_idle()
+            return retry_after
+        except sqlite3.Error as e:
+            logging.warning(f"Shared rate limit backend unavailable, admitting request: {e}")
+            return 0.0
+
+    def _evict_idle(self) -> None:
+        """Keep at most max_buckets rows by dropping the least recently used ones."""
+        try:
+            self._connect().execute(
+                "DELETE FROM rate_limit_buckets WHERE key IN ("
+                "SELECT key FROM rate_limit_buckets ORDER BY updated_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_buckets,),
+            )
+        except sqlite3.Error as e:
+            logging.warning(f"Error evicting idle rate limit buckets: {e}")
+
+
+class RateLimiter:
+    """Admission control with separate token bucket limits per source IP and per DID."""
+
+    def __init__(
+        self,
+        backend,
+        ip_rate: float,
+        ip_burst: float,
+        did_rate: float,
+        did_burst: float,
+        enabled: bool = True,
+    ):
+        self.backend = backend
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self.did_rate = did_rate
+        self.did_burst = did_burst
+        self.enabled = enabled
+
+    def _check(self, key: str, rate: float, burst: float, subject: str) -> None:
+        """Consume a token for key or raise 429 with Retry-After."""
+        retry_after = self.backend.acquire(key, rate, burst, time.monotonic())
+        if retry_after > 0:
+            logging.warning(f"Rate limit exceeded for {subject}")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    def check_ip(self, ip: Optional[str]) -> None:
+        """
+        Apply the per source IP limit.
+
+        Args:
+            ip: Client IP address
+
+        Raises:
+            HTTPException: 429 when the limit is exceeded
+        """
+        if self.enabled and ip:
+            self._check(f"ip:{ip}", self.ip_rate, self.ip_burst, f"IP {ip}")
+
+    def check_did(self, did: str) -> None:
+        """
+        Apply the per DID limit to DID WBA authentication attempts.
+
+        Args:
+            did: DID from the authorization header
+
+        Raises:
+            HTTPException: 429 when the limit is exceeded
+        """
+        if self.enabled:
+            self._check(f"did:{did}", self.did_rate, self.did_burst, f"DID {did}")
+
+
+def create_rate_limiter() -> RateLimiter:
+    """
+    Create the rate limiter configured in settings.
+
+    Returns:
+        RateLimiter: Configured rate limiter
+    """
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        backend = SQLiteRateLimitBackend(
+            settings.RATE_LIMIT_SQLITE_PATH, settings.RATE_LIMIT_MAX_BUCKETS
+        )
+    else:
+        backend = MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_BUCKETS)
+
+    return RateLimiter(
+        backend,
+        ip_rate=settings.RATE_LIMIT_IP_PER_SECOND,
+        ip_burst=settings.RATE_LIMIT_IP_BURST,
+        did_rate=settings.RATE_LIMIT_DID_PER_SECOND,
+        did_burst=settings.RATE_LIMIT_DID_BURST,
+        enabled=settings.RATE_LIMIT_ENABLED,
+    )
+
+
+rate_limiter = create_rate_limiter()
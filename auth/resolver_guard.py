@@ -0,0 +1,309 @@
+"""
+Per-host protection for remote DID document resolution.
+
+Every handshake for a DID hosted elsewhere waits on that host. To keep one
+slow or failing partner domain from degrading authentication for everyone,
+resolution requests are guarded per host by:
+1. A concurrency cap, with a bounded wait for a free slot
+2. Connect and read deadlines
+3. A circuit breaker that fails fast after repeated errors and lets a single
+   half-open probe through once the reset timeout has elapsed
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from core.config import settings
+from utils import fast_json
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker counting consecutive failures."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self, now: float) -> bool:
+        """Check whether a request may be sent, moving open -> half-open when due."""
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = STATE_HALF_OPEN
+        if self.state == STATE_HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Allow another probe after a half-open probe was not sent."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self, now: float) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if (
+            self.state == STATE_HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            if self.state != STATE_OPEN:
+                logging.warning(
+                    f"Circuit opened after {self.consecutive_failures} consecutive failures"
+                )
+            self.state = STATE_OPEN
+            self.opened_at = now
+
+
+class HostGuard:
+    """Concurrency cap, circuit breaker and metrics of one host."""
+
+    def __init__(self, max_concurrency: int, failure_threshold: int, reset_timeout: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected_open = 0
+        self.rejected_busy = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def metrics(self) -> Dict[str, Any]:
+        completed = self.successes + self.failures
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected_open": self.rejected_open,
+            "rejected_busy": self.rejected_busy,
+            "latency_avg_ms": round(self.latency_total / completed * 1000, 2)
+            if completed
+            else 0.0,
+            "latency_max_ms": round(self.latency_max * 1000, 2),
+        }
+
+
+class ResolverGuard:
+    """Guards remote DID document fetches per host and shares one HTTP session."""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        connect_timeout: float,
+        read_timeout: float,
+        queue_timeout: float,
+        failure_threshold: int,
+        reset_timeout: float,
+        max_hosts: int = 10000,
+    ):
+        """
+        Args:
+            max_concurrency: Concurrent resolutions per host
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Seconds to wait for response data
+            queue_timeout: Seconds to wait for a free slot before failing
+            failure_threshold: Consecutive failures that open a host's circuit
+            reset_timeout: Seconds before an open circuit allows a probe
+            max_hosts: Maximum number of hosts tracked
+        """
+        self.max_concurrency = max_concurrency
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.queue_timeout = queue_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_hosts = max_hosts
+        self._hosts: "OrderedDict[str, HostGuard]" = OrderedDict()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def total_timeout(self) -> float:
+        """Upper bound of one guarded call."""
+        return self.connect_timeout + self.read_timeout
+
+    def host(self, host: str) -> HostGuard:
+        """Get the guard of a host, evicting the least recently used idle host."""
+        guard = self._hosts.get(host)
+        if guard is None:
+            guard = HostGuard(
+                self.max_concurrency, self.failure_threshold, self.reset_timeout
+            )
+            self._hosts[host] = guard
+            if len(self._hosts) > self.max_hosts:
+                for name, other in self._hosts.items():
+                    if other.in_flight == 0 and name != host:
+                        del self._hosts[name]
+                        break
+        else:
+            self._hosts.move_to_end(host)
+        return guard
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on the running event loop."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(
+                    total=self.total_timeout,
+                    sock_connect=self.connect_timeout,
+                    sock_read=self.read_timeout,
+                ),
+                connector=aiohttp.TCPConnector(limit=0, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def call(
+        self,
+        host: str,
+        func: Callable[[], Awaitable[Optional[Dict]]],
+        none_is_failure: bool = False,
+    ) -> Optional[Dict]:
+        """
+        Run a resolution call for a host under its concurrency cap, deadline and breaker.
+
+        Args:
+            host: Host (with port) the call talks to
+            func: Coroutine factory performing the call
+            none_is_failure: Whether a None result counts as a host failure
+
+        Returns:
+            Optional[Dict]: Result of the call, or None if it failed or was rejected
+        """
+        guard = self.host(host)
+        if not guard.breaker.allow(time.monotonic()):
+            guard.rejected_open += 1
+            logging.warning(f"DID resolution for {host} rejected, circuit open")
+            return None
+
+        probe = guard.breaker.state == STATE_HALF_OPEN
+        try:
+            return await self._call_admitted(guard, host, func, none_is_failure)
+        except BaseException:
+            # A cancelled or crashed half-open probe must not block future probes
+            if probe:
+                guard.breaker.release_probe()
+            raise
+
+    async def _call_admitted(
+        self,
+        guard: HostGuard,
+        host: str,
+        func: Callable[[], Awaitable[Optional[Dict]]],
+        none_is_failure: bool,
+    ) -> Optional[Dict]:
+        """Run a call the circuit breaker let through, see call."""
+        try:
+            await asyncio.wait_for(guard.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            guard.rejected_busy += 1
+            # A rejected half-open probe must not block future probes
+            guard.breaker.release_probe()
+            logging.warning(f"DID resolution for {host} rejected, too many in flight")
+            return None
+
+        guard.in_flight += 1
+        guard.requests += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(func(), self.total_timeout)
+            failed = result is None and none_is_failure
+        except asyncio.TimeoutError:
+            guard.timeouts += 1
+            logging.warning(f"DID resolution for {host} timed out")
+            result, failed = None, True
+        except (aiohttp.ClientError, OSError, ValueError) as e:
+            logging.warning(f"DID resolution for {host} failed: {e}")
+            result, failed = None, True
+        finally:
+            guard.in_flight -= 1
+            guard.semaphore.release()
+
+        elapsed = time.monotonic() - started
+        guard.latency_total += elapsed
+        guard.latency_max = max(guard.latency_max, elapsed)
+        if failed:
+            guard.failures += 1
+            guard.breaker.record_failure(time.monotonic())
+        else:
+            guard.successes += 1
+            guard.breaker.record_success()
+        return result
+
+    async def fetch_json(self, url: str) -> Optional[Dict]:
+        """
+        Fetch a JSON document through the guard of the URL's host.
+
+        A response with a status other than 200 means the host is healthy but
+        has no document: it returns None without counting as a failure.
+
+        Args:
+            url: Document URL
+
+        Returns:
+            Optional[Dict]: Parsed document, or None
+        """
+
+        async def fetch() -> Optional[Dict]:
+            async with self.get_session().get(url, ssl=False) as response:
+                if response.status >= 500:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info,
+                        response.history,
+                        status=response.status,
+                        message="Server error",
+                    )
+                if response.status != 200:
+                    logging.error(f"HTTP request failed, status code: {response.status}")
+                    return None
+                return await response.json(loads=fast_json.loads, content_type=None)
+
+        return await self.call(urlparse(url).netloc, fetch)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Return metrics per host."""
+        return {host: guard.metrics() for host, guard in self._hosts.items()}
+
+
+resolver_guard = ResolverGuard(
+    max_concurrency=settings.RESOLVER_MAX_CONCURRENCY_PER_HOST,
+    connect_timeout=settings.RESOLVER_CONNECT_TIMEOUT,
+    read_timeout=settings.RESOLVER_READ_TIMEOUT,
+    queue_timeout=settings.RESOLVER_QUEUE_TIMEOUT,
+    failure_threshold=settings.RESOLVER_FAILURE_THRESHOLD,
+    reset_timeout=settings.RESOLVER_RESET_TIMEOUT,
+)
@@ -0,0 +1,308 @@
+"""
+Access token revocation.
+
+Tokens carry a random jti claim. Revoked jtis are kept in a hash set pruned as
+the tokens expire, so the set only ever holds tokens that could still be
+presented. While nothing is revoked a check is a single truth test, otherwise
+one or two dict lookups (well under a microsecond). A whole DID can be revoked
+as well: every token issued to it up to that moment is rejected.
+
+Revocations are appended to a SQLite log (REVOCATION_STORE_PATH) that every
+worker polls, so a revocation made on one worker reaches the others within
+REVOCATION_SYNC_INTERVAL_SECONDS. The same log carries invalidations of cached
+DID documents, handed to the registered document listeners.
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.domains import TENANTS
+
+KIND_JTI = "jti"
+KIND_DID = "did"
+KIND_DOCUMENT = "document"
+
+
+class SQLiteRevocationLog:
+    """
+    Append-only log of revocations in a SQLite file in WAL mode, shared by
+    all workers on one host. Rows are deleted once the revoked tokens expire.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection of the current thread, opened on first use.
+
+        A connection must not be used on both sides of a fork(), so one opened
+        by another process (the pre-fork parent) is replaced.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revocations ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, "
+                "key TEXT NOT NULL, value REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, kind: str, key: str, value: float, expires_at: float) -> int:
+        """Append a revocation and return its sequence number."""
+        cursor = self._connect().execute(
+            "INSERT INTO revocations (kind, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (kind, key, value, expires_at),
+        )
+        return cursor.lastrowid
+
+    def read_since(
+        self, seq: int, now: float
+    ) -> List[Tuple[int, str, str, float, float]]:
+        """Read the unexpired revocations appended after a sequence number."""
+        return self._connect().execute(
+            "SELECT seq, kind, key, value, expires_at FROM revocations "
+            "WHERE seq > ? AND expires_at > ? ORDER BY seq",
+            (seq, now),
+        ).fetchall()
+
+    def prune(self, now: float) -> None:
+        """Delete the revocations of expired tokens."""
+        self._connect().execute("DELETE FROM revocations WHERE expires_at <= ?", (now,))
+
+
+class RevocationList:
+    """Revoked jtis and DIDs of this worker, synchronized from the shared log."""
+
+    def __init__(
+        self,
+        token_lifetime: float,
+        log: Optional[SQLiteRevocationLog] = None,
+    ):
+        """
+        Args:
+            token_lifetime: Seconds a token stays valid after issuance, how long a
+                DID revocation is kept
+            log: Shared revocation log, None keeps revocations in this worker only
+        """
+        self.token_lifetime = token_lifetime
+        self.log = log
+        self._jtis: Dict[str, float] = {}
+        self._dids: Dict[str, float] = {}
+        self._did_expiry: Dict[str, float] = {}
+        self._expiry_heap: List[Tuple[float, str, str]] = []
+        self._last_seq = 0
+        self._task: Optional[asyncio.Task] = None
+        self._document_listeners: List[Callable[[str], None]] = []
+
+    def is_revoked(self, jti: Optional[str], did: str, issued_at: float) -> bool:
+        """
+        Check whether a token is revoked.
+
+        Args:
+            jti: Token jti claim, None for tokens issued without one
+            did: Token subject
+            issued_at: Token iat claim as a Unix timestamp
+
+        Returns:
+            bool: Whether the token was revoked by jti or by DID
+        """
+        if self._dids:
+            revoked_before = self._dids.get(did)
+            if revoked_before is not None and issued_at <= revoked_before:
+                return True
+        return jti is not None and jti in self._jtis
+
+    def _apply(self, kind: str, key: str, value: float, expires_at: float) -> None:
+        """Add a revocation to the in-memory state."""
+        if kind == KIND_DOCUMENT:
+            for listener in self._document_listeners:
+                listener(key)
+            return
+        if kind == KIND_JTI:
+            self._jtis[key] = max(expires_at, self._jtis.get(key, 0.0))
+        elif kind == KIND_DID:
+            self._dids[key] = max(value, self._dids.get(key, 0.0))
+            self._did_expiry[key] = max(expires_at, self._did_expiry.get(key, 0.0))
+        else:
+            return
+        heapq.heappush(self._expiry_heap, (expires_at, kind, key))
+
+    def _record(self, kind: str, key: str, value: float, expires_at: float) -> None:
+        self._apply(kind, key, value, expires_at)
+        if self.log is not None:
+            try:
+                self.log.append(kind, key, value, expires_at)
+            except sqlite3.Error as e:
+                logging.error(f"Error sharing revocation with other workers: {e}")
+
+    def revoke_token(self, jti: str, expires_at: float) -> None:
+        """
+        Revoke a token by its jti until it expires.
+
+        Args:
+            jti: Token jti claim
+            expires_at: Token exp claim as a Unix timestamp
+        """
+        if expires_at > time.time():
+            self._record(KIND_JTI, jti, expires_at, expires_at)
+            logging.info(f"Revoked token {jti}")
+
+    def revoke_did(self, did: str, revoked_at: Optional[float] = None) -> None:
+        """
+        Revoke every token issued to a DID up to now.
+
+        Tokens issued within the same second may be revoked as well, since iat
+        has second precision.
+
+        Args:
+            did: DID whose tokens are revoked
+            revoked_at: Unix timestamp, default now
+        """
+        revoked_at = time.time() if revoked_at is None else revoked_at
+        self._record(
+            KIND_DID,
+            did,
+            revoked_at,
+            revoked_at + self.token_lifetime + settings.TOKEN_CLOCK_SKEW_TOLERANCE_SECONDS,
+        )
+        logging.info(f"Revoked tokens of DID {did} issued up to {revoked_at}")
+
+    def add_document_listener(self, listener: Callable[[str], None]) -> None:
+        """
+        Register a callback receiving the DIDs whose cached documents are
+        invalidated, on this worker or (after a sync) on another one.
+
+        Args:
+            listener: Called with the DID, in the event loop thread
+        """
+        self._document_listeners.append(listener)
+
+    def invalidate_document(self, did: str, cache_ttl: float) -> None:
+        """
+        Invalidate the cached DID document of a DID on every worker.
+
+        Args:
+            did: DID whose document is invalidated
+            cache_ttl: Seconds a cached document is used, how long the
+                invalidation is kept
+        """
+        now = time.time()
+        self._record(KIND_DOCUMENT, did, now, now + cache_ttl)
+        logging.info(f"Invalidated cached DID document of {did}")
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Drop revocations of expired tokens.
+
+        Args:
+            now: Unix timestamp, default now
+
+        Returns:
+            int: Number of revocations dropped
+        """
+        now = time.time() if now is None else now
+        dropped = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, kind, key = heapq.heappop(self._expiry_heap)
+            # A later revocation of the same key extended its expiry
+            if kind == KIND_JTI and self._jtis.get(key, now + 1) <= now:
+                del self._jtis[key]
+                dropped += 1
+            elif kind == KIND_DID and self._did_expiry.get(key, now + 1) <= now:
+                del self._dids[key]
+                del self._did_expiry[key]
+                dropped += 1
+        return dropped
+
+    def _read_log(self) -> List[Tuple[int, str, str, float, float]]:
+        if self.log is None:
+            return []
+        return self.log.read_since(self._last_seq, time.time())
+
+    def _apply_rows(self, rows: List[Tuple[int, str, str, float, float]]) -> int:
+        for seq, kind, key, value, expires_at in rows:
+            self._apply(kind, key, value, expires_at)
+            self._last_seq = max(self._last_seq, seq)
+        return len(rows)
+
+    def sync(self) -> int:
+        """
+        Apply revocations made by other workers since the last sync.
+
+        Returns:
+            int: Number of revocations read
+        """
+        return self._apply_rows(self._read_log())
+
+    async def _sync_loop(self, interval: float) -> None:
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self._apply_rows(await asyncio.to_thread(self._read_log))
+                if time.monotonic() - last_prune >= 60:
+                    last_prune = time.monotonic()
+                    self.prune()
+                    if self.log is not None:
+                        await asyncio.to_thread(self.log.prune, time.time())
+            except Exception as e:
+                logging.warning(f"Error synchronizing token revocations: {e}")
+
+    def start(self, interval: float) -> None:
+        """Load the shared log and keep following it in a background task."""
+        try:
+            self.sync()
+        except sqlite3.Error as e:
+            logging.warning(f"Error loading token revocations: {e}")
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._sync_loop(interval))
+
+    async def stop(self) -> None:
+        """Stop the background synchronization."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"revoked_tokens": len(self._jtis), "revoked_dids": len(self._dids)}
+
+
+def create_revocation_list() -> RevocationList:
+    """
+    Create the revocation list configured in settings.
+
+    Returns:
+        RevocationList: Configured revocation list
+    """
+    # Opened on first use, so importing this module creates no file
+    log = (
+        SQLiteRevocationLog(settings.REVOCATION_STORE_PATH)
+        if settings.REVOCATION_STORE_PATH
+        else None
+    )
+    return RevocationList(
+        token_lifetime=max(
+            [tenant.token_lifetime_minutes for tenant in TENANTS.values()]
+            + [settings.ACCESS_TOKEN_EXPIRE_MINUTES]
+        )
+        * 60,
+        log=log,
+    )
+
+
+revocation_list = create_revocation_list()
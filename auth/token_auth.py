@@ -3,22 +3,35 @@ Bearer token authentication module.
 """
 
 import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional, Dict
 from datetime import datetime, timedelta
 import jwt
 from fastapi import HTTPException
 
 from core.config import settings
-from auth.jwt_keys import get_jwt_public_key, get_jwt_private_key
-
-
-def create_access_token(data: Dict, expires_delta: Optional[timedelta] = None) -> str:
+from core.domains import Tenant
+from auth.jwt_keys import get_jwt_signing_key, get_jwt_verification_key
+from auth.audit_log import OUTCOME_ACCEPTED, OUTCOME_REJECTED, audit_log
+from auth.auth_context import SCHEME_BEARER
+from auth.revocation import revocation_list
+
+
+def create_access_token(
+    data: Dict,
+    expires_delta: Optional[timedelta] = None,
+    key_path: str = settings.JWT_PRIVATE_KEY_PATH,
+) -> str:
     """
     Create a new JWT access token.
 
     Args:
         data: Data to encode in the token
         expires_delta: Optional expiration time
+        key_path: Private key signing the token (default: from config)
 
     Returns:
         str: Encoded JWT token
@@ -35,8 +48,11 @@ def create_access_token(data: Dict, expires_delta: Optional[timedelta] = None) -
     )
     to_encode.update({"exp": expires})
 
+    # Unique token ID (jti) so a single token can be revoked
+    to_encode.setdefault("jti", secrets.token_hex(16))
+
     # Get private key for signing
-    private_key = get_jwt_private_key()
+    private_key = get_jwt_signing_key(key_path)
     if not private_key:
         logging.error("Failed to load JWT private key")
         raise HTTPException(
@@ -48,15 +64,72 @@ def create_access_token(data: Dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-async def handle_bearer_auth(token: str) -> Dict:
+class VerifiedTokenCache:
+    """
+    LRU cache of the claims of verified tokens, by verification key and token.
+
+    A cached token skips the signature verification; its expiry and
+    revocation are still checked on every use.
     """
-    Handle Bearer token authentication.
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Args:
+            max_entries: Maximum number of cached tokens
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, Dict]" = OrderedDict()
+        # Tokens are also verified in executor threads (batch introspection)
+        self._lock = threading.Lock()
+
+    def get(self, key_path: str, token: str) -> Optional[Dict]:
+        with self._lock:
+            claims = self._entries.get((key_path, token))
+            if claims is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key_path, token))
+            self.hits += 1
+            return claims
+
+    def contains(self, key_path: str, token: str) -> bool:
+        """Check whether a token is cached, without counting a hit or miss."""
+        return (key_path, token) in self._entries
+
+    def put(self, key_path: str, token: str, claims: Dict) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(key_path, token)] = claims
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key_path: str, token: str) -> None:
+        with self._lock:
+            self._entries.pop((key_path, token), None)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+verified_token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_MAX_ENTRIES)
+
+
+def verify_access_token(token: str, tenant: Optional[Tenant] = None) -> Dict:
+    """
+    Verify an access token and return its claims.
+
+    The RS256 signature is verified once per token, later uses are served
+    from verified_token_cache. Revocation and expiry are checked every time.
 
     Args:
-        token: JWT token string
+        token: JWT token string, with or without the 'Bearer ' prefix
+        tenant: Tenant of the request host, whose key verifies the token
 
     Returns:
-        Dict: Token payload with DID information
+        Dict: Token claims (sub, iat, exp and jti when present)
 
     Raises:
         HTTPException: When token is invalid
@@ -66,50 +139,25 @@ async def handle_bearer_auth(token: str) -> Dict:
         if token.startswith("Bearer "):
             token = token[7:]
 
-        # Get public key for verification
-        public_key = get_jwt_public_key()
-        if not public_key:
-            logging.error("Failed to load JWT public key")
-            raise HTTPException(
-                status_code=500,
-                detail="Internal server error during token verification",
-            )
-
-        # Decode and verify the token using the public key
-        payload = jwt.decode(token, public_key, algorithms=[settings.JWT_ALGORITHM])
-
-        # Check if token contains required fields
-        if "sub" not in payload:
-            raise HTTPException(status_code=401, detail="Invalid token payload: missing 'sub' field")
-            
-        if "iat" not in payload:
-            raise HTTPException(status_code=401, detail="Invalid token payload: missing 'iat' field")
-            
-        if "exp" not in payload:
-            raise HTTPException(status_code=401, detail="Invalid token payload: missing 'exp' field")
-
-        # Validate DID format
-        did = payload["sub"]
-        if not did.startswith("did:wba:"):
-            raise HTTPException(status_code=401, detail="Invalid DID format")
-
-        # Additional time validation (JWT library already validates exp)
-        now = datetime.utcnow()
-        iat = datetime.utcfromtimestamp(payload["iat"])
-        exp = datetime.utcfromtimestamp(payload["exp"])
-        
-        # Allow a small tolerance for clock skew (5 seconds)
-        tolerance = timedelta(seconds=5)
-        
-        # Check if token was issued too far in the future (invalid)
-        if iat > now + tolerance:
-            raise HTTPException(status_code=401, detail="Token issued in the future")
-            
-        # Check if token is already expired (redundant check, but explicit)
-        if exp <= now - tolerance:
+        key_path = tenant.jwt_public_key_path if tenant else settings.JWT_PUBLIC_KEY_PATH
+        # Allowed clock difference between the token issuer and this server
+        tolerance = settings.TOKEN_CLOCK_SKEW_TOLERANCE_SECONDS
+
+        payload = verified_token_cache.get(key_path, token)
+        if payload is None:
+            payload = _decode_access_token(token, key_path, tolerance)
+            verified_token_cache.put(key_path, token, payload)
+
+        # Revoked by jti or by DID (in-memory lookup, no I/O)
+        if revocation_list.is_revoked(payload.get("jti"), payload["sub"], payload["iat"]):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+
+        # Expiry of cached tokens (the JWT library validates it on decode)
+        if payload["exp"] <= time.time() - tolerance:
+            verified_token_cache.discard(key_path, token)
             raise HTTPException(status_code=401, detail="Token has expired")
 
-        return {"did": payload["sub"]}
+        return payload
 
     except HTTPException:
         # Re-raise HTTPException as-is
@@ -123,3 +171,77 @@ async def handle_bearer_auth(token: str) -> Dict:
     except Exception as e:
         logging.error(f"Error during token authentication: {e}")
         raise HTTPException(status_code=500, detail="Authentication error")
+
+
+def _decode_access_token(token: str, key_path: str, tolerance: float) -> Dict:
+    """Verify the signature and claims of a token not seen before."""
+    # Get public key for verification
+    public_key = get_jwt_verification_key(key_path)
+    if not public_key:
+        logging.error("Failed to load JWT public key")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error during token verification",
+        )
+
+    # Decode and verify the token using the public key
+    payload = jwt.decode(
+        token,
+        public_key,
+        algorithms=[settings.JWT_ALGORITHM],
+        leeway=timedelta(seconds=tolerance),
+    )
+
+    # Check if token contains required fields
+    if "sub" not in payload:
+        raise HTTPException(status_code=401, detail="Invalid token payload: missing 'sub' field")
+
+    if "iat" not in payload:
+        raise HTTPException(status_code=401, detail="Invalid token payload: missing 'iat' field")
+
+    if "exp" not in payload:
+        raise HTTPException(status_code=401, detail="Invalid token payload: missing 'exp' field")
+
+    # Validate DID format
+    if not isinstance(payload["sub"], str) or not payload["sub"].startswith("did:wba:"):
+        raise HTTPException(status_code=401, detail="Invalid DID format")
+
+    # Check if token was issued too far in the future (invalid)
+    if payload["iat"] > time.time() + tolerance:
+        raise HTTPException(status_code=401, detail="Token issued in the future")
+
+    return payload
+
+
+async def handle_bearer_auth(token: str, tenant: Optional[Tenant] = None) -> Dict:
+    """
+    Handle Bearer token authentication.
+
+    Args:
+        token: JWT token string
+        tenant: Tenant of the request host, whose key verifies the token
+
+    Returns:
+        Dict: Token payload with DID information
+
+    Raises:
+        HTTPException: When token is invalid
+    """
+    started = time.perf_counter()
+    domain = tenant.domain if tenant else ""
+    try:
+        payload = verify_access_token(token, tenant)
+    except HTTPException as exc:
+        audit_log.record(
+            SCHEME_BEARER, None, OUTCOME_REJECTED, exc.detail, domain, time.perf_counter() - started
+        )
+        raise
+    audit_log.record(
+        SCHEME_BEARER, payload["sub"], OUTCOME_ACCEPTED, "", domain, time.perf_counter() - started
+    )
+    return {
+        "did": payload["sub"],
+        "expires_at": float(payload["exp"]),
+        "jti": payload.get("jti"),
+        "issued_at": float(payload["iat"]),
+    }
@@ -0,0 +1,272 @@
+"""
+Persistent client token store shared between client processes.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Iterator, List, Optional, Union
+
+import jwt
+from agent_connect.authentication import DIDWbaAuthHeader
+
+from auth.clock_skew import clock_skew
+from auth.presign_pool import PresignedHeaderPool
+from core.config import settings
+
+
+def get_token_expiry(token: str) -> Optional[float]:
+    """
+    Read the exp claim of a JWT without verifying it.
+
+    The client cannot verify tokens issued by other servers, the expiry is only
+    used to decide when a stored token is no longer worth sending.
+
+    Args:
+        token: JWT access token
+
+    Returns:
+        Optional[float]: Expiry as a Unix timestamp, or None if unknown
+    """
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return None
+    exp = claims.get("exp")
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+class SQLiteTokenStore:
+    """
+    Bearer tokens keyed by (DID, target domain) in a SQLite file in WAL mode,
+    so any number of client processes on one host share the tokens obtained by
+    each other and keep them across restarts.
+
+    Tokens are not returned once they are within leeway seconds of their exp
+    claim. Storage errors are logged and treated as a missing token: the
+    client then falls back to a DID WBA handshake.
+    """
+
+    def __init__(self, path: str, leeway: Optional[float] = None):
+        """
+        Args:
+            path: SQLite database path
+            leeway: Seconds before exp at which a token is considered expired
+                (default: CLIENT_TOKEN_EXPIRY_LEEWAY_SECONDS)
+        """
+        self.path = path
+        self.leeway = (
+            settings.CLIENT_TOKEN_EXPIRY_LEEWAY_SECONDS if leeway is None else leeway
+        )
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection of the current thread, opened on first use.
+
+        A connection must not be used on both sides of a fork(), so one opened
+        by another process (e.g. the parent of forked client processes) is
+        replaced.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS client_tokens ("
+                "did TEXT NOT NULL, domain TEXT NOT NULL, token TEXT NOT NULL, "
+                "expires_at REAL, PRIMARY KEY (did, domain))"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, did: str, domain: str, now: Optional[float] = None) -> Optional[str]:
+        """
+        Get the valid token of a DID for a domain.
+
+        Args:
+            did: DID identifier
+            domain: Target server domain
+            now: Current Unix time (default: time.time())
+
+        Returns:
+            Optional[str]: Token, or None if there is no valid token
+        """
+        now = time.time() if now is None else now
+        try:
+            row = self._connect().execute(
+                "SELECT token, expires_at FROM client_tokens WHERE did = ? AND domain = ?",
+                (did, domain),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Client token store unavailable: {e}")
+            return None
+        if row is None:
+            return None
+        token, expires_at = row
+        if expires_at is not None and expires_at - self.leeway <= now:
+            self.delete(did, domain)
+            return None
+        return token
+
+    def put(self, did: str, domain: str, token: str) -> None:
+        """
+        Store the token of a DID for a domain.
+
+        Args:
+            did: DID identifier
+            domain: Target server domain
+            token: Access token
+        """
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO client_tokens (did, domain, token, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (did, domain, token, get_token_expiry(token)),
+            )
+        except sqlite3.Error as e:
+            logging.warning(f"Error storing client token: {e}")
+
+    def delete(self, did: str, domain: str) -> None:
+        """
+        Delete the token of a DID for a domain.
+
+        Args:
+            did: DID identifier
+            domain: Target server domain
+        """
+        try:
+            self._connect().execute(
+                "DELETE FROM client_tokens WHERE did = ? AND domain = ?", (did, domain)
+            )
+        except sqlite3.Error as e:
+            logging.warning(f"Error deleting client token: {e}")
+
+    def domains(self, did: str) -> List[str]:
+        """List the domains a DID has stored tokens for."""
+        try:
+            rows = self._connect().execute(
+                "SELECT domain FROM client_tokens WHERE did = ?", (did,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logging.warning(f"Client token store unavailable: {e}")
+            return []
+        return [row[0] for row in rows]
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Delete expired tokens.
+
+        Args:
+            now: Current Unix time (default: time.time())
+
+        Returns:
+            int: Number of deleted tokens
+        """
+        now = time.time() if now is None else now
+        try:
+            cursor = self._connect().execute(
+                "DELETE FROM client_tokens WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now,),
+            )
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logging.warning(f"Error pruning client tokens: {e}")
+            return 0
+
+
+class PersistentDomainTokens(MutableMapping):
+    """
+    Per-DID view of a token store keyed by domain, usable as the tokens dict
+    of a DIDWbaAuthHeader.
+    """
+
+    def __init__(self, store: SQLiteTokenStore, did: str):
+        self._store = store
+        self._did = did
+
+    def __getitem__(self, domain: str) -> str:
+        # Token expiry is judged on the server clock
+        token = self._store.get(self._did, domain, clock_skew.server_time(domain))
+        if token is None:
+            raise KeyError(domain)
+        return token
+
+    def __setitem__(self, domain: str, token: str) -> None:
+        self._store.put(self._did, domain, token)
+
+    def __delitem__(self, domain: str) -> None:
+        self._store.delete(self._did, domain)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.domains(self._did))
+
+    def __len__(self) -> int:
+        return len(self._store.domains(self._did))
+
+    def __contains__(self, domain) -> bool:
+        return (
+            self._store.get(self._did, domain, clock_skew.server_time(domain))
+            is not None
+        )
+
+
+# Store configured by CLIENT_TOKEN_STORE_PATH, opened on first use
+_default_store: Optional[SQLiteTokenStore] = None
+
+
+def get_default_token_store() -> Optional[SQLiteTokenStore]:
+    """
+    Get the token store configured by CLIENT_TOKEN_STORE_PATH.
+
+    Returns:
+        Optional[SQLiteTokenStore]: Token store, or None if persistence is disabled
+    """
+    global _default_store
+    if _default_store is None and settings.CLIENT_TOKEN_STORE_PATH:
+        _default_store = SQLiteTokenStore(settings.CLIENT_TOKEN_STORE_PATH)
+    return _default_store
+
+
+def attach_token_store(
+    auth_client: Union[DIDWbaAuthHeader, PresignedHeaderPool],
+    store: Optional[SQLiteTokenStore] = None,
+) -> bool:
+    """
+    Back the tokens of an auth client with a persistent token store, so it
+    reuses tokens obtained by earlier runs or other processes before signing.
+
+    Tokens already held by the client are copied into the store. A pre-signed
+    header pool reads its tokens from the client it wraps, which gets the
+    store. Clients whose tokens are not a plain dict (e.g. the identities of
+    a ClientKeyManager, which has its own store) are left alone.
+
+    Args:
+        auth_client: DID WBA auth client, or a pre-signed header pool
+        store: Token store (default: get_default_token_store())
+
+    Returns:
+        bool: Whether a store is attached
+    """
+    if isinstance(auth_client, PresignedHeaderPool):
+        auth_client = auth_client.auth_client
+    current = getattr(auth_client, "tokens", None)
+    if isinstance(current, PersistentDomainTokens):
+        return True
+    if not isinstance(current, dict) or not hasattr(auth_client, "_load_did_document"):
+        return False
+    store = store or get_default_token_store()
+    if store is None:
+        return False
+
+    did = auth_client._load_did_document()["id"]
+    tokens = PersistentDomainTokens(store, did)
+    for domain, token in current.items():
+        tokens[domain] = token
+    auth_client.tokens = tokens
+    return True
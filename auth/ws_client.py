@@ -0,0 +1,167 @@
+"""
+Client of the authenticated WebSocket endpoint (/wba/ws).
+
+The connection is authenticated once with the stored bearer token, or with a
+DID WBA header when there is none; the token issued by a handshake is stored
+in the auth client like after an HTTP request. Requests on the connection are
+pipelined: each carries an id and is answered in any order.
+"""
+
+import asyncio
+import itertools
+import logging
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse, urlunparse
+
+import aiohttp
+from agent_connect.authentication import DIDWbaAuthHeader
+
+from auth.token_store import attach_token_store
+from utils import fast_json
+
+WS_PATH = "/wba/ws"
+
+
+def get_ws_url(server_url: str, path: str = WS_PATH) -> str:
+    """
+    Get the WebSocket URL of a server from its HTTP(S) base URL.
+
+    Args:
+        server_url: Server base URL, e.g. http://localhost:8000
+        path: Endpoint path
+
+    Returns:
+        str: WebSocket URL, e.g. ws://localhost:8000/wba/ws
+    """
+    parsed = urlparse(server_url)
+    scheme = {"http": "ws", "https": "wss"}.get(parsed.scheme, parsed.scheme)
+    return urlunparse((scheme, parsed.netloc, path, "", "", ""))
+
+
+class AgentWebSocket:
+    """Authenticated, pipelined connection to a server's /wba/ws endpoint."""
+
+    def __init__(self, server_url: str, auth_client: DIDWbaAuthHeader, path: str = WS_PATH):
+        """
+        Args:
+            server_url: Server base URL, e.g. http://localhost:8000
+            auth_client: DID WBA auth client holding the DID and its tokens
+            path: Endpoint path
+        """
+        self.server_url = server_url
+        self.ws_url = get_ws_url(server_url, path)
+        self.auth_client = auth_client
+        self.did: Optional[str] = None
+        self.expires_at: Optional[float] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    async def connect(self) -> None:
+        """
+        Open and authenticate the connection.
+
+        A rejected stored token is cleared and the connection retried once with
+        a DID WBA header.
+
+        Raises:
+            aiohttp.WSServerHandshakeError: When the server rejects the connection
+        """
+        attach_token_store(self.auth_client)
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+
+        for attempt in range(2):
+            headers = self.auth_client.get_auth_header(self.server_url)
+            used_token = headers["Authorization"].startswith("Bearer ")
+            try:
+                self._ws = await self._session.ws_connect(self.ws_url, headers=headers)
+                break
+            except aiohttp.WSServerHandshakeError as e:
+                if e.status == 401 and used_token and attempt == 0:
+                    logging.info(f"Stored token rejected by {self.ws_url}, authenticating with DID WBA")
+                    self.auth_client.clear_token(self.server_url)
+                    continue
+                raise
+
+        session = fast_json.loads((await self._ws.receive()).data)
+        self.did = session.get("did")
+        self.expires_at = session.get("expires_at")
+        if session.get("access_token"):
+            self.auth_client.update_token(
+                self.server_url, {"Authorization": f"Bearer {session['access_token']}"}
+            )
+        self._reader = asyncio.get_running_loop().create_task(self._read_loop(self._ws))
+        logging.info(f"WebSocket connected to {self.ws_url} as {self.did}")
+
+    async def _read_loop(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        """Resolve pending requests with their responses until the connection closes."""
+        try:
+            async for message in ws:
+                if message.type not in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                    break
+                response = fast_json.loads(message.data)
+                future = self._pending.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            error = ConnectionError(
+                f"WebSocket closed (code {ws.close_code}): {ws.exception() or 'closed by server'}"
+            )
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+    async def request(self, method: str, **params: Any) -> Dict:
+        """
+        Send a request and wait for its response, reconnecting if the server
+        closed the connection (e.g. when the token expired).
+
+        Args:
+            method: Method name, e.g. "test"
+            **params: Additional message fields
+
+        Returns:
+            Dict: Result of the request
+
+        Raises:
+            ValueError: When the server answers with an error
+            ConnectionError: When the connection closes before the response
+        """
+        if not self.connected:
+            async with self._connect_lock:
+                if not self.connected:
+                    await self.connect()
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        await self._ws.send_str(fast_json.dumps_str({"id": request_id, "method": method, **params}))
+        response = await future
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    async def close(self) -> None:
+        """Close the connection and its HTTP session."""
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self) -> "AgentWebSocket":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
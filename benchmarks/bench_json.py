@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON encoding and decoding of DID documents and NDJSON batches.
+
+Compares the standard library json module with the active fast_json backend
+(orjson when installed) for:
+1. DID documents with 1, 5 and 20 verification methods
+2. Large NDJSON batches of DID documents
+
+Usage:
+    python benchmarks/bench_json.py [--batch-size 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent_connect.authentication import create_did_wba_document
+
+from utils import fast_json
+
+
+def build_did_document(index: int, key_count: int) -> Dict:
+    """Create a DID document with key_count verification methods."""
+    did_document, _ = create_did_wba_document(
+        hostname="localhost",
+        port=8000,
+        path_segments=["wba", "user", f"bench_{index}"],
+        agent_description_url="http://localhost:8000/agents/example/ad.json",
+    )
+    method = did_document["verificationMethod"][0]
+    did_document["verificationMethod"] = [
+        dict(method, id=f"{did_document['id']}#key-{i + 1}") for i in range(key_count)
+    ]
+    return did_document
+
+
+def stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def time_call(func: Callable[[], object], repeat: int, number: int) -> float:
+    """Return the best time per call in microseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best * 1e6
+
+
+def report(name: str, stdlib_us: float, fast_us: float) -> None:
+    print(
+        f"{name:<38} {stdlib_us:>12.1f} {fast_us:>12.1f} {stdlib_us / fast_us:>8.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"fast_json backend: {fast_json.BACKEND}")
+    print(f"{'case':<38} {'stdlib (us)':>12} {'fast (us)':>12} {'speedup':>9}")
+
+    for key_count in (1, 5, 20):
+        document = build_did_document(0, key_count)
+        encoded = stdlib_dumps(document)
+        label = f"DID doc {key_count:>2} keys ({len(encoded)} B)"
+        report(
+            f"{label} dumps",
+            time_call(lambda: stdlib_dumps(document), args.repeat, 2000),
+            time_call(lambda: fast_json.dumps(document), args.repeat, 2000),
+        )
+        report(
+            f"{label} loads",
+            time_call(lambda: json.loads(encoded), args.repeat, 2000),
+            time_call(lambda: fast_json.loads(encoded), args.repeat, 2000),
+        )
+
+    # NDJSON batch, as used for bulk export/import of DID documents
+    template = build_did_document(0, 1)
+    batch: List[Dict] = []
+    for index in range(args.batch_size):
+        document = dict(template, id=f"{template['id']}_{index}")
+        batch.append(document)
+    ndjson = b"\n".join(stdlib_dumps(document) for document in batch)
+    label = f"NDJSON {args.batch_size} docs ({len(ndjson) // 1024} KiB)"
+    report(
+        f"{label} dumps",
+        time_call(
+            lambda: b"\n".join(stdlib_dumps(d) for d in batch), args.repeat, 1
+        ),
+        time_call(
+            lambda: b"\n".join(fast_json.dumps(d) for d in batch), args.repeat, 1
+        ),
+    )
+    lines = ndjson.split(b"\n")
+    report(
+        f"{label} loads",
+        time_call(lambda: [json.loads(line) for line in lines], args.repeat, 1),
+        time_call(lambda: [fast_json.loads(line) for line in lines], args.repeat, 1),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the authenticated WebSocket endpoint against HTTP requests.
+
+Sends the same sequence of "test" calls to a running server:
+1. As GET /wba/test requests with the bearer token, over a keep-alive session
+2. As messages on one /wba/ws connection authenticated once
+
+and reports messages per second for each. Start the server with rate limiting
+disabled, otherwise the HTTP run is throttled by the per-IP limit:
+
+    RATE_LIMIT_ENABLED=false python did_server.py
+
+Usage:
+    python benchmarks/bench_ws.py [--url http://localhost:8000] [--messages 5000] [--concurrency 16]
+"""
+
+import argparse
+import asyncio
+import secrets
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth.clock_skew import SkewAwareDIDWbaAuthHeader
+from auth.did_auth import generate_or_load_did, send_authenticated_request
+from auth.ws_client import AgentWebSocket
+from core.config import settings
+
+
+async def run_concurrently(messages: int, concurrency: int, call) -> float:
+    """Run call() messages times with concurrency workers, return messages per second."""
+    remaining = iter(range(messages))
+
+    async def worker() -> None:
+        for _ in remaining:
+            await call()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return messages / (time.perf_counter() - started)
+
+
+async def bench_http(url: str, token: str, messages: int, concurrency: int) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def call() -> None:
+            async with session.get(f"{url}/wba/test", headers=headers) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP request failed with status {response.status}")
+                await response.read()
+
+        await call()
+        return await run_concurrently(messages, concurrency, call)
+
+
+async def bench_ws(url: str, auth_client, messages: int, concurrency: int) -> float:
+    async with AgentWebSocket(url, auth_client) as ws:
+
+        async def call() -> None:
+            result = await ws.request("test")
+            if result.get("status") != "success":
+                raise RuntimeError(f"WebSocket request failed: {result}")
+
+        await call()
+        return await run_concurrently(messages, concurrency, call)
+
+
+async def main(url: str, messages: int, concurrency: int) -> None:
+    did_document, _, user_dir = await generate_or_load_did(f"bench_ws_{secrets.token_hex(4)}")
+    auth_client = SkewAwareDIDWbaAuthHeader(
+        did_document_path=str(Path(user_dir) / settings.DID_DOCUMENT_FILENAME),
+        private_key_path=str(Path(user_dir) / settings.PRIVATE_KEY_FILENAME),
+    )
+    status, _, token = await send_authenticated_request(f"{url}/wba/test", auth_client)
+    if status != 200 or not token:
+        raise SystemExit(f"DID WBA authentication failed with status {status}")
+
+    print(f"{messages} 'test' calls, concurrency {concurrency}, DID {did_document['id']}")
+    http_rate = await bench_http(url, token, messages, concurrency)
+    print(f"  HTTP GET /wba/test  {http_rate:10.0f} msg/s")
+    ws_rate = await bench_ws(url, auth_client, messages, concurrency)
+    print(f"  WebSocket /wba/ws   {ws_rate:10.0f} msg/s  ({ws_rate / http_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default=f"http://{settings.TARGET_SERVER_HOST}:{settings.TARGET_SERVER_PORT}")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.messages, args.concurrency))
@@ -0,0 +1,262 @@
+"""
+Admission control: shed low-priority work when the worker is overloaded.
+
+A worker is overloaded when its event loop lags (a periodic timer fires late
+by more than ADMISSION_MAX_LOOP_LAG_MS) or when it has more than
+ADMISSION_MAX_IN_FLIGHT requests in progress. While overloaded, new DID WBA
+handshakes and bulk endpoints get an immediate 503 with Retry-After, before
+any header parsing or crypto. Requests presenting a bearer token are always
+admitted: they are cheap and belong to sessions that already paid for a
+handshake, so the worker keeps serving them at full speed instead of slowing
+everything down together.
+
+While the worker drains before a shutdown, requests are still served but every
+response carries Connection: close, so keep-alive clients open their next
+connection to a worker that is not going away.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from core.config import settings
+from utils import fast_json
+
+PRIORITY_PROTECTED = "protected"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+
+# Endpoints shed like handshakes when the worker is overloaded
+LOW_PRIORITY_PATHS = ("/wba/user/_bulk",)
+
+_OVERLOADED_BODY = fast_json.dumps({"detail": "Server overloaded, retry later"})
+
+
+def classify_request(scope) -> str:
+    """
+    Get the admission priority of an HTTP request from its path and Authorization header.
+
+    Args:
+        scope: ASGI HTTP scope
+
+    Returns:
+        str: PRIORITY_PROTECTED, PRIORITY_NORMAL or PRIORITY_LOW
+    """
+    authorization = b""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            authorization = value
+            break
+    if authorization[:7].lower() == b"bearer ":
+        return PRIORITY_PROTECTED
+    if authorization[:6] == b"DIDWba" or scope["path"].startswith(LOW_PRIORITY_PATHS):
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
+
+
+class LoopLagMonitor:
+    """Measures event loop lag as the delay of a periodic timer."""
+
+    def __init__(self, interval: float = 0.05, alpha: float = 0.3):
+        """
+        Args:
+            interval: Seconds between samples
+            alpha: Weight of a new sample in the moving average
+        """
+        self.interval = interval
+        self.alpha = alpha
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            sample = max(0.0, loop.time() - expected)
+            # Rise immediately on a stall, decay smoothly once it is over
+            if sample > self.lag:
+                self.lag = sample
+            else:
+                self.lag += self.alpha * (sample - self.lag)
+            self.max_lag = max(self.max_lag, sample)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class AdmissionController:
+    """In-flight request count, loop lag and shedding decisions of one worker."""
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_loop_lag: float,
+        retry_after: int,
+        enabled: bool = True,
+        monitor: Optional[LoopLagMonitor] = None,
+    ):
+        """
+        Args:
+            max_in_flight: In-flight requests above which low-priority work is shed
+            max_loop_lag: Seconds of event loop lag above which low-priority work is shed
+            retry_after: Retry-After seconds sent with 503 responses
+            enabled: Whether requests are ever shed
+            monitor: Loop lag monitor
+        """
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.retry_after = retry_after
+        self.enabled = enabled
+        self.monitor = monitor or LoopLagMonitor()
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.draining = False
+        self._overloaded = False
+
+    def is_overloaded(self) -> bool:
+        """Check whether the worker is over its in-flight or loop lag threshold."""
+        overloaded = (
+            self.in_flight >= self.max_in_flight or self.monitor.lag > self.max_loop_lag
+        )
+        if overloaded != self._overloaded:
+            self._overloaded = overloaded
+            if overloaded:
+                logging.warning(
+                    f"Worker overloaded (in flight: {self.in_flight}, loop lag: "
+                    f"{self.monitor.lag * 1000:.0f}ms), shedding handshakes and bulk requests"
+                )
+            else:
+                logging.info("Worker load back to normal, admitting all requests")
+        return overloaded
+
+    def admit(self, priority: str) -> bool:
+        """
+        Decide whether a request of a priority is admitted.
+
+        Args:
+            priority: Request priority from classify_request
+
+        Returns:
+            bool: Whether the request is admitted
+        """
+        if self.enabled and priority == PRIORITY_LOW and self.is_overloaded():
+            self.shed += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def start(self) -> None:
+        """Start measuring the event loop lag."""
+        if self.enabled:
+            self.monitor.start()
+
+    async def stop(self) -> None:
+        await self.monitor.stop()
+
+    async def drain(self, timeout: float, poll_interval: float = 0.01) -> bool:
+        """
+        Wait for the requests in flight to complete.
+
+        Args:
+            timeout: Seconds to wait at most
+            poll_interval: Seconds between two checks
+
+        Returns:
+            bool: Whether all requests completed before the timeout
+        """
+        self.draining = True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.in_flight > 0:
+            if loop.time() >= deadline:
+                logging.warning(f"Drain timeout with {self.in_flight} requests in flight")
+                return False
+            await asyncio.sleep(poll_interval)
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "overloaded": self._overloaded,
+            "draining": self.draining,
+            "in_flight": self.in_flight,
+            "loop_lag_ms": round(self.monitor.lag * 1000, 2),
+            "max_loop_lag_ms": round(self.monitor.max_lag * 1000, 2),
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+admission_controller = AdmissionController(
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    max_loop_lag=settings.ADMISSION_MAX_LOOP_LAG_MS / 1000,
+    retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    enabled=settings.ADMISSION_ENABLED,
+)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware counting in-flight HTTP requests and answering shed
+    requests with 503 before they reach authentication.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        if not controller.admit(classify_request(scope)):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 503,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(_OVERLOADED_BODY)).encode("latin-1")),
+                        (b"retry-after", str(controller.retry_after).encode("latin-1")),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": _OVERLOADED_BODY})
+            return
+
+        if controller.draining:
+            send = _closing_send(send)
+
+        controller.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.in_flight -= 1
+
+
+def _closing_send(send):
+    """Wrap an ASGI send so that the response closes the connection."""
+
+    async def closing_send(message) -> None:
+        if message["type"] == "http.response.start":
+            headers = [
+                (name, value)
+                for name, value in message.get("headers", ())
+                if name.lower() != b"connection"
+            ]
+            headers.append((b"connection", b"close"))
+            message = {**message, "headers": headers}
+        await send(message)
+
+    return closing_send
@@ -2,12 +2,67 @@
 FastAPI application initialization.
 """
 
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from core.config import settings
-from api import auth_router, did_router, ad_router
+from api import (
+    auth_router,
+    did_router,
+    ad_router,
+    metrics_router,
+    admin_router,
+    ws_router,
+    health_router,
+)
+from auth.audit_log import audit_log
+from auth.did_cache import did_document_cache, warmup_did_cache
+from auth.did_verification import load_used_nonces, save_used_nonces
+from auth.jwt_keys import preload_jwt_keys
+from auth.resolver_guard import resolver_guard
+from auth.revocation import revocation_list
 from auth.auth_middleware import auth_middleware
+from core.admission import AdmissionMiddleware, admission_controller
+from core.body_limit import BodyLimitMiddleware
+from core.lifecycle import lifecycle
+from core.precomputed import PrecomputedResponseMiddleware
+from core.server_time import ServerTimeMiddleware
+from utils.fast_json import FastJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: load keys, open pools and warm up caches before
+    reporting ready; drain requests and flush the worker state on shutdown.
+
+    Args:
+        app: FastAPI application
+    """
+    # Already loaded by the pre-fork parent, loaded here in single-process mode
+    preload_jwt_keys()
+    nonces = load_used_nonces(settings.NONCE_STORE_PATH)
+    resolver_guard.get_session()
+    admission_controller.start()
+    revocation_list.start(settings.REVOCATION_SYNC_INTERVAL_SECONDS)
+    audit_log.start()
+    documents = await warmup_did_cache()
+    logging.info(f"Startup loaded {nonces} used nonces and {documents} DID documents")
+    lifecycle.mark_ready()
+    yield
+    lifecycle.begin_drain()
+    await admission_controller.drain(settings.SHUTDOWN_DRAIN_TIMEOUT_SECONDS)
+    save_used_nonces(settings.NONCE_STORE_PATH)
+    await admission_controller.stop()
+    await revocation_list.stop()
+    await audit_log.stop()
+    did_document_cache.save_access_stats()
+    await did_document_cache.close()
+    await resolver_guard.close()
+    lifecycle.mark_stopped()
 
 
 def create_app() -> FastAPI:
@@ -24,8 +79,13 @@ def create_app() -> FastAPI:
         version="0.1.0",
         docs_url="/docs" if settings.DEBUG else None,
         redoc_url="/redoc" if settings.DEBUG else None,
+        default_response_class=FastJSONResponse,
+        lifespan=lifespan,
     )
 
+    # Serve precomputed static documents before routing (innermost middleware)
+    app.add_middleware(PrecomputedResponseMiddleware)
+
     # Add CORS middleware
     app.add_middleware(
         CORSMiddleware,
@@ -40,9 +100,22 @@ def create_app() -> FastAPI:
     async def auth_middleware_wrapper(request, call_next):
         return await auth_middleware(request, call_next)
 
+    # Reject oversized or slow request bodies before authentication and parsing
+    app.add_middleware(BodyLimitMiddleware)
+
+    # Shed handshakes and bulk requests under overload, before authentication
+    app.add_middleware(AdmissionMiddleware)
+
+    # Add the server clock to every response, including auth failures (outermost)
+    app.add_middleware(ServerTimeMiddleware)
+
     # Include routers
     app.include_router(auth_router.router)
     app.include_router(did_router.router)
     app.include_router(ad_router.router)
+    app.include_router(metrics_router.router)
+    app.include_router(admin_router.router)
+    app.include_router(ws_router.router)
+    app.include_router(health_router.router)
 
     return app
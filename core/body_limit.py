@@ -0,0 +1,162 @@
+"""
+Request body limits enforced at the ASGI level.
+
+Every HTTP request body is capped, by default at MAX_JSON_SIZE, with larger
+limits registered for the routes that need them (e.g. bulk provisioning). A
+request declaring a larger Content-Length is answered with 413 before it
+reaches authentication or routing; a body streamed without (or beyond) its
+declared length is counted chunk by chunk and aborted with 413 as soon as it
+crosses the limit, so an oversized upload is never buffered or parsed. A body
+that does not arrive completely within BODY_READ_TIMEOUT_SECONDS of the first
+read is aborted with 408, so slow-drip uploads cannot hold a worker.
+
+An aborted body is answered by the middleware itself, and the application
+reading it sees the client disconnect: exceptions raised from receive() are
+wrapped or turned into 400 by the layers in between.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+from utils import fast_json
+
+# Body limits in bytes by (method, path), other requests use the default limit
+BODY_LIMITS: Dict[Tuple[str, str], int] = {}
+
+
+def register_body_limit(method: str, path: str, limit: int) -> None:
+    """
+    Set the body limit of a route.
+
+    Args:
+        method: HTTP method, e.g. "POST"
+        path: Exact request path
+        limit: Maximum body size in bytes
+    """
+    BODY_LIMITS[(method.upper(), path)] = limit
+
+
+register_body_limit("POST", "/wba/user/_bulk", settings.MAX_BULK_BODY_SIZE)
+
+
+def _content_length(raw_headers) -> Optional[bytes]:
+    for name, value in raw_headers:
+        if name == b"content-length":
+            return value
+    return None
+
+
+class BodyLimitMiddleware:
+    """
+    ASGI middleware rejecting HTTP request bodies over their route's limit
+    or received too slowly.
+    """
+
+    def __init__(
+        self,
+        app,
+        default_limit: int = settings.MAX_JSON_SIZE,
+        limits: Optional[Dict[Tuple[str, str], int]] = None,
+        read_timeout: float = settings.BODY_READ_TIMEOUT_SECONDS,
+    ):
+        """
+        Args:
+            app: ASGI application
+            default_limit: Body limit in bytes of routes without a registered limit
+            limits: Body limits by (method, path), BODY_LIMITS by default
+            read_timeout: Seconds allowed to receive a whole body
+        """
+        self.app = app
+        self.default_limit = default_limit
+        self.limits = BODY_LIMITS if limits is None else limits
+        self.read_timeout = read_timeout
+
+    async def _reject(self, send, status_code: int, detail: str) -> None:
+        body = fast_json.dumps({"detail": detail})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    # The rest of the body is not read, so the connection cannot be reused
+                    (b"connection", b"close"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits.get((scope["method"], scope["path"]), self.default_limit)
+        declared = _content_length(scope["headers"])
+        if declared is not None:
+            try:
+                declared_size = int(declared)
+            except ValueError:
+                await self._reject(send, 400, "Invalid Content-Length")
+                return
+            if declared_size > limit:
+                logging.info(
+                    f"Rejected {scope['method']} {scope['path']}: "
+                    f"Content-Length {declared_size} over limit {limit}"
+                )
+                await self._reject(send, 413, f"Request body over {limit} bytes")
+                return
+
+        loop = asyncio.get_running_loop()
+        deadline: Optional[float] = None
+        received = 0
+        body_complete = False
+        response_started = False
+        rejected = False
+
+        async def abort(status_code: int, detail: str):
+            nonlocal rejected
+            logging.info(f"Rejected {scope['method']} {scope['path']}: {detail}")
+            if not response_started:
+                await self._reject(send, status_code, detail)
+            rejected = True
+            return {"type": "http.disconnect"}
+
+        async def limited_receive():
+            nonlocal deadline, received, body_complete
+            if rejected:
+                return {"type": "http.disconnect"}
+            if body_complete:
+                # Only http.disconnect is left, which may legitimately take long
+                return await receive()
+            if deadline is None:
+                deadline = loop.time() + self.read_timeout
+            try:
+                message = await asyncio.wait_for(receive(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                return await abort(408, "Request body not received in time")
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    return await abort(413, f"Request body over {limit} bytes")
+                body_complete = not message.get("more_body", False)
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                # The error response was already sent
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # The application failing on the disconnect it was handed
+            if not rejected:
+                raise
@@ -3,6 +3,7 @@ DID WBA configuration module with both client and server functionalities.
 """
 
 import os
+from functools import cached_property
 from typing import List
 from pathlib import Path
 from pydantic_settings import BaseSettings
@@ -21,11 +22,67 @@ class Settings(BaseSettings):
     LOCAL_PORT: int = int(os.getenv("LOCAL_PORT", "8000"))
     DEBUG: bool = os.getenv("DEBUG", "true").lower() == "true"
 
+    # Production server settings (used by did_server.py --prod)
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+    # Restart a worker after this many requests, 0 disables restarts
+    SERVER_MAX_REQUESTS: int = int(os.getenv("SERVER_MAX_REQUESTS", "10000"))
+    SERVER_MAX_REQUESTS_JITTER: int = int(
+        os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000")
+    )
+    # SO_REUSEPORT gives every worker its own socket; with the default shared
+    # socket a restarting worker never drops connections queued on its socket
+    SERVER_REUSE_PORT: bool = os.getenv("SERVER_REUSE_PORT", "false").lower() == "true"
+    SERVER_BACKLOG: int = int(os.getenv("SERVER_BACKLOG", "2048"))
+
+    # Admission control (core/admission.py): per worker thresholds above which
+    # DID WBA handshakes and bulk requests are shed with 503
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "256"))
+    ADMISSION_MAX_LOOP_LAG_MS: float = float(
+        os.getenv("ADMISSION_MAX_LOOP_LAG_MS", "100")
+    )
+    ADMISSION_RETRY_AFTER_SECONDS: int = int(
+        os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1")
+    )
+
+    # Logging settings
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")  # text or json
+    # Per-subsystem levels, e.g. "agent_connect=WARNING,auth=INFO,uvicorn.access=ERROR"
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # What to drop when the log queue is full: newest or oldest records
+    LOG_DROP_POLICY: str = os.getenv("LOG_DROP_POLICY", "newest")
+    LOG_DIR: str = os.getenv("LOG_DIR", "")
+
     # JWT settings
     JWT_ALGORITHM: str = "RS256"  # RSA with SHA-256 for asymmetric keys
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(
         os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
     )
+    # Allowed clock difference between token issuer and verifier
+    TOKEN_CLOCK_SKEW_TOLERANCE_SECONDS: int = int(
+        os.getenv("TOKEN_CLOCK_SKEW_TOLERANCE_SECONDS", "5")
+    )
+    # Verified tokens whose signature is not checked again, 0 disables the cache
+    TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    # Maximum tokens per POST /auth/introspect request
+    INTROSPECT_MAX_TOKENS: int = int(os.getenv("INTROSPECT_MAX_TOKENS", "100"))
+    # DIDs of the downstream services allowed to introspect tokens (comma separated);
+    # other callers need the admin API key
+    INTROSPECT_ALLOWED_DIDS: str = os.getenv("INTROSPECT_ALLOWED_DIDS", "")
+    # Token revocation (auth/revocation.py), shared by workers through a SQLite log
+    REVOCATION_STORE_PATH: str = os.getenv("REVOCATION_STORE_PATH", "revocations.sqlite3")
+    REVOCATION_SYNC_INTERVAL_SECONDS: float = float(
+        os.getenv("REVOCATION_SYNC_INTERVAL_SECONDS", "1")
+    )
+    # Authentication audit log (auth/audit_log.py), written in batches by a background thread
+    AUDIT_LOG_ENABLED: bool = os.getenv("AUDIT_LOG_ENABLED", "true").lower() == "true"
+    AUDIT_LOG_DIR: str = os.getenv("AUDIT_LOG_DIR", "audit_logs")
+    AUDIT_LOG_BUFFER_SIZE: int = int(os.getenv("AUDIT_LOG_BUFFER_SIZE", "65536"))
+    AUDIT_LOG_FLUSH_INTERVAL_MS: float = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL_MS", "100"))
+    AUDIT_LOG_SEGMENT_BYTES: int = int(os.getenv("AUDIT_LOG_SEGMENT_BYTES", "67108864"))
+    # Key required by the /admin endpoints in the X-Admin-Key header, empty disables them
+    ADMIN_API_KEY: str = os.getenv("ADMIN_API_KEY", "")
     JWT_PRIVATE_KEY_PATH: str = os.getenv(
         "JWT_PRIVATE_KEY_PATH",
         os.path.join(Path(__file__).parents[1], "doc/test_jwt_key/private_key.pem"),
@@ -39,23 +96,110 @@ class Settings(BaseSettings):
     DID_DOCUMENTS_PATH: str = os.getenv("DID_DOCUMENTS_PATH", "did_keys")
     DID_DOCUMENT_FILENAME: str = "did.json"
     PRIVATE_KEY_FILENAME: str = "key-1_private.pem"
+    # Maximum number of DID documents accepted by one bulk registration request
+    DID_BULK_MAX_DOCUMENTS: int = int(os.getenv("DID_BULK_MAX_DOCUMENTS", "1000"))
 
     # Target server settings (for client requests)
     TARGET_SERVER_HOST: str = os.getenv("TARGET_SERVER_HOST", "localhost")
     TARGET_SERVER_PORT: int = int(os.getenv("TARGET_SERVER_PORT", "8000"))
 
+    # Client token store shared by client processes, empty keeps tokens in memory only
+    CLIENT_TOKEN_STORE_PATH: str = os.getenv("CLIENT_TOKEN_STORE_PATH", "")
+    # Stored tokens are not sent within this many seconds of their expiry
+    CLIENT_TOKEN_EXPIRY_LEEWAY_SECONDS: int = int(
+        os.getenv("CLIENT_TOKEN_EXPIRY_LEEWAY_SECONDS", "30")
+    )
+
+    # Client pre-signed DID WBA header pool (auth/presign_pool.py)
+    PRESIGN_POOL_SIZE: int = int(os.getenv("PRESIGN_POOL_SIZE", "4"))
+    # Pooled headers are discarded this long before the server's timestamp window ends
+    PRESIGN_SAFETY_MARGIN_SECONDS: int = int(
+        os.getenv("PRESIGN_SAFETY_MARGIN_SECONDS", "60")
+    )
+
     # WBA settings
-    @property
+    @cached_property
     def WBA_SERVER_DOMAINS(self) -> List[str]:
-        """Get WBA server domains as a list from comma-separated string."""
-        domains_str = os.getenv("WBA_SERVER_DOMAINS", "localhost:8000")
-        return [domain.strip() for domain in domains_str.split(",")]
+        """Get WBA server domains as a list from comma-separated string (parsed once)."""
+        domains_str = os.getenv("WBA_SERVER_DOMAINS", "localhost:8000,127.0.0.1:8000")
+        return [domain.strip() for domain in domains_str.split(",") if domain.strip()]
+
+    # Hosts whose DIDs may authenticate (comma separated, with or without port), empty allows all
+    DID_ALLOWED_DOMAINS: str = os.getenv("DID_ALLOWED_DOMAINS", "")
+
+    # DID document cache (auth/did_cache.py)
+    DID_CACHE_TTL_SECONDS: float = float(os.getenv("DID_CACHE_TTL_SECONDS", "300"))
+    # Hot documents are re-fetched in the background this long before they expire
+    DID_CACHE_REFRESH_AHEAD_SECONDS: float = float(
+        os.getenv("DID_CACHE_REFRESH_AHEAD_SECONDS", "30")
+    )
+    DID_CACHE_HOT_THRESHOLD: int = int(os.getenv("DID_CACHE_HOT_THRESHOLD", "2"))
+    DID_CACHE_MAX_ENTRIES: int = int(os.getenv("DID_CACHE_MAX_ENTRIES", "10000"))
+    # Startup warmup: comma-separated DIDs, plus the most used DIDs of the previous run
+    DID_CACHE_WARMUP_DIDS: str = os.getenv("DID_CACHE_WARMUP_DIDS", "")
+    DID_CACHE_WARMUP_TOP_N: int = int(os.getenv("DID_CACHE_WARMUP_TOP_N", "100"))
+    DID_CACHE_WARMUP_TIMEOUT: float = float(
+        os.getenv("DID_CACHE_WARMUP_TIMEOUT", "10")
+    )
+    # Shared second-level cache (auth/did_cache_l2.py): "", "redis", "sqlite" or "memory"
+    DID_CACHE_L2_BACKEND: str = os.getenv("DID_CACHE_L2_BACKEND", "")
+    # redis://[:password@]host:port/db, or the SQLite file path
+    DID_CACHE_L2_URL: str = os.getenv("DID_CACHE_L2_URL", "")
+    DID_CACHE_L2_BATCH_WINDOW_MS: float = float(os.getenv("DID_CACHE_L2_BATCH_WINDOW_MS", "2"))
+    DID_CACHE_L2_LEASE_SECONDS: float = float(os.getenv("DID_CACHE_L2_LEASE_SECONDS", "5"))
+    # Access statistics persisted on shutdown, empty disables
+    DID_CACHE_STATS_PATH: str = os.getenv(
+        "DID_CACHE_STATS_PATH", "did_access_stats.json"
+    )
+
+    # Remote DID resolution guards, per host
+    RESOLVER_MAX_CONCURRENCY_PER_HOST: int = int(
+        os.getenv("RESOLVER_MAX_CONCURRENCY_PER_HOST", "10")
+    )
+    RESOLVER_CONNECT_TIMEOUT: float = float(os.getenv("RESOLVER_CONNECT_TIMEOUT", "2"))
+    RESOLVER_READ_TIMEOUT: float = float(os.getenv("RESOLVER_READ_TIMEOUT", "3"))
+    # Seconds to wait for a free per-host slot before failing the resolution
+    RESOLVER_QUEUE_TIMEOUT: float = float(os.getenv("RESOLVER_QUEUE_TIMEOUT", "1"))
+    RESOLVER_FAILURE_THRESHOLD: int = int(os.getenv("RESOLVER_FAILURE_THRESHOLD", "5"))
+    RESOLVER_RESET_TIMEOUT: float = float(os.getenv("RESOLVER_RESET_TIMEOUT", "30"))
+
+    # Rate limiting settings
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_IP_PER_SECOND: float = float(os.getenv("RATE_LIMIT_IP_PER_SECOND", "50"))
+    RATE_LIMIT_IP_BURST: float = float(os.getenv("RATE_LIMIT_IP_BURST", "100"))
+    RATE_LIMIT_DID_PER_SECOND: float = float(
+        os.getenv("RATE_LIMIT_DID_PER_SECOND", "2")
+    )
+    RATE_LIMIT_DID_BURST: float = float(os.getenv("RATE_LIMIT_DID_BURST", "10"))
+    RATE_LIMIT_MAX_BUCKETS: int = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+    # "memory" keeps buckets per worker, "sqlite" shares them between workers on one host
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_SQLITE_PATH: str = os.getenv(
+        "RATE_LIMIT_SQLITE_PATH", "rate_limit.sqlite3"
+    )
+
+    # Request body limits in bytes, and seconds allowed to receive a whole body
+    MAX_JSON_SIZE: int = int(os.getenv("MAX_JSON_SIZE", "2048"))  # 2KB
+    MAX_BULK_BODY_SIZE: int = int(os.getenv("MAX_BULK_BODY_SIZE", "2097152"))  # 2MB
+    BODY_READ_TIMEOUT_SECONDS: float = float(os.getenv("BODY_READ_TIMEOUT_SECONDS", "10"))
+
+    # Rolling deploys (core/lifecycle.py): seconds a worker keeps serving after SIGTERM
+    # while /ready reports 503, then seconds allowed for the requests in flight
+    SHUTDOWN_DRAIN_GRACE_SECONDS: float = float(os.getenv("SHUTDOWN_DRAIN_GRACE_SECONDS", "5"))
+    SHUTDOWN_DRAIN_TIMEOUT_SECONDS: float = float(
+        os.getenv("SHUTDOWN_DRAIN_TIMEOUT_SECONDS", "30")
+    )
+    # Used nonces shared by the workers of a host, empty keeps them per worker
+    # (only allowed with a single worker)
+    NONCE_SQLITE_PATH: str = os.getenv("NONCE_SQLITE_PATH", "used_nonces.sqlite3")
+    # Per-worker used nonces persisted on shutdown and loaded on startup, empty disables;
+    # only used when NONCE_SQLITE_PATH is empty, the shared store already survives restarts
+    NONCE_STORE_PATH: str = os.getenv("NONCE_STORE_PATH", "used_nonces.json")
 
     # Constants
     # The nonce expiration time should be greater than the timestamp expiration time to prevent nonce replay attacks
     NONCE_EXPIRATION_MINUTES: int = 6
     TIMESTAMP_EXPIRATION_MINUTES: int = 5
-    MAX_JSON_SIZE: int = 2048  # 2KB
 
     class Config:
         """Pydantic configuration class."""
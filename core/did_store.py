@@ -0,0 +1,127 @@
+"""
+File-based DID document store used by the DID document API.
+"""
+
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from core.config import settings
+from utils import fast_json
+
+# User IDs become directory names, so only allow a safe character set
+_USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+
+def validate_user_id(user_id: str) -> str:
+    """
+    Validate a user ID used as a storage key.
+
+    Args:
+        user_id: User identifier
+
+    Returns:
+        str: The user ID
+
+    Raises:
+        ValueError: If the user ID contains unsupported characters
+    """
+    if not _USER_ID_PATTERN.match(user_id) or ".." in user_id:
+        raise ValueError(f"Invalid user ID: {user_id!r}")
+    return user_id
+
+
+def write_file_atomic(path: Path, data: bytes) -> None:
+    """
+    Write a file atomically: readers see either the old or the new content.
+
+    Args:
+        path: Destination path
+        data: File content
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DIDDocumentStore:
+    """
+    Stores DID documents as {base_path}/user_{user_id}/did.json.
+    """
+
+    def __init__(self, base_path: Optional[Path] = None):
+        """
+        Args:
+            base_path: Storage directory (default: DID_DOCUMENTS_PATH relative to the project root)
+        """
+        if base_path is None:
+            base_path = Path(__file__).parent.parent.absolute() / settings.DID_DOCUMENTS_PATH
+        self.base_path = Path(base_path)
+
+    def user_dir(self, user_id: str) -> Path:
+        """Get the directory of a user."""
+        return self.base_path / f"user_{validate_user_id(user_id)}"
+
+    def document_path(self, user_id: str) -> Path:
+        """Get the DID document path of a user."""
+        return self.user_dir(user_id) / settings.DID_DOCUMENT_FILENAME
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        """
+        Load the DID document of a user.
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            Optional[Dict]: DID document, or None if it does not exist
+        """
+        did_path = self.document_path(user_id)
+        if not did_path.exists():
+            return None
+        return fast_json.load_file(did_path)
+
+    def save(self, user_id: str, did_document: Dict) -> Path:
+        """
+        Store the DID document of a user.
+
+        Args:
+            user_id: User identifier
+            did_document: DID document
+
+        Returns:
+            Path: Path of the stored document
+        """
+        did_path = self.document_path(user_id)
+        did_path.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomic(did_path, fast_json.dumps(did_document, indent=True))
+        return did_path
+
+    def save_many(self, documents: Iterable[Tuple[str, Dict]]) -> int:
+        """
+        Store several DID documents.
+
+        Args:
+            documents: (user_id, did_document) pairs
+
+        Returns:
+            int: Number of stored documents
+        """
+        count = 0
+        for user_id, did_document in documents:
+            self.save(user_id, did_document)
+            count += 1
+        return count
+
+
+did_store = DIDDocumentStore()
@@ -0,0 +1,187 @@
+"""
+Served domains and their tenant settings.
+
+The domains of WBA_SERVER_DOMAINS are parsed once at import into a read-only
+table mapping each host (lowercase, without port) to its tenant: token
+lifetime, JWT key pair and DID document storage. Requests are matched to
+their tenant by Host header with a single dict lookup, so a request for a
+domain this server does not serve is rejected before any header parsing or
+crypto.
+
+WBA_TENANTS is a JSON object overriding the global settings per served
+domain, e.g.:
+
+    {"agents.example.com": {"token_lifetime_minutes": 30,
+                            "jwt_private_key_path": "keys/example/private_key.pem",
+                            "jwt_public_key_path": "keys/example/public_key.pem",
+                            "did_documents_path": "did_keys/example"}}
+"""
+
+import logging
+import os
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
+
+from fastapi import HTTPException
+from fastapi.requests import HTTPConnection
+
+from core.config import settings
+from core.did_store import DIDDocumentStore, did_store
+from utils import fast_json
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+
+
+def split_host(host: str) -> str:
+    """
+    Get the lowercase host name of a Host header value, without its port.
+
+    Args:
+        host: Host header value, e.g. "Example.com:8000" or "[::1]:8000"
+
+    Returns:
+        str: Host name, e.g. "example.com"
+    """
+    host = host.strip().lower()
+    if host.startswith("["):
+        return host[: host.find("]") + 1]
+    return host.split(":", 1)[0]
+
+
+class Tenant:
+    """Settings of one served domain."""
+
+    __slots__ = (
+        "domain",
+        "token_lifetime_minutes",
+        "jwt_private_key_path",
+        "jwt_public_key_path",
+        "did_store",
+    )
+
+    def __init__(
+        self,
+        domain: str,
+        token_lifetime_minutes: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+        jwt_private_key_path: str = settings.JWT_PRIVATE_KEY_PATH,
+        jwt_public_key_path: str = settings.JWT_PUBLIC_KEY_PATH,
+        did_store: DIDDocumentStore = did_store,
+    ):
+        """
+        Args:
+            domain: Host name, without port
+            token_lifetime_minutes: Lifetime of the access tokens issued for the domain
+            jwt_private_key_path: Key signing the domain's access tokens
+            jwt_public_key_path: Key verifying the domain's access tokens
+            did_store: Store of the DID documents hosted on the domain
+        """
+        self.domain = domain
+        self.token_lifetime_minutes = token_lifetime_minutes
+        self.jwt_private_key_path = jwt_private_key_path
+        self.jwt_public_key_path = jwt_public_key_path
+        self.did_store = did_store
+
+    def __repr__(self) -> str:
+        return f"Tenant({self.domain!r})"
+
+
+def build_tenant_table(
+    server_domains: List[str], tenant_settings: Dict[str, Dict]
+) -> Mapping[str, Tenant]:
+    """
+    Build the read-only tenant table.
+
+    Args:
+        server_domains: Served hosts, with or without port
+        tenant_settings: Settings overrides by host
+
+    Returns:
+        Mapping[str, Tenant]: Tenants by lowercase host name
+
+    Raises:
+        ValueError: When tenant settings are invalid
+    """
+    stores: Dict[str, DIDDocumentStore] = {str(did_store.base_path): did_store}
+    tenants: Dict[str, Tenant] = {}
+
+    for host in server_domains:
+        domain = split_host(host)
+        if domain and domain not in tenants:
+            tenants[domain] = Tenant(domain)
+
+    for host, overrides in tenant_settings.items():
+        domain = split_host(host)
+        if domain not in tenants:
+            raise ValueError(f"Tenant {host!r} is not in WBA_SERVER_DOMAINS")
+        if not isinstance(overrides, dict):
+            raise ValueError(f"Invalid tenant settings for {host!r}")
+        unknown = set(overrides) - {
+            "token_lifetime_minutes",
+            "jwt_private_key_path",
+            "jwt_public_key_path",
+            "did_documents_path",
+        }
+        if unknown:
+            raise ValueError(f"Unknown tenant settings for {host!r}: {sorted(unknown)}")
+
+        store = did_store
+        if "did_documents_path" in overrides:
+            base_path = str(PROJECT_ROOT / overrides["did_documents_path"])
+            store = stores.setdefault(base_path, DIDDocumentStore(Path(base_path)))
+        tenants[domain] = Tenant(
+            domain,
+            token_lifetime_minutes=int(
+                overrides.get("token_lifetime_minutes", settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+            ),
+            jwt_private_key_path=overrides.get(
+                "jwt_private_key_path", settings.JWT_PRIVATE_KEY_PATH
+            ),
+            jwt_public_key_path=overrides.get(
+                "jwt_public_key_path", settings.JWT_PUBLIC_KEY_PATH
+            ),
+            did_store=store,
+        )
+
+    return MappingProxyType(tenants)
+
+
+TENANTS = build_tenant_table(
+    settings.WBA_SERVER_DOMAINS, fast_json.loads(os.getenv("WBA_TENANTS") or "{}")
+)
+logging.info(f"Serving domains: {', '.join(TENANTS)}")
+
+# The first configured domain, used where no request host is known
+DEFAULT_TENANT: Tenant = next(iter(TENANTS.values()), None) or Tenant(settings.LOCAL_HOST)
+
+
+def get_tenant(host: str) -> Optional[Tenant]:
+    """
+    Get the tenant serving a host.
+
+    Args:
+        host: Host header value or DID host, with or without port
+
+    Returns:
+        Optional[Tenant]: The tenant, or None if the host is not served
+    """
+    return TENANTS.get(split_host(host))
+
+
+def get_request_tenant(request: HTTPConnection) -> Tenant:
+    """
+    Get the tenant serving a request, from its Host header.
+
+    Args:
+        request: FastAPI request or WebSocket
+
+    Returns:
+        Tenant: The tenant
+
+    Raises:
+        HTTPException: 421 when the host is not served by this server
+    """
+    tenant = TENANTS.get(split_host(request.headers.get("host", "")))
+    if tenant is None:
+        raise HTTPException(status_code=421, detail="Unknown domain")
+    return tenant
@@ -0,0 +1,85 @@
+"""
+Worker lifecycle: readiness for load balancers and draining for rolling deploys.
+
+A worker starts in STATE_STARTING and only reports ready on GET /ready once
+the lifespan startup has loaded the JWT keys and used nonces, opened the
+resolver HTTP pool, started the background components and warmed the DID
+document cache.
+
+On the first SIGTERM the worker switches to STATE_DRAINING: /ready answers
+503 so load balancers stop routing to it, new WebSocket sessions are refused,
+and responses close their connection. It keeps serving for
+SHUTDOWN_DRAIN_GRACE_SECONDS, the time load balancers need to notice, then
+stops accepting connections, waits up to SHUTDOWN_DRAIN_TIMEOUT_SECONDS for
+the requests in flight, and flushes its state (used nonces, audit log, DID
+access statistics) before exiting.
+"""
+
+import logging
+import time
+from typing import Dict, Optional
+
+from core.admission import admission_controller
+
+STATE_STARTING = "starting"
+STATE_READY = "ready"
+STATE_DRAINING = "draining"
+STATE_STOPPED = "stopped"
+
+
+class WorkerLifecycle:
+    """Lifecycle state of one worker process."""
+
+    def __init__(self):
+        self.state = STATE_STARTING
+        self.started_at = time.monotonic()
+        self.startup_seconds: Optional[float] = None
+        self.drain_started_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == STATE_READY
+
+    @property
+    def draining(self) -> bool:
+        return self.state == STATE_DRAINING
+
+    def mark_ready(self) -> None:
+        """Report the worker ready, unless it is already shutting down."""
+        if self.state != STATE_STARTING:
+            return
+        self.state = STATE_READY
+        self.startup_seconds = time.monotonic() - self.started_at
+        logging.info(f"Worker ready after {self.startup_seconds:.3f}s")
+
+    def begin_drain(self) -> bool:
+        """
+        Stop reporting ready and close connections after their current response.
+
+        Safe to call from a signal handler.
+
+        Returns:
+            bool: False if the worker was already draining or stopped
+        """
+        if self.state in (STATE_DRAINING, STATE_STOPPED):
+            return False
+        self.state = STATE_DRAINING
+        self.drain_started_at = time.monotonic()
+        admission_controller.draining = True
+        logging.info("Worker draining, no longer ready")
+        return True
+
+    def mark_stopped(self) -> None:
+        self.state = STATE_STOPPED
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "startup_seconds": (
+                round(self.startup_seconds, 3) if self.startup_seconds is not None else None
+            ),
+            "in_flight": admission_controller.in_flight,
+        }
+
+
+lifecycle = WorkerLifecycle()
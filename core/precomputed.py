@@ -0,0 +1,235 @@
+"""
+Precomputed, compressed and cache-validated responses for static JSON documents.
+"""
+
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Response
+from starlette.datastructures import Headers
+
+from utils import fast_json
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Compressing tiny documents does not pay off
+MIN_COMPRESS_SIZE = 256
+
+
+def _serialize(document) -> bytes:
+    """Serialize a document to compact JSON bytes."""
+    return fast_json.dumps(document)
+
+
+def _parse_qvalue(params: List[str]) -> float:
+    """Get the q parameter of an Accept-Encoding item, 1.0 when absent or not a number."""
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                qvalue = float(value.strip())
+            except ValueError:
+                return 1.0
+            return qvalue if 0.0 <= qvalue <= 1.0 else 1.0
+    return 1.0
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into codings and their q-values."""
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if coding:
+            accepted[coding] = _parse_qvalue(params)
+    return accepted
+
+
+class PrecomputedJSON:
+    """
+    A JSON document serialized once, with gzip/brotli variants and a strong ETag.
+    """
+
+    __slots__ = ("bodies", "etag", "cache_control", "_raw_headers", "_not_modified_headers")
+
+    def __init__(self, document, cache_control: str = "public, max-age=300"):
+        """
+        Args:
+            document: JSON-serializable document
+            cache_control: Cache-Control header value
+        """
+        body = _serialize(document)
+        self.bodies: Dict[Optional[str], bytes] = {None: body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            if brotli is not None:
+                self.bodies["br"] = brotli.compress(body)
+            self.bodies["gzip"] = gzip.compress(body, mtime=0)
+
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.cache_control = cache_control
+
+        common = [
+            (b"etag", self.etag.encode()),
+            (b"cache-control", cache_control.encode()),
+            (b"vary", b"accept-encoding"),
+        ]
+        self._not_modified_headers = common
+        self._raw_headers = {}
+        for encoding, encoded_body in self.bodies.items():
+            headers = [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(encoded_body)).encode()),
+            ] + common
+            if encoding:
+                headers.append((b"content-encoding", encoding.encode()))
+            self._raw_headers[encoding] = headers
+
+    def is_not_modified(self, if_none_match: Optional[str]) -> bool:
+        """Check an If-None-Match header against the ETag (weak comparison)."""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+    def select_encoding(self, accept_encoding: Optional[str]) -> Optional[str]:
+        """Pick the stored encoding the client prefers, brotli on a tie."""
+        if not accept_encoding or len(self.bodies) == 1:
+            return None
+        accepted = _accepted_encodings(accept_encoding)
+        best, best_q = None, 0.0
+        for encoding in ("br", "gzip"):
+            if encoding not in self.bodies:
+                continue
+            # "*" covers the codings not listed explicitly
+            qvalue = accepted.get(encoding, accepted.get("*", 0.0))
+            if qvalue > best_q:
+                best, best_q = encoding, qvalue
+        return best
+
+    def render(
+        self, if_none_match: Optional[str], accept_encoding: Optional[str]
+    ) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        """
+        Select status, raw headers and body for a request.
+
+        Args:
+            if_none_match: If-None-Match request header
+            accept_encoding: Accept-Encoding request header
+
+        Returns:
+            Tuple[int, List[Tuple[bytes, bytes]], bytes]: Status, headers and body
+        """
+        if self.is_not_modified(if_none_match):
+            return 304, self._not_modified_headers, b""
+        encoding = self.select_encoding(accept_encoding)
+        return 200, self._raw_headers[encoding], self.bodies[encoding]
+
+    def to_response(self, request_headers: Headers) -> Response:
+        """
+        Build a response for a route handler.
+
+        Args:
+            request_headers: Request headers
+
+        Returns:
+            Response: 304 or 200 response with the best encoding
+        """
+        status, raw_headers, body = self.render(
+            request_headers.get("if-none-match"),
+            request_headers.get("accept-encoding"),
+        )
+        response = Response(content=body, status_code=status)
+        response.raw_headers = list(raw_headers)
+        return response
+
+
+class PrecomputedJSONCache:
+    """Bounded LRU of precomputed documents, for documents that vary by a key."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, PrecomputedJSON]" = OrderedDict()
+
+    def get(self, key: str, build: Callable[[], PrecomputedJSON]) -> PrecomputedJSON:
+        """Return the cached document for key, building it on first use."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = build()
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+
+# Static documents served by PrecomputedResponseMiddleware, by request path
+PRECOMPUTED_DOCUMENTS: Dict[str, PrecomputedJSON] = {}
+
+
+def register_precomputed_document(
+    path: str, document, cache_control: str = "public, max-age=300"
+) -> PrecomputedJSON:
+    """
+    Serve a static JSON document at path directly from the middleware.
+
+    Args:
+        path: Request path
+        document: JSON-serializable document
+        cache_control: Cache-Control header value
+
+    Returns:
+        PrecomputedJSON: The precomputed document
+    """
+    precomputed = PrecomputedJSON(document, cache_control)
+    PRECOMPUTED_DOCUMENTS[path] = precomputed
+    return precomputed
+
+
+def _find_header(raw_headers: Iterable[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    """Find a request header in ASGI raw headers."""
+    for key, value in raw_headers:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class PrecomputedResponseMiddleware:
+    """
+    ASGI middleware answering GET/HEAD requests for registered static documents
+    without calling the route handler.
+    """
+
+    def __init__(self, app, documents: Optional[Dict[str, PrecomputedJSON]] = None):
+        self.app = app
+        self.documents = PRECOMPUTED_DOCUMENTS if documents is None else documents
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            document = self.documents.get(scope["path"])
+            if document is not None:
+                raw_headers = scope["headers"]
+                status, headers, body = document.render(
+                    _find_header(raw_headers, b"if-none-match"),
+                    _find_header(raw_headers, b"accept-encoding"),
+                )
+                await send(
+                    {"type": "http.response.start", "status": status, "headers": headers}
+                )
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": body if scope["method"] == "GET" else b"",
+                    }
+                )
+                return
+
+        await self.app(scope, receive, send)
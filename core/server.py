@@ -0,0 +1,294 @@
+"""
+Production server launcher with a pre-fork multi-worker model.
+"""
+
+import importlib.util
+import logging
+import os
+import random
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+import uvicorn
+
+from core.config import settings
+from core.lifecycle import lifecycle
+from utils.log_base import stop_logging
+
+
+def _select_loop() -> str:
+    """Use uvloop when it is installed, otherwise the default asyncio loop."""
+    if importlib.util.find_spec("uvloop") is not None:
+        return "uvloop"
+    logging.warning("uvloop is not installed, falling back to the asyncio event loop")
+    return "asyncio"
+
+
+def _select_http() -> str:
+    """Use the httptools parser when it is installed, otherwise h11."""
+    if importlib.util.find_spec("httptools") is not None:
+        return "httptools"
+    logging.warning("httptools is not installed, falling back to the h11 HTTP parser")
+    return "h11"
+
+
+def _bind_socket(host: str, port: int, reuse_port: bool, backlog: int) -> socket.socket:
+    """
+    Create a listening socket.
+
+    Args:
+        host: Bind address
+        port: Bind port
+        reuse_port: Whether to set SO_REUSEPORT so several sockets share the port
+        backlog: Listen backlog
+
+    Returns:
+        socket.socket: Listening socket
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload_application() -> None:
+    """
+    Load everything workers share before forking, so that forked workers
+    share the memory copy-on-write instead of loading it again.
+    """
+    from auth.jwt_keys import preload_jwt_keys
+
+    preload_jwt_keys()
+    logging.info("Preloaded JWT keys and settings")
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn server that keeps serving for a grace period after the first
+    termination signal while /ready reports 503, so that load balancers stop
+    routing to the worker before it closes its listening socket.
+
+    A second signal exits immediately.
+    """
+
+    def __init__(self, config: uvicorn.Config, drain_grace: float):
+        super().__init__(config)
+        self.drain_grace = drain_grace
+        self._exit_at: Optional[float] = None
+
+    def handle_exit(self, sig, frame) -> None:
+        if self._exit_at is None and self.drain_grace > 0 and lifecycle.begin_drain():
+            self._exit_at = time.monotonic() + self.drain_grace
+            return
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        if self._exit_at is not None and time.monotonic() >= self._exit_at:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+class PreforkServer:
+    """
+    Pre-fork supervisor: the parent preloads the application, forks worker
+    processes that each run a uvicorn server, and replaces workers that exit
+    (for example after serving their maximum number of requests).
+
+    SIGTERM is forwarded to the workers, which drain before exiting (see
+    DrainingServer and core/lifecycle.py).
+
+    With SO_REUSEPORT every worker binds its own socket and the kernel balances
+    connections between them; otherwise all workers accept on one inherited socket.
+    """
+
+    def __init__(
+        self,
+        app,
+        host: str,
+        port: int,
+        workers: int,
+        max_requests: int = 0,
+        max_requests_jitter: int = 0,
+        reuse_port: bool = True,
+        backlog: int = 2048,
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.reuse_port = reuse_port and hasattr(socket, "SO_REUSEPORT")
+        self.backlog = backlog
+        self.loop = _select_loop()
+        self.http = _select_http()
+
+        self._shared_socket: Optional[socket.socket] = None
+        self._children: Dict[int, int] = {}  # pid -> worker index
+        self._stopping = False
+
+    def _worker_socket(self) -> socket.socket:
+        """Get the socket a new worker accepts on."""
+        if self.reuse_port:
+            return _bind_socket(self.host, self.port, True, self.backlog)
+        return self._shared_socket
+
+    def _run_worker(self, index: int) -> None:
+        """Run one uvicorn server in the current (forked) process."""
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        random.seed()
+
+        max_requests = None
+        if self.max_requests > 0:
+            max_requests = self.max_requests + random.randint(
+                0, max(0, self.max_requests_jitter)
+            )
+
+        config = uvicorn.Config(
+            self.app,
+            loop=self.loop,
+            http=self.http,
+            lifespan="on",
+            access_log=False,
+            log_config=None,
+            limit_max_requests=max_requests,
+            backlog=self.backlog,
+            timeout_graceful_shutdown=settings.SHUTDOWN_DRAIN_TIMEOUT_SECONDS,
+        )
+        server = DrainingServer(config, settings.SHUTDOWN_DRAIN_GRACE_SECONDS)
+        logging.info(
+            f"Worker {index} (pid {os.getpid()}) serving, max requests: {max_requests}"
+        )
+        server.run(sockets=[self._worker_socket()])
+
+    def _spawn(self, index: int) -> None:
+        """Fork a worker process."""
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._run_worker(index)
+            except BaseException as e:
+                logging.error(f"Worker {index} crashed: {e}")
+                exit_code = 1
+            finally:
+                stop_logging()
+                os._exit(exit_code)
+        self._children[pid] = index
+
+    def _handle_stop(self, signum, frame) -> None:
+        """Forward termination to all workers and stop respawning them."""
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        """Preload, fork the workers and supervise them until terminated."""
+        preload_application()
+        if not self.reuse_port:
+            self._shared_socket = _bind_socket(
+                self.host, self.port, False, self.backlog
+            )
+
+        logging.info(
+            f"Starting {self.workers} workers on {self.host}:{self.port} "
+            f"(loop={self.loop}, http={self.http}, reuse_port={self.reuse_port})"
+        )
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+
+        for index in range(self.workers):
+            self._spawn(index)
+
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            index = self._children.pop(pid, None)
+            if index is None or self._stopping:
+                continue
+
+            logging.info(
+                f"Worker {index} (pid {pid}) exited with status "
+                f"{os.waitstatus_to_exitcode(status)}, restarting"
+            )
+            if os.waitstatus_to_exitcode(status) != 0:
+                # Avoid a tight crash loop
+                time.sleep(1)
+            self._spawn(index)
+
+        logging.info("All workers stopped")
+
+
+def run_production_server(
+    app,
+    workers: Optional[int] = None,
+    max_requests: Optional[int] = None,
+) -> None:
+    """
+    Run the application in production mode with several worker processes.
+
+    Host, port, SO_REUSEPORT, backlog and restart jitter come from settings.
+    Falls back to uvicorn's own multi-process mode on platforms without fork.
+    Several workers need the shared nonce store (NONCE_SQLITE_PATH), otherwise
+    a DID WBA header could be replayed once against every worker.
+
+    Args:
+        app: ASGI application, imported before forking
+        workers: Number of worker processes (default: SERVER_WORKERS)
+        max_requests: Restart a worker after this many requests, 0 disables
+            (default: SERVER_MAX_REQUESTS)
+    """
+    host = settings.LOCAL_HOST
+    port = settings.LOCAL_PORT
+    workers = workers or settings.SERVER_WORKERS
+    max_requests = (
+        settings.SERVER_MAX_REQUESTS if max_requests is None else max_requests
+    )
+    backlog = settings.SERVER_BACKLOG
+
+    if workers > 1 and not settings.NONCE_SQLITE_PATH:
+        # Each worker would accept a captured header once within its timestamp window
+        logging.error("NONCE_SQLITE_PATH must be set to run more than one worker")
+        raise SystemExit(1)
+
+    if not hasattr(os, "fork"):
+        logging.warning("fork is not available, using uvicorn multi-process mode")
+        uvicorn.run(
+            "did_server:app",
+            host=host,
+            port=port,
+            workers=workers,
+            loop=_select_loop(),
+            http=_select_http(),
+            limit_max_requests=max_requests or None,
+            backlog=backlog,
+            access_log=False,
+        )
+        return
+
+    PreforkServer(
+        app,
+        host=host,
+        port=port,
+        workers=workers,
+        max_requests=max_requests,
+        max_requests_jitter=settings.SERVER_MAX_REQUESTS_JITTER,
+        reuse_port=settings.SERVER_REUSE_PORT,
+        backlog=backlog,
+    ).run()
@@ -0,0 +1,39 @@
+"""
+Server clock header sent on every response, so clients can estimate their clock skew.
+"""
+
+import time
+
+# Server wall-clock time as Unix seconds with millisecond precision
+SERVER_TIME_HEADER = "X-Server-Time"
+
+_SERVER_TIME_HEADER_RAW = SERVER_TIME_HEADER.lower().encode("latin-1")
+
+
+class ServerTimeMiddleware:
+    """
+    ASGI middleware adding the X-Server-Time header to every HTTP response,
+    including authentication failures and precomputed documents.
+
+    The Date header only has second precision and is cached by the server,
+    so it is not precise enough for skew estimation.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_server_time(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (_SERVER_TIME_HEADER_RAW, f"{time.time():.3f}".encode("latin-1"))
+                )
+                message = dict(message, headers=headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_server_time)
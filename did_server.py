@@ -14,18 +14,33 @@ from pathlib import Path
 
 from core.config import settings
 from core.app import create_app
+from core.server import run_production_server
+from core.precomputed import register_precomputed_document
 from auth.did_auth import (
     generate_or_load_did,
     send_authenticated_request,
     send_request_with_token,
-    DIDWbaAuthHeader,
 )
+from auth.clock_skew import SkewAwareDIDWbaAuthHeader
 from utils.log_base import set_log_color_level
+from utils.load_generator import DEFAULT_METHOD_MIX, run_load_test
+from utils.provisioning import run_provisioning
 
 # Create FastAPI application
 app = create_app()
 
 
+# Server status document, served precomputed by PrecomputedResponseMiddleware
+ROOT_STATUS = {
+    "status": "running",
+    "service": "DID WBA Example",
+    "version": "0.1.0",
+    "mode": "Client and Server",
+    "documentation": "/docs",
+}
+register_precomputed_document("/", ROOT_STATUS, cache_control="no-cache")
+
+
 @app.get("/", tags=["status"])
 async def root():
     """
@@ -34,13 +49,7 @@ async def root():
     Returns:
         dict: Server status information
     """
-    return {
-        "status": "running",
-        "service": "DID WBA Example",
-        "version": "0.1.0",
-        "mode": "Client and Server",
-        "documentation": "/docs",
-    }
+    return ROOT_STATUS
 
 
 async def client_example(unique_id: str = None):
@@ -69,8 +78,8 @@ async def client_example(unique_id: str = None):
         base_url = f"http://{target_host}:{target_port}"
         test_url = f"{base_url}/wba/test"
 
-        # 3. Create DIDWbaAuthHeader instance
-        auth_client = DIDWbaAuthHeader(
+        # 3. Create DIDWbaAuthHeader instance, timestamping headers with the server clock
+        auth_client = SkewAwareDIDWbaAuthHeader(
             did_document_path=str(did_document_path),
             private_key_path=str(private_key_path),
         )
@@ -122,6 +131,126 @@ if __name__ == "__main__":
         help=f"Server port (default: {settings.LOCAL_PORT})",
         default=settings.LOCAL_PORT,
     )
+    parser.add_argument(
+        "--prod",
+        action="store_true",
+        help="Run the server in production mode with several worker processes",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=f"Worker processes in production mode (default: {settings.SERVER_WORKERS})",
+        default=None,
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        help="Restart a production worker after this many requests, 0 disables "
+        f"(default: {settings.SERVER_MAX_REQUESTS})",
+        default=None,
+    )
+
+    # Load generator options
+    load_group = parser.add_argument_group("load generator")
+    load_group.add_argument(
+        "--load",
+        action="store_true",
+        help="Simulate a population of agents against the target server",
+    )
+    load_group.add_argument(
+        "--target",
+        type=str,
+        help="Target server base URL (default: TARGET_SERVER_HOST:TARGET_SERVER_PORT)",
+        default=None,
+    )
+    load_group.add_argument(
+        "--agents", type=int, help="Number of agent identities", default=1000
+    )
+    load_group.add_argument(
+        "--arrival-rate",
+        type=float,
+        help="Agent session arrivals per second",
+        default=50.0,
+    )
+    load_group.add_argument(
+        "--duration", type=float, help="Load duration in seconds", default=60.0
+    )
+    load_group.add_argument(
+        "--mix",
+        type=str,
+        help=f"Method mix as operation=weight pairs (default: {DEFAULT_METHOD_MIX})",
+        default=DEFAULT_METHOD_MIX,
+    )
+    load_group.add_argument(
+        "--requests-per-session",
+        type=int,
+        help="Requests performed by each agent session",
+        default=5,
+    )
+    load_group.add_argument(
+        "--think-time",
+        type=float,
+        help="Mean pause between requests of a session in seconds",
+        default=0.1,
+    )
+    load_group.add_argument(
+        "--token-ttl",
+        type=float,
+        help="Seconds after which agents treat their token as expired "
+        "(default: ACCESS_TOKEN_EXPIRE_MINUTES)",
+        default=None,
+    )
+    load_group.add_argument(
+        "--concurrency",
+        type=int,
+        help="Maximum concurrent connections to the target",
+        default=1000,
+    )
+    load_group.add_argument(
+        "--report-interval",
+        type=float,
+        help="Seconds between live reports",
+        default=5.0,
+    )
+
+    # Bulk provisioning options
+    provision_group = parser.add_argument_group("bulk provisioning")
+    provision_group.add_argument(
+        "--provision",
+        type=int,
+        metavar="N",
+        help="Mint N DID identities in parallel and exit (resumable)",
+        default=None,
+    )
+    provision_group.add_argument(
+        "--provision-prefix",
+        type=str,
+        help="User ID prefix of provisioned identities",
+        default="agent",
+    )
+    provision_group.add_argument(
+        "--provision-start",
+        type=int,
+        help="Index of the first provisioned identity",
+        default=0,
+    )
+    provision_group.add_argument(
+        "--provision-workers",
+        type=int,
+        help="Worker processes used for minting (default: CPU count)",
+        default=None,
+    )
+    provision_group.add_argument(
+        "--provision-batch-size",
+        type=int,
+        help="Identities per minting batch and per registration request",
+        default=200,
+    )
+    provision_group.add_argument(
+        "--register",
+        action="store_true",
+        help="Register provisioned DID documents with the --target server in bulk",
+    )
 
     args = parser.parse_args()
     client_args = args  # Save to global variable for startup event use
@@ -129,6 +258,43 @@ if __name__ == "__main__":
     if args.port != settings.LOCAL_PORT:
         settings.LOCAL_PORT = args.port
 
+    target = (
+        args.target
+        or f"http://{settings.TARGET_SERVER_HOST}:{settings.TARGET_SERVER_PORT}"
+    )
+
+    # Bulk provisioning mode mints identities and exits
+    if args.provision is not None:
+        asyncio.run(
+            run_provisioning(
+                count=args.provision,
+                prefix=args.provision_prefix,
+                start=args.provision_start,
+                workers=args.provision_workers,
+                batch_size=args.provision_batch_size,
+                register_url=target if args.register else None,
+            )
+        )
+        raise SystemExit(0)
+
+    # Load generator mode runs against a target server and exits
+    if args.load:
+        asyncio.run(
+            run_load_test(
+                base_url=target,
+                agent_count=args.agents,
+                arrival_rate=args.arrival_rate,
+                duration=args.duration,
+                method_mix=args.mix,
+                requests_per_session=args.requests_per_session,
+                think_time=args.think_time,
+                token_ttl=args.token_ttl,
+                concurrency=args.concurrency,
+                report_interval=args.report_interval,
+            )
+        )
+        raise SystemExit(0)
+
     # If client mode is enabled, run client example in a separate thread
     if args.client:
 
@@ -147,6 +313,12 @@ if __name__ == "__main__":
     )
 
     # Run server
+    if args.prod:
+        run_production_server(
+            app, workers=args.workers, max_requests=args.max_requests
+        )
+        raise SystemExit(0)
+
     uvicorn.run(
         "did_server:app",
         host=settings.LOCAL_HOST,
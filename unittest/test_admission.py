@@ -0,0 +1,58 @@
+"""
+Tests for admission control under overload.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.admission import AdmissionController, AdmissionMiddleware
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def call(middleware, path, authorization=None):
+    headers = [(b"authorization", authorization)] if authorization else []
+    scope = {"type": "http", "path": path, "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return messages[0]
+
+
+def test_overload_sheds_handshakes_and_bulk_but_not_bearer_requests():
+    controller = AdmissionController(max_in_flight=10, max_loop_lag=0.1, retry_after=2)
+    middleware = AdmissionMiddleware(ok_app, controller)
+    handshake = b'DIDWba did="did:wba:example.com:user:1"'
+
+    assert call(middleware, "/auth/did-wba", handshake)["status"] == 200
+
+    # Event loop lagging behind
+    controller.monitor.lag = 0.5
+    shed = call(middleware, "/auth/did-wba", handshake)
+    assert shed["status"] == 503
+    assert (b"retry-after", b"2") in shed["headers"]
+    assert call(middleware, "/wba/user/_bulk")["status"] == 503
+    assert call(middleware, "/wba/test", b"Bearer token")["status"] == 200
+    assert call(middleware, "/agents/example/ad.json")["status"] == 200
+
+    # Too many requests in flight
+    controller.monitor.lag = 0.0
+    controller.in_flight = 10
+    assert call(middleware, "/auth/did-wba", handshake)["status"] == 503
+    controller.in_flight = 0
+    assert call(middleware, "/auth/did-wba", handshake)["status"] == 200
+
+    assert controller.stats()["shed"] == 3
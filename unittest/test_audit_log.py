@@ -0,0 +1,55 @@
+"""
+Tests for the authentication audit log.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth.audit_log import (
+    OUTCOME_ACCEPTED,
+    OUTCOME_REJECTED,
+    AuditLog,
+    list_segments,
+    read_events,
+)
+
+
+def test_events_are_written_in_batches_to_rotated_segments(tmp_path):
+    log = AuditLog(str(tmp_path), buffer_size=1000, flush_interval=0.01, segment_bytes=1000)
+    alice = "did:wba:example.com:user:alice"
+
+    async def run():
+        log.start()
+        for i in range(20):
+            log.record("DIDWba", alice, OUTCOME_ACCEPTED, "", "example.com", 0.002)
+            log.record("Bearer", None, OUTCOME_REJECTED, "Invalid token", "example.com", 0.0001)
+            if i % 5 == 4:
+                await asyncio.sleep(0.05)
+        await log.stop()
+
+    asyncio.run(run())
+
+    assert log.stats()["written"] == 40
+    assert log.stats()["batches"] < 40
+    assert len(list_segments(str(tmp_path))) > 1
+
+    events = list(read_events(str(tmp_path)))
+    assert len(events) == 40
+    assert events[0]["did"] == alice and events[0]["latency_ms"] == 2.0
+
+    rejected = list(read_events(str(tmp_path), outcome=OUTCOME_REJECTED))
+    assert len(rejected) == 20
+    assert {event["reason"] for event in rejected} == {"Invalid token"}
+    assert len(list(read_events(str(tmp_path), did=alice, since=events[-1]["ts"] + 1))) == 0
+
+
+def test_full_buffer_drops_oldest_events(tmp_path):
+    log = AuditLog(str(tmp_path), buffer_size=3)
+    for i in range(5):
+        log.record("Bearer", f"did:wba:example.com:user:{i}", OUTCOME_ACCEPTED)
+    assert log.stats()["dropped"] == 2
+    assert log.stats()["buffered"] == 3
@@ -0,0 +1,38 @@
+"""
+Tests for the authentication context shared by the middleware and routes.
+"""
+
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth import auth_middleware
+from core.app import create_app
+
+DID = "did:wba:localhost%3A8000:wba:user:context"
+
+
+def test_middleware_verifies_once_and_routes_reuse_the_context(monkeypatch):
+    calls = []
+
+    async def handle_did_auth(authorization, domain, tenant=None):
+        calls.append(authorization)
+        return {"did": DID, "access_token": "issued-token", "expires_at": None}
+
+    monkeypatch.setattr(auth_middleware, "handle_did_auth", handle_did_auth)
+    client = TestClient(create_app(), base_url="http://localhost:8000")
+    headers = {"Authorization": 'DIDWba did="placeholder"'}
+
+    response = client.post("/auth/did-wba", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"access_token": "issued-token", "token_type": "bearer", "did": DID}
+    assert response.headers["authorization"] == "bearer issued-token"
+
+    response = client.get("/wba/test", headers=headers)
+    assert response.json()["did"] == DID
+    assert calls == [headers["Authorization"]] * 2
+
@@ -0,0 +1,64 @@
+"""
+Tests for request body limits.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.body_limit import BodyLimitMiddleware
+
+
+async def echo_app(scope, receive, send):
+    """Read the whole body like a route handler, answer with its size."""
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        size += len(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(size).encode()})
+
+
+def call(middleware, chunks, path="/wba/user/alice/did.json", content_length=None, delay=0.0):
+    headers = []
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    scope = {"type": "http", "method": "PUT", "path": path, "headers": headers}
+    pending = list(chunks)
+    reads = []
+    messages = []
+
+    async def receive():
+        await asyncio.sleep(delay)
+        chunk = pending.pop(0)
+        reads.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(pending)}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return messages[0]["status"], len(reads)
+
+
+def test_body_limits():
+    middleware = BodyLimitMiddleware(
+        echo_app, default_limit=100, limits={("PUT", "/big"): 1000}, read_timeout=0.2
+    )
+
+    assert call(middleware, [b"x" * 60, b"x" * 40], content_length=100) == (200, 2)
+
+    # Declared too large: rejected without reading the body
+    assert call(middleware, [b"x" * 200], content_length=200) == (413, 0)
+    assert call(middleware, [b"x" * 200], path="/big", content_length=200) == (200, 1)
+
+    # Streamed without Content-Length: aborted at the chunk crossing the limit
+    assert call(middleware, [b"x" * 60] * 5) == (413, 2)
+
+    # Slow drip: aborted once the read deadline passes
+    assert call(middleware, [b"x"] * 50, delay=0.05)[0] == 408
@@ -0,0 +1,61 @@
+"""
+Tests for client clock skew estimation and skew-adjusted DID WBA headers.
+"""
+
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from agent_connect.authentication import (
+    create_did_wba_document,
+    extract_auth_header_parts,
+    verify_auth_header_signature,
+)
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth.clock_skew import ClockSkewEstimator, generate_auth_header_at
+
+
+def test_estimator_smooths_samples_and_follows_clock_steps():
+    estimator = ClockSkewEstimator(alpha=0.5, step_threshold=5.0)
+    url = "http://example.com:8000/wba/test"
+
+    # Server is 100s ahead, request took 2s
+    assert estimator.observe(url, {"X-Server-Time": "1101.0"}, 1000.0, 1002.0) == 100.0
+    assert estimator.get_offset("example.com") == 100.0
+
+    # A slightly different sample is averaged in
+    estimator.observe(url, {"x-server-time": "1103.0"}, 1001.0, 1001.0)
+    assert estimator.get_offset("example.com") == pytest.approx(101.0)
+
+    # A clock step replaces the estimate
+    estimator.observe(url, {"X-Server-Time": "1000.0"}, 1000.0, 1000.0)
+    assert estimator.get_offset("example.com") == 0.0
+
+    # Responses without the header are ignored
+    assert estimator.observe(url, {}, 1000.0, 1000.0) is None
+    assert estimator.get_offset("other.example.com") == 0.0
+
+
+def test_header_with_explicit_timestamp_verifies():
+    did_document, keys = create_did_wba_document(
+        hostname="localhost", port=8000, path_segments=["wba", "user", "skew"]
+    )
+    private_key = serialization.load_pem_private_key(keys["key-1"][0], password=None)
+
+    def sign(content: bytes, fragment: str) -> bytes:
+        return private_key.sign(content, ec.ECDSA(hashes.SHA256()))
+
+    timestamp = datetime.now(timezone.utc) + timedelta(minutes=10)
+    header = generate_auth_header_at(did_document, "localhost", sign, timestamp)
+
+    _, _, header_timestamp, _, _ = extract_auth_header_parts(header)
+    assert header_timestamp == timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    is_valid, message = verify_auth_header_signature(header, did_document, "localhost")
+    assert is_valid, message
@@ -0,0 +1,40 @@
+"""
+Tests for in-process resolution of DIDs hosted by this server.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth import custom_did_resolver
+from auth.custom_did_resolver import is_self_hosted_did, resolve_did_document
+from core.did_store import DIDDocumentStore
+from core.domains import get_tenant
+
+DID = "did:wba:localhost%3A8000:wba:user:alice"
+
+
+def test_self_hosted_dids_resolve_from_the_store_without_http(tmp_path, monkeypatch):
+    store = DIDDocumentStore(tmp_path)
+    monkeypatch.setattr(get_tenant("localhost"), "did_store", store)
+    fetched = []
+
+    async def fetch_json(url):
+        fetched.append(url)
+        return None
+
+    monkeypatch.setattr(custom_did_resolver.resolver_guard, "fetch_json", fetch_json)
+
+    store.save("alice", {"id": DID})
+    # A stored document must belong to the DID it is resolved for
+    store.save("mallory", {"id": DID})
+
+    assert is_self_hosted_did(DID)
+    assert asyncio.run(resolve_did_document(DID)) == {"id": DID}
+    assert asyncio.run(resolve_did_document(DID.replace("alice", "mallory"))) is None
+    assert asyncio.run(resolve_did_document(DID.replace("alice", "nobody"))) is None
+    assert asyncio.run(resolve_did_document(DID.replace(":wba:user:", ":other:"))) is None
+    assert fetched == []
@@ -0,0 +1,222 @@
+"""
+Tests for the DID document cache: single-flight, refresh-ahead, warmup and
+invalidation.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api import admin_router
+from auth import did_cache
+from auth.did_cache import DIDDocumentCache
+from auth.did_cache_l2 import L2DocumentCache, MemoryL2Backend
+from auth.revocation import RevocationList, SQLiteRevocationLog
+from core.app import create_app
+
+DID = "did:wba:partner.example.com:user:alice"
+
+
+class CountingResolver:
+    def __init__(self, delay=0.01, missing=()):
+        self.calls = 0
+        self.version = 1
+        self.delay = delay
+        self.missing = set(missing)
+
+    async def __call__(self, did):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if did in self.missing:
+            return None
+        return {"id": did, "version": self.version}
+
+
+def make_cache(resolver, **kwargs):
+    return DIDDocumentCache(resolver=resolver, should_cache=lambda did: True, **kwargs)
+
+
+def test_concurrent_misses_resolve_once():
+    async def scenario():
+        resolver = CountingResolver()
+        cache = make_cache(resolver)
+        documents = await asyncio.gather(*(cache.get(DID) for _ in range(20)))
+        assert all(document["id"] == DID for document in documents)
+        assert resolver.calls == 1
+        assert await cache.get(DID) == documents[0]
+        assert cache.stats()["hits"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_uncached_dids_always_resolve():
+    async def scenario():
+        resolver = CountingResolver()
+        cache = DIDDocumentCache(resolver=resolver, should_cache=lambda did: False)
+        await cache.get(DID)
+        await cache.get(DID)
+        assert resolver.calls == 2
+        assert cache.stats()["entries"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_hot_document_is_refreshed_ahead_of_expiry():
+    async def scenario():
+        resolver = CountingResolver()
+        cache = make_cache(resolver, ttl=60.0, refresh_ahead=30.0, hot_threshold=2)
+        # Stored with less than refresh_ahead left
+        cache.put(DID, {"id": DID, "version": 1}, ttl=10.0)
+        resolver.version = 2
+
+        # A single use does not make the document hot
+        assert (await cache.get(DID))["version"] == 1
+        assert cache.refreshes == 0
+
+        # The hot use is served the current copy while the refresh runs
+        assert (await cache.get(DID))["version"] == 1
+        assert cache.refreshes == 1
+        await asyncio.gather(*cache._refresh_tasks)
+
+        assert (await cache.get(DID))["version"] == 2
+        assert resolver.calls == 1
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+def test_cold_document_is_not_refreshed():
+    async def scenario():
+        resolver = CountingResolver()
+        cache = make_cache(resolver, refresh_ahead=30.0, hot_threshold=5)
+        cache.put(DID, {"id": DID, "version": 1}, ttl=10.0)
+        for _ in range(4):
+            await cache.get(DID)
+        assert cache.refreshes == 0
+        assert resolver.calls == 0
+
+    asyncio.run(scenario())
+
+
+def test_entries_are_bounded():
+    cache = make_cache(CountingResolver(), max_entries=2)
+    for i in range(3):
+        cache.put(f"{DID}{i}", {"id": f"{DID}{i}"})
+    assert list(cache._entries) == [f"{DID}1", f"{DID}2"]
+
+
+def test_warmup_loads_missing_documents():
+    async def scenario():
+        missing = f"{DID}:missing"
+        resolver = CountingResolver(missing=[missing])
+        cache = make_cache(resolver)
+        cache.put(f"{DID}:cached", {"id": f"{DID}:cached"})
+
+        loaded = await cache.warmup(
+            [f"{DID}:1", f"{DID}:2", f"{DID}:1", f"{DID}:cached", missing]
+        )
+        assert loaded == 2
+        # Duplicates and cached documents are not resolved again
+        assert resolver.calls == 3
+
+    asyncio.run(scenario())
+
+
+def test_warmup_is_bounded_by_timeout():
+    async def scenario():
+        resolver = CountingResolver(delay=5.0)
+        cache = make_cache(resolver)
+        loaded = await cache.warmup([f"{DID}:{i}" for i in range(3)], timeout=0.05)
+        assert loaded == 0
+
+    asyncio.run(scenario())
+
+
+def test_access_stats_roundtrip(tmp_path):
+    stats_path = str(tmp_path / "did_access_stats.json")
+
+    async def scenario():
+        cache = make_cache(CountingResolver(), stats_path=stats_path)
+        for _ in range(6):
+            await cache.get(f"{DID}:hot")
+        for _ in range(2):
+            await cache.get(f"{DID}:warm")
+        await cache.get(f"{DID}:cold")
+        cache.save_access_stats()
+
+    asyncio.run(scenario())
+
+    cache = make_cache(CountingResolver(), stats_path=stats_path)
+    cache.load_access_stats()
+    # Old counts are halved, single uses are dropped
+    assert cache.access_counts == {f"{DID}:hot": 3, f"{DID}:warm": 1}
+    assert cache.top_dids(1) == [f"{DID}:hot"]
+
+
+def test_warmup_did_cache_uses_configured_and_top_dids(tmp_path, monkeypatch):
+    stats_path = tmp_path / "did_access_stats.json"
+    stats_path.write_text(f'{{"{DID}:top": 10, "{DID}:rare": 4}}')
+    resolver = CountingResolver()
+    cache = make_cache(resolver, stats_path=str(stats_path))
+    monkeypatch.setattr(did_cache, "did_document_cache", cache)
+    monkeypatch.setattr(did_cache.settings, "DID_CACHE_WARMUP_DIDS", f" {DID}:pinned ,")
+    monkeypatch.setattr(did_cache.settings, "DID_CACHE_WARMUP_TOP_N", 1)
+
+    assert asyncio.run(did_cache.warmup_did_cache()) == 2
+    assert set(cache._entries) == {f"{DID}:pinned", f"{DID}:top"}
+
+
+def test_admin_invalidation_reaches_every_worker(tmp_path, monkeypatch):
+    # Two workers sharing the L2 cache and the revocation log
+    resolver = CountingResolver()
+    backend = MemoryL2Backend()
+    log_path = str(tmp_path / "revocations.sqlite3")
+    workers = []
+    for _ in range(2):
+        cache = make_cache(resolver, l2=L2DocumentCache(backend))
+        revocations = RevocationList(token_lifetime=60, log=SQLiteRevocationLog(log_path))
+        revocations.add_document_listener(cache.discard)
+        workers.append((cache, revocations))
+    (cache_a, revocations_a), (cache_b, revocations_b) = workers
+
+    asyncio.run(cache_a.get(DID))
+    asyncio.run(cache_b.get(DID))
+    assert resolver.calls == 1
+
+    # Worker A serves the admin request
+    monkeypatch.setattr(did_cache, "did_document_cache", cache_a)
+    monkeypatch.setattr(did_cache, "revocation_list", revocations_a)
+    monkeypatch.setattr(admin_router, "revocation_list", revocations_a)
+    monkeypatch.setattr(did_cache.settings, "ADMIN_API_KEY", "admin-secret")
+    client = TestClient(create_app(), base_url="http://localhost:8000")
+
+    payload = {"did": DID}
+    assert client.post("/admin/did-cache/invalidate", json=payload).status_code == 403
+    response = client.post(
+        "/admin/did-cache/invalidate",
+        json=payload,
+        headers={"X-Admin-Key": "admin-secret"},
+    )
+    assert response.json() == {"invalidated": DID}
+
+    resolver.version = 2
+    assert asyncio.run(cache_a.get(DID))["version"] == 2
+    # Worker B drops its copy at its next revocation sync
+    assert asyncio.run(cache_b.get(DID))["version"] == 1
+    revocations_b.sync()
+    assert asyncio.run(cache_b.get(DID))["version"] == 2
+    assert resolver.calls == 2
+
+    # Revoking a DID invalidates its document as well
+    resolver.version = 3
+    response = client.post(
+        "/admin/revoke", json=payload, headers={"X-Admin-Key": "admin-secret"}
+    )
+    assert response.json() == {"revoked": "did", "did": DID}
+    revocations_b.sync()
+    assert asyncio.run(cache_b.get(DID))["version"] == 3
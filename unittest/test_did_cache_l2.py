@@ -0,0 +1,173 @@
+"""
+Tests for the shared second-level DID document cache.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth.did_cache import DIDDocumentCache
+from auth.did_cache_l2 import (
+    L2DocumentCache,
+    MemoryL2Backend,
+    RedisL2Backend,
+    SQLiteL2Backend,
+)
+
+DIDS = [f"did:wba:partner.example.com:user:{i}" for i in range(20)]
+
+
+class CountingResolver:
+    def __init__(self):
+        self.calls = 0
+        self.version = 1
+
+    async def __call__(self, did):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": did, "version": self.version}
+
+
+def make_worker(backend, resolver):
+    return DIDDocumentCache(
+        resolver=resolver, should_cache=lambda did: True, l2=L2DocumentCache(backend)
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryL2Backend()
+    return SQLiteL2Backend(str(tmp_path / "l2.sqlite3"))
+
+
+def test_workers_resolve_each_did_once(backend):
+    resolver = CountingResolver()
+    workers = [make_worker(backend, resolver) for _ in range(4)]
+
+    async def run():
+        results = await asyncio.gather(
+            *(worker.get(did) for worker in workers for did in DIDS)
+        )
+        assert all(document["id"] for document in results)
+
+    asyncio.run(run())
+    assert resolver.calls == len(DIDS)
+    # Concurrent lookups of a worker share reads
+    assert workers[0].l2.stats()["batches"] < len(DIDS)
+
+
+def test_invalidation_is_versioned(backend):
+    resolver = CountingResolver()
+    worker_a = make_worker(backend, resolver)
+    worker_b = make_worker(backend, resolver)
+    did = DIDS[0]
+
+    async def run():
+        assert (await worker_a.get(did))["version"] == 1
+
+        # A write made under the version read before an invalidation is ignored
+        stale = await worker_b.l2.lookup(did)
+        await worker_a.invalidate(did)
+        await worker_b.l2._store(did, {"id": did, "version": 1}, stale.version)
+
+        resolver.version = 2
+        assert (await worker_b.get(did))["version"] == 2
+        assert (await make_worker(backend, resolver).get(did))["version"] == 2
+
+    asyncio.run(run())
+    assert resolver.calls == 2
+
+
+def test_unavailable_backend_falls_back_to_resolver():
+    resolver = CountingResolver()
+    worker = make_worker(RedisL2Backend("redis://127.0.0.1:1", timeout=0.2), resolver)
+
+    async def run():
+        assert (await worker.get(DIDS[0]))["id"] == DIDS[0]
+        await worker.close()
+
+    asyncio.run(run())
+    assert resolver.calls == 1
+    assert worker.l2.stats()["errors"] >= 1
+
+
+async def serve_resp(store: MemoryL2Backend):
+    """Minimal Redis-protocol server on top of the in-process backend."""
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                command = await RedisL2Backend.read_reply(reader)
+                name, args = command[0].upper(), [arg.decode() for arg in command[1:]]
+                if name == b"MGET":
+                    values = await store.get_many(args)
+                    reply = b"*%d\r\n" % len(values) + b"".join(
+                        b"$-1\r\n" if v is None else b"$%d\r\n%s\r\n" % (len(v), v) for v in values
+                    )
+                elif name == b"SET":
+                    ttl = int(args[args.index("PX") + 1]) / 1000
+                    if "NX" in args:
+                        added = await store.add(args[0], command[2], ttl)
+                        reply = b"+OK\r\n" if added else b"$-1\r\n"
+                    else:
+                        await store.set(args[0], command[2], ttl)
+                        reply = b"+OK\r\n"
+                elif name == b"INCR":
+                    reply = b":%d\r\n" % await store.incr(args[0])
+                elif name == b"DEL":
+                    await store.delete(args[0])
+                    reply = b":1\r\n"
+                else:
+                    reply = b"-ERR unknown command\r\n"
+                writer.write(reply)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_redis_protocol_backend():
+    resolver = CountingResolver()
+
+    async def run():
+        server = await serve_resp(MemoryL2Backend())
+        port = server.sockets[0].getsockname()[1]
+        workers = [
+            make_worker(RedisL2Backend(f"redis://127.0.0.1:{port}/0"), resolver) for _ in range(3)
+        ]
+        await asyncio.gather(*(worker.get(did) for worker in workers for did in DIDS[:5]))
+        await workers[0].invalidate(DIDS[0])
+        resolver.version = 2
+        assert (await workers[1].get(DIDS[0]))["version"] == 1  # still in its L1
+        assert (await make_worker(workers[1].l2.backend, resolver).get(DIDS[0]))["version"] == 2
+        for worker in workers:
+            await worker.close()
+        server.close()
+
+    asyncio.run(run())
+    assert resolver.calls == 6
+
+
+def test_sqlite_backend_connects_lazily_per_process(tmp_path, monkeypatch):
+    path = tmp_path / "l2.sqlite3"
+    backend = SQLiteL2Backend(str(path))
+    assert not path.exists()
+
+    async def run():
+        await backend.set("key", b"value", 60)
+        parent_conn = backend._connect()
+
+        # A forked worker opens its own connection instead of the parent's
+        monkeypatch.setattr(os, "getpid", lambda: -1)
+        assert backend._connect() is not parent_conn
+        assert await backend.get_many(["key"]) == [b"value"]
+        await backend.close()
+
+    asyncio.run(run())
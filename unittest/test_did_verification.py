@@ -0,0 +1,164 @@
+"""
+Tests for the staged DID WBA header verification.
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from agent_connect.authentication import create_did_wba_document
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth import did_verification
+from auth.clock_skew import generate_auth_header_at
+from auth.did_verification import (
+    STAGE_DID,
+    STAGE_NONCE,
+    STAGE_PARSE,
+    STAGE_RESOLVE,
+    STAGE_SIGNATURE,
+    STAGE_TIMESTAMP,
+    VALID_SERVER_NONCES,
+    SQLiteNonceStore,
+    VerificationStats,
+    verify_did_wba_header,
+)
+
+
+class FakeDocumentCache:
+    def __init__(self, documents):
+        self.documents = documents
+        self.lookups = 0
+
+    async def get(self, did):
+        self.lookups += 1
+        return self.documents.get(did)
+
+
+def make_identity(user_id: str):
+    did_document, keys = create_did_wba_document(
+        hostname="localhost", port=8000, path_segments=["wba", "user", user_id]
+    )
+    private_key = serialization.load_pem_private_key(keys["key-1"][0], password=None)
+
+    def sign(content: bytes, fragment: str) -> bytes:
+        return private_key.sign(content, ec.ECDSA(hashes.SHA256()))
+
+    return did_document, sign
+
+
+def test_stages_reject_in_cost_order_and_commit_nonce_last(monkeypatch):
+    did_document, sign = make_identity("staged")
+    _, forger_sign = make_identity("forger")
+    cache = FakeDocumentCache({did_document["id"]: did_document})
+    stats = VerificationStats()
+    monkeypatch.setattr(did_verification, "did_document_cache", cache)
+    monkeypatch.setattr(did_verification, "verification_stats", stats)
+    monkeypatch.setattr(did_verification, "shared_nonce_store", None)
+
+    def verify(header):
+        return asyncio.run(verify_did_wba_header(header, "localhost"))
+
+    now = datetime.now(timezone.utc)
+
+    # Garbage, bad DIDs and stale timestamps never reach resolution or the nonce store
+    assert verify("Bearer abc").rejection.stage == STAGE_PARSE
+    assert verify('DIDWba did="did:wba:x"').rejection.stage == STAGE_PARSE
+    bad_did = generate_auth_header_at(
+        dict(did_document, id="did:web:localhost"), "localhost", sign, now
+    )
+    assert verify(bad_did).rejection.stage == STAGE_DID
+    stale = generate_auth_header_at(did_document, "localhost", sign, now - timedelta(hours=1))
+    assert verify(stale).rejection.stage == STAGE_TIMESTAMP
+    assert cache.lookups == 0
+
+    # A forged signature is rejected without consuming its nonce
+    forged = generate_auth_header_at(did_document, "localhost", forger_sign, now)
+    nonces_before = len(VALID_SERVER_NONCES)
+    assert verify(forged).rejection.stage == STAGE_SIGNATURE
+    assert len(VALID_SERVER_NONCES) == nonces_before
+
+    unknown, unknown_sign = make_identity("unknown")
+    header = generate_auth_header_at(unknown, "localhost", unknown_sign, now)
+    assert verify(header).rejection.stage == STAGE_RESOLVE
+
+    # A valid header is accepted once, its replay stops at the nonce pre-check
+    header = generate_auth_header_at(did_document, "localhost", sign, now)
+    result = verify(header)
+    assert result.ok and result.did == did_document["id"]
+    lookups = cache.lookups
+    assert verify(header).rejection.stage == STAGE_NONCE
+    assert cache.lookups == lookups
+
+    counts = stats.stats()
+    assert counts["accepted"] == 1
+    assert counts["rejected_by_stage"][STAGE_PARSE] == 2
+    assert counts["rejected_by_stage"][STAGE_NONCE] == 1
+    assert counts["rejected"] == 7
+
+
+def test_parse_rejects_duplicate_and_unknown_fields():
+    fields = (
+        'did="did:wba:localhost%3A8000:wba:user:a", nonce="n", '
+        'timestamp="2024-01-01T00:00:00Z", verification_method="key-1", signature="s"'
+    )
+    parts = did_verification.parse_auth_header(f"DIDWba {fields}")
+    assert parts.did == "did:wba:localhost%3A8000:wba:user:a"
+    assert did_verification.canonical_auth_header(parts) == f"DIDWba {fields}"
+
+    for header in (
+        f'DIDWba {fields}, did="did:wba:evil.com:user:b"',
+        f'DIDWba {fields}, extra="x"',
+        f"DIDWba {fields}; trailing",
+    ):
+        assert did_verification.parse_auth_header(header).stage == STAGE_PARSE
+
+
+def test_shared_nonce_store_rejects_replay_on_every_worker(tmp_path, monkeypatch):
+    path = str(tmp_path / "used_nonces.sqlite3")
+    worker_a = SQLiteNonceStore(path)
+    worker_b = SQLiteNonceStore(path)
+    now = 1_000_000.0
+
+    assert not worker_b.is_used("nonce", now)
+    assert worker_a.commit("nonce", now)
+    assert worker_b.is_used("nonce", now)
+    assert not worker_b.commit("nonce", now + 1)
+
+    # Once expired, a nonce can be used again
+    later = now + did_verification.settings.NONCE_EXPIRATION_MINUTES * 60 + 1
+    assert not worker_b.is_used("nonce", later)
+    assert worker_b.commit("nonce", later)
+    assert worker_a.is_used("nonce", later)
+
+    # A forked worker opens its own connection
+    parent_conn = worker_a._connect()
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert worker_a._connect() is not parent_conn
+    assert worker_a.is_used("nonce", later)
+
+
+def test_locked_nonce_store_fails_closed_without_stalling(tmp_path):
+    path = str(tmp_path / "used_nonces.sqlite3")
+    store = SQLiteNonceStore(path)
+    assert store.commit("nonce", 1_000_000.0)
+
+    # Another worker holding the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        assert not store.commit("other-nonce", 1_000_000.0)
+        assert time.monotonic() - started < 0.5
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert store.commit("other-nonce", 1_000_000.0)
@@ -0,0 +1,53 @@
+"""
+Tests for the served domain table.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.config import settings
+from core.did_store import did_store
+from core.domains import PROJECT_ROOT, build_tenant_table, split_host
+
+
+def test_split_host():
+    assert split_host("Example.COM:8000") == "example.com"
+    assert split_host("example.com") == "example.com"
+    assert split_host("[::1]:8000") == "[::1]"
+
+
+def test_tenant_table():
+    tenants = build_tenant_table(
+        ["localhost:8000", "Agents.Example.com", "agents.example.com:443"],
+        {
+            "agents.example.com": {
+                "token_lifetime_minutes": 5,
+                "did_documents_path": "did_keys/agents",
+            }
+        },
+    )
+
+    assert sorted(tenants) == ["agents.example.com", "localhost"]
+    assert tenants["localhost"].token_lifetime_minutes == settings.ACCESS_TOKEN_EXPIRE_MINUTES
+    assert tenants["localhost"].did_store is did_store
+
+    agents = tenants["agents.example.com"]
+    assert agents.token_lifetime_minutes == 5
+    assert agents.jwt_private_key_path == settings.JWT_PRIVATE_KEY_PATH
+    assert agents.did_store.base_path == PROJECT_ROOT / "did_keys/agents"
+
+    # Read-only once built
+    with pytest.raises(TypeError):
+        tenants["evil.example.com"] = agents
+
+
+def test_tenant_settings_must_match_served_domains():
+    with pytest.raises(ValueError):
+        build_tenant_table(["localhost"], {"other.example.com": {}})
+    with pytest.raises(ValueError):
+        build_tenant_table(["localhost"], {"localhost": {"token_lifetime": 5}})
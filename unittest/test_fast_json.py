@@ -0,0 +1,53 @@
+"""
+Tests for the fast JSON layer and its standard library fallback.
+"""
+
+import importlib
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import fast_json
+
+DOCUMENT = {
+    "id": "did:wba:localhost%3A8000:wba:user:é",
+    "numbers": [1, 2.5, -3],
+    "nested": {"flag": True, "empty": None},
+}
+
+
+@pytest.fixture(params=["active", "json"])
+def backend(request, monkeypatch):
+    if request.param == "active":
+        yield fast_json
+        return
+    # Reload the module as if orjson were not installed
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    yield importlib.reload(fast_json)
+    monkeypatch.undo()
+    importlib.reload(fast_json)
+
+
+def test_backends_round_trip_compact_utf8(backend):
+    encoded = backend.dumps(DOCUMENT)
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == DOCUMENT
+    assert b" " not in encoded and "é".encode() in encoded
+
+    for data in (encoded, bytearray(encoded), memoryview(encoded), encoded.decode()):
+        assert backend.loads(data) == DOCUMENT
+    assert backend.dumps_str(DOCUMENT) == encoded.decode()
+    assert backend.dumps(DOCUMENT, indent=True).startswith(b'{\n  "id"')
+
+
+def test_file_helpers(backend, tmp_path):
+    path = tmp_path / "document.json"
+    backend.dump_file(DOCUMENT, path)
+    assert backend.load_file(path) == DOCUMENT
+    with pytest.raises(ValueError):
+        backend.loads(b"{not json")
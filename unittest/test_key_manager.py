@@ -0,0 +1,54 @@
+"""
+Tests for the multi-identity client key manager.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import jwt
+import pytest
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth import key_manager
+from auth.key_manager import ClientKeyManager
+
+DID = "did:wba:localhost%3A8000:wba:user:manager"
+
+
+def test_cancelled_load_does_not_strand_concurrent_callers(monkeypatch):
+    def slow_load(did_document_path, private_key_path):
+        time.sleep(0.2)
+        raise OSError("not reached in time")
+
+    monkeypatch.setattr(key_manager, "_load_identity", slow_load)
+    manager = ClientKeyManager(token_store=None)
+
+    async def run():
+        first = asyncio.ensure_future(manager.get(DID))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(manager.get(DID))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(second, timeout=1)
+        assert manager._loading == {}
+
+    asyncio.run(run())
+
+
+def test_tokens_near_expiry_are_not_returned():
+    manager = ClientKeyManager(token_store=None)
+    now = time.time()
+    fresh = jwt.encode({"sub": DID, "exp": int(now + 3600)}, "secret", algorithm="HS256")
+    expiring = jwt.encode({"sub": DID, "exp": int(now + 1)}, "secret", algorithm="HS256")
+
+    manager._set_token(DID, "fresh.example.com", fresh)
+    manager._set_token(DID, "expiring.example.com", expiring)
+
+    assert manager._get_token(DID, "fresh.example.com") == fresh
+    assert not manager._has_token(DID, "expiring.example.com")
+    assert manager.stats()["tokens"] == 1
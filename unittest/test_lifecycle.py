@@ -0,0 +1,125 @@
+"""
+Tests for readiness, draining and used-nonce persistence across restarts.
+"""
+
+import asyncio
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.health_router import get_ready
+from auth import did_verification
+from auth.did_verification import (
+    VALID_SERVER_NONCES,
+    commit_server_nonce,
+    is_nonce_used,
+    load_used_nonces,
+    save_used_nonces,
+)
+from core.admission import AdmissionController, AdmissionMiddleware, admission_controller
+from core.lifecycle import STATE_DRAINING, STATE_READY, STATE_STARTING, lifecycle
+from utils import fast_json
+
+
+def test_used_nonces_survive_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(did_verification, "shared_nonce_store", None)
+    path = str(tmp_path / "nonces.json")
+    # Saved by a worker that already stopped, one of them expired
+    fast_json.dump_file({"other-worker": time.time() - 10, "expired": time.time() - 3600}, path)
+
+    VALID_SERVER_NONCES.clear()
+    assert commit_server_nonce("first")
+    assert commit_server_nonce("second")
+    assert save_used_nonces(path) == 3
+
+    VALID_SERVER_NONCES.clear()
+    assert load_used_nonces(path) == 3
+    assert all(is_nonce_used(nonce) for nonce in ("first", "second", "other-worker"))
+    assert not is_nonce_used("expired")
+    assert not commit_server_nonce("second")
+    # Oldest first, so that expiry keeps pruning from the front
+    assert list(VALID_SERVER_NONCES)[0] == "other-worker"
+    VALID_SERVER_NONCES.clear()
+
+
+def _save_worker_nonces(path: str, worker: int, barrier) -> None:
+    did_verification.shared_nonce_store = None
+    VALID_SERVER_NONCES.clear()
+    for i in range(2000):
+        commit_server_nonce(f"worker-{worker}-{i}")
+    barrier.wait()
+    save_used_nonces(path)
+
+
+def test_workers_stopping_together_keep_all_nonces(tmp_path):
+    path = str(tmp_path / "nonces.json")
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(4)
+    workers = [
+        context.Process(target=_save_worker_nonces, args=(path, worker, barrier))
+        for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    assert len(fast_json.load_file(path)) == 4 * 2000
+
+
+def test_draining_closes_connections_and_waits_for_requests():
+    controller = AdmissionController(max_in_flight=100, max_loop_lag=1, retry_after=1)
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = AdmissionMiddleware(app, controller)
+
+    async def call():
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "path": "/wba/test", "headers": []}
+        await middleware(scope, None, send)
+        return dict(messages[0]["headers"])
+
+    async def run():
+        before = asyncio.ensure_future(call())
+        await asyncio.sleep(0.01)
+        controller.draining = True
+        during = asyncio.ensure_future(call())
+        await asyncio.sleep(0.01)
+
+        assert not await controller.drain(timeout=0.05)
+        release.set()
+        assert await controller.drain(timeout=1)
+        assert b"connection" not in await before
+        assert (await during)[b"connection"] == b"close"
+
+    asyncio.run(run())
+
+
+def test_ready_only_between_startup_and_drain(monkeypatch):
+    monkeypatch.setattr(lifecycle, "state", STATE_STARTING)
+    assert asyncio.run(get_ready()).status_code == 503
+
+    lifecycle.mark_ready()
+    assert lifecycle.state == STATE_READY
+    assert asyncio.run(get_ready()).status_code == 200
+
+    monkeypatch.setattr(admission_controller, "draining", False)
+    assert lifecycle.begin_drain()
+    assert not lifecycle.begin_drain()
+    assert lifecycle.state == STATE_DRAINING
+    response = asyncio.run(get_ready())
+    assert response.status_code == 503
+    assert fast_json.loads(response.body)["state"] == STATE_DRAINING
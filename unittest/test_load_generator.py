@@ -0,0 +1,74 @@
+"""
+Tests for the load generator's method mix parsing and latency statistics.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.load_generator import LatencyHistogram, LoadStats, parse_method_mix
+
+
+def test_parse_method_mix():
+    assert parse_method_mix("test=7, ad=2,verify=1") == {
+        "test": 7.0,
+        "ad": 2.0,
+        "verify": 1.0,
+    }
+    # A missing weight defaults to 1, empty items are ignored
+    assert parse_method_mix("did,,test=0.5") == {"did": 1.0, "test": 0.5}
+
+
+@pytest.mark.parametrize("mix", ["unknown=1", "", "test=0,ad=0"])
+def test_parse_method_mix_rejects_invalid(mix):
+    with pytest.raises(ValueError):
+        parse_method_mix(mix)
+
+
+def test_histogram_percentiles_are_close():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000.0)
+
+    assert histogram.total == 1000
+    assert histogram.max == 1.0
+    assert histogram.mean() == pytest.approx(0.5005)
+    for percent, expected in ((50, 0.5), (90, 0.9), (99, 0.99)):
+        assert histogram.percentile(percent) == pytest.approx(expected, rel=0.06)
+    assert histogram.percentile(100) == 1.0
+
+
+def test_histogram_bounds():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+    assert histogram.mean() == 0.0
+
+    histogram.record(0.0)
+    histogram.record(10_000.0)
+    assert histogram.counts[0] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.percentile(100) == 10_000.0
+
+
+def test_load_stats_windows():
+    stats = LoadStats()
+    stats.record("test", 0.01)
+    stats.record("ad", 0.02, error="http_500")
+    stats.record("test", 0.03, error="http_500")
+
+    assert stats.requests == 3
+    assert stats.successes == 1
+    assert stats.operations == {"test": 2, "ad": 1}
+    assert stats.errors == {"http_500": 2}
+    assert stats.window.total == 3
+
+    stats.reset_window()
+    stats.record("verify", 0.01)
+    assert stats.window.total == 1
+    assert not stats.window_errors
+    assert stats.overall.total == 4
+    assert stats.errors == {"http_500": 2}
@@ -0,0 +1,56 @@
+"""
+Tests for the non-blocking queued logging pipeline.
+"""
+
+import logging
+import queue
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.log_base import DroppingQueueHandler, SubsystemLevelFilter, parse_subsystem_levels
+
+
+def make_record(message: str, name: str = "root", level: int = logging.INFO, pathname="x.py"):
+    return logging.LogRecord(name, level, pathname, 1, message, None, None)
+
+
+def test_full_queue_drops_records_and_reports_it():
+    log_queue = queue.Queue(maxsize=2)
+    handler = DroppingQueueHandler(log_queue, drop_policy="newest")
+
+    for i in range(5):
+        handler.emit(make_record(f"message {i}"))
+    assert handler.dropped == 3
+    assert [log_queue.get_nowait().msg for _ in range(2)] == ["message 0", "message 1"]
+
+    # The drop count is reported once the queue has room again
+    handler.emit(make_record("message 5"))
+    messages = [log_queue.get_nowait().msg for _ in range(2)]
+    assert messages == ["Log queue full, dropped 3 records", "message 5"]
+
+
+def test_oldest_policy_keeps_the_latest_records():
+    log_queue = queue.Queue(maxsize=2)
+    handler = DroppingQueueHandler(log_queue, drop_policy="oldest")
+
+    for i in range(4):
+        handler.emit(make_record(f"message {i}"))
+    assert handler.dropped == 2
+    assert [log_queue.get_nowait().msg for _ in range(2)] == ["message 2", "message 3"]
+
+
+def test_subsystem_levels_by_logger_name_and_package():
+    levels = parse_subsystem_levels("uvicorn.access=ERROR, agent_connect=warning")
+    assert levels == {"uvicorn.access": logging.ERROR, "agent_connect": logging.WARNING}
+    level_filter = SubsystemLevelFilter(levels)
+
+    assert not level_filter.filter(make_record("GET /", name="uvicorn.access.sub"))
+    assert level_filter.filter(make_record("started", name="uvicorn.error"))
+
+    library = "/site-packages/agent_connect/authentication/did_wba.py"
+    assert not level_filter.filter(make_record("resolving", pathname=library))
+    assert level_filter.filter(make_record("failed", level=logging.WARNING, pathname=library))
+    assert level_filter.filter(make_record("request", pathname="/app/auth/did_auth.py"))
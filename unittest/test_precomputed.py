@@ -0,0 +1,58 @@
+"""
+Tests for precomputed static JSON responses.
+"""
+
+import gzip
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.app import create_app
+from core.precomputed import PrecomputedJSON, brotli
+from utils import fast_json
+
+DOCUMENT = {"name": "example", "items": [{"index": i, "tag": "sample"} for i in range(20)]}
+
+
+def test_encoding_follows_accept_encoding_qvalues():
+    document = PrecomputedJSON(DOCUMENT)
+    best = "br" if brotli is not None else "gzip"
+
+    assert document.select_encoding(None) is None
+    assert document.select_encoding("identity") is None
+    assert document.select_encoding("gzip") == "gzip"
+    assert document.select_encoding("gzip, br") == best
+    assert document.select_encoding("br;q=0.5, gzip;q=0.8") == "gzip"
+    assert document.select_encoding("gzip;q=0, br;q=0") is None
+    assert document.select_encoding("*") == best
+    assert document.select_encoding("*;q=0.1, br;q=0") == "gzip"
+
+    # Malformed parameters are ignored instead of failing the request
+    assert document.select_encoding("gzip;q=abc") == "gzip"
+    assert document.select_encoding("gzip;q=0.5;level=1") == "gzip"
+    assert document.select_encoding("gzip ; level=1 ; q=0") is None
+
+    status, headers, body = document.render(None, "gzip")
+    assert status == 200 and dict(headers)[b"content-encoding"] == b"gzip"
+    assert fast_json.loads(gzip.decompress(body)) == DOCUMENT
+
+
+def test_etag_revalidation_returns_304():
+    client = TestClient(create_app(), base_url="http://localhost:8000")
+
+    response = client.get("/agents/example/ad.json", headers={"Accept-Encoding": "gzip;q=abc"})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/agents/example/ad.json", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    response = client.get("/agents/example/ad.json", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
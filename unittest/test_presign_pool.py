@@ -0,0 +1,60 @@
+"""
+Tests for the pool of pre-signed DID WBA headers.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth.did_auth import create_did_identity, save_did_identity
+from auth.clock_skew import SkewAwareDIDWbaAuthHeader
+from auth.presign_pool import PresignedHeaderPool
+
+SERVER_URL = "http://localhost:8000/wba/test"
+
+
+def make_auth_client(tmp_path, user_id="pool"):
+    did_document, keys = create_did_identity(user_id)
+    did_path = save_did_identity(tmp_path / user_id, did_document, keys)
+    return SkewAwareDIDWbaAuthHeader(str(did_path), str(tmp_path / user_id / "key-1_private.pem"))
+
+
+def test_pool_serves_presigned_headers_then_signs_inline(tmp_path):
+    pool = PresignedHeaderPool(make_auth_client(tmp_path), [SERVER_URL], pool_size=2)
+
+    assert asyncio.run(pool.refill()) == 2
+    headers = {pool.get_auth_header(SERVER_URL)["Authorization"] for _ in range(3)}
+    assert len(headers) == 3
+    assert all(header.startswith("DIDWba ") for header in headers)
+    assert pool.stats() == {"ready": 0, "hits": 2, "misses": 1, "discarded": 0}
+
+    # A stored token takes precedence over pooled headers
+    pool.update_token(SERVER_URL, {"Authorization": "bearer stored-token"})
+    assert pool.get_auth_header(SERVER_URL) == {"Authorization": "Bearer stored-token"}
+    pool.clear_token(SERVER_URL)
+    assert pool.get_auth_header(SERVER_URL)["Authorization"].startswith("DIDWba ")
+
+
+def test_expired_headers_are_discarded(tmp_path):
+    pool = PresignedHeaderPool(
+        make_auth_client(tmp_path), [SERVER_URL], pool_size=2, max_age=0.05
+    )
+
+    async def run():
+        await pool.refill()
+        await asyncio.sleep(0.1)
+        assert pool.take(SERVER_URL) is None
+        assert pool.stats()["discarded"] == 2
+
+        # The background task refills the pool after a miss
+        async with pool:
+            for _ in range(100):
+                if pool.stats()["ready"]:
+                    break
+                await asyncio.sleep(0.01)
+        assert pool.take(SERVER_URL) is not None
+
+    asyncio.run(run())
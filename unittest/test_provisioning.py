@@ -0,0 +1,77 @@
+"""
+Tests for bulk identity provisioning and DID document registration.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.app import create_app
+from core.config import settings
+from core.did_store import DIDDocumentStore
+from core.domains import get_tenant
+from utils.provisioning import BulkProvisioner
+
+
+def test_provisioning_resumes_where_it_stopped(tmp_path):
+    store = DIDDocumentStore(tmp_path)
+
+    first = asyncio.run(BulkProvisioner(2, prefix="bulk", workers=1, store=store).run())
+    assert (first["minted"], first["skipped"]) == (2, 0)
+    document = store.load("bulk_1")
+    assert document["id"].endswith(":bulk_1")
+
+    second = asyncio.run(BulkProvisioner(3, prefix="bulk", workers=1, store=store).run())
+    assert (second["minted"], second["skipped"]) == (1, 2)
+    assert store.load("bulk_1") == document
+
+
+def test_bulk_registration_requires_the_admin_key(tmp_path, monkeypatch):
+    store = DIDDocumentStore(tmp_path)
+    monkeypatch.setattr(get_tenant("localhost"), "did_store", store)
+    client = TestClient(create_app(), base_url="http://localhost:8000")
+    payload = {"documents": [{"user_id": "alice", "did_document": {"id": "did:wba:x"}}]}
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "")
+    assert client.post("/wba/user/_bulk", json=payload).status_code == 404
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "admin-secret")
+    assert client.post("/wba/user/_bulk", json=payload).status_code == 403
+    response = client.post(
+        "/wba/user/_bulk", json=payload, headers={"X-Admin-Key": "wrong"}
+    )
+    assert response.status_code == 403
+    assert store.load("alice") is None
+
+    response = client.post(
+        "/wba/user/_bulk", json=payload, headers={"X-Admin-Key": "admin-secret"}
+    )
+    assert response.json() == {"status": "success", "stored": 1}
+    assert store.load("alice") == {"id": "did:wba:x"}
+
+
+def test_single_registration_requires_the_admin_key(tmp_path, monkeypatch):
+    store = DIDDocumentStore(tmp_path)
+    monkeypatch.setattr(get_tenant("localhost"), "did_store", store)
+    client = TestClient(create_app(), base_url="http://localhost:8000")
+    document = {"id": "did:wba:localhost%3A8000:wba:user:alice"}
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "")
+    assert client.put("/wba/user/alice/did.json", json=document).status_code == 404
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "admin-secret")
+    assert client.put("/wba/user/alice/did.json", json=document).status_code == 403
+    assert store.load("alice") is None
+
+    response = client.put(
+        "/wba/user/alice/did.json",
+        json=document,
+        headers={"X-Admin-Key": "admin-secret"},
+    )
+    assert response.status_code == 200
+    assert store.load("alice") == document
@@ -0,0 +1,93 @@
+"""
+Tests for the token bucket rate limiter.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth.rate_limit import (
+    MemoryRateLimitBackend,
+    RateLimiter,
+    SQLiteRateLimitBackend,
+)
+
+
+def test_bucket_allows_burst_then_refills():
+    backend = MemoryRateLimitBackend(max_buckets=10)
+
+    for _ in range(3):
+        assert backend.acquire("ip:1.2.3.4", rate=1.0, burst=3, now=100.0) == 0.0
+
+    retry_after = backend.acquire("ip:1.2.3.4", rate=1.0, burst=3, now=100.0)
+    assert retry_after == pytest.approx(1.0)
+
+    # One second later exactly one token has been refilled
+    assert backend.acquire("ip:1.2.3.4", rate=1.0, burst=3, now=101.0) == 0.0
+    assert backend.acquire("ip:1.2.3.4", rate=1.0, burst=3, now=101.0) > 0
+
+
+def test_idle_buckets_are_evicted_lru():
+    backend = MemoryRateLimitBackend(max_buckets=2)
+
+    backend.acquire("a", rate=1.0, burst=1, now=0.0)
+    backend.acquire("b", rate=1.0, burst=1, now=0.0)
+    backend.acquire("a", rate=1.0, burst=1, now=0.0)  # "a" is now most recent
+    backend.acquire("c", rate=1.0, burst=1, now=0.0)  # evicts "b"
+
+    assert len(backend) == 2
+    # "b" starts with a full bucket again, "a" is still exhausted
+    assert backend.acquire("b", rate=1.0, burst=1, now=0.0) == 0.0
+    assert backend.acquire("c", rate=1.0, burst=1, now=0.0) > 0
+
+
+def test_limiter_raises_429_with_retry_after():
+    limiter = RateLimiter(
+        MemoryRateLimitBackend(max_buckets=10),
+        ip_rate=10.0,
+        ip_burst=10,
+        did_rate=0.5,
+        did_burst=1,
+    )
+
+    limiter.check_did("did:wba:localhost%3A8000:wba:user:1")
+    with pytest.raises(HTTPException) as exc_info:
+        limiter.check_did("did:wba:localhost%3A8000:wba:user:1")
+
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "2"
+
+    # Other DIDs and IPs have their own buckets
+    limiter.check_did("did:wba:localhost%3A8000:wba:user:2")
+    limiter.check_ip("127.0.0.1")
+
+
+def test_sqlite_backend_shares_buckets(tmp_path):
+    path = str(tmp_path / "rate_limit.sqlite3")
+    first = SQLiteRateLimitBackend(path, max_buckets=10)
+    second = SQLiteRateLimitBackend(path, max_buckets=10)
+
+    assert first.acquire("did:x", rate=0.001, burst=2, now=0.0) == 0.0
+    assert second.acquire("did:x", rate=0.001, burst=2, now=0.0) == 0.0
+    assert first.acquire("did:x", rate=0.001, burst=2, now=0.0) > 0
+
+
+def test_sqlite_backend_connects_lazily_per_process(tmp_path, monkeypatch):
+    path = tmp_path / "rate_limit.sqlite3"
+    backend = SQLiteRateLimitBackend(str(path), max_buckets=10)
+    assert not path.exists()
+
+    assert backend.acquire("did:x", rate=0.001, burst=2, now=0.0) == 0.0
+    parent_conn = backend._connect()
+
+    # A forked worker opens its own connection instead of the parent's
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert backend._connect() is not parent_conn
+    assert backend.acquire("did:x", rate=0.001, burst=2, now=0.0) == 0.0
+    assert backend.acquire("did:x", rate=0.001, burst=2, now=0.0) > 0
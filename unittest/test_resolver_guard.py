@@ -0,0 +1,101 @@
+"""
+Tests for the per-host DID resolution guard.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth.resolver_guard import STATE_CLOSED, STATE_OPEN, ResolverGuard
+
+
+def make_guard(**overrides) -> ResolverGuard:
+    options = dict(
+        max_concurrency=2,
+        connect_timeout=0.05,
+        read_timeout=0.05,
+        queue_timeout=0.01,
+        failure_threshold=3,
+        reset_timeout=0.05,
+    )
+    options.update(overrides)
+    return ResolverGuard(**options)
+
+
+def test_circuit_opens_after_failures_and_closes_after_probe():
+    guard = make_guard()
+    calls = []
+
+    async def failing():
+        calls.append("fail")
+        raise OSError("connection refused")
+
+    async def succeeding():
+        calls.append("ok")
+        return {"id": "did:wba:example.com:user:1"}
+
+    async def scenario():
+        for _ in range(5):
+            assert await guard.call("example.com", failing) is None
+        # Only failure_threshold calls reached the host, the rest failed fast
+        assert calls == ["fail"] * 3
+        assert guard.host("example.com").breaker.state == STATE_OPEN
+        assert guard.host("example.com").rejected_open == 2
+
+        await asyncio.sleep(0.06)
+        assert await guard.call("example.com", succeeding) is not None
+        assert guard.host("example.com").breaker.state == STATE_CLOSED
+
+        # Other hosts are never affected
+        assert guard.host("other.example.com").breaker.state == STATE_CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_slow_host_times_out_and_concurrency_is_capped():
+    guard = make_guard(failure_threshold=100)
+
+    async def slow():
+        await asyncio.sleep(1)
+        return {}
+
+    async def scenario():
+        results = await asyncio.gather(*(guard.call("slow.example.com", slow) for _ in range(4)))
+        assert results == [None] * 4
+        metrics = guard.metrics()["slow.example.com"]
+        assert metrics["timeouts"] == 2
+        assert metrics["rejected_busy"] == 2
+        assert metrics["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_probe_does_not_block_the_host():
+    guard = make_guard(failure_threshold=1)
+
+    async def failing():
+        raise OSError("connection refused")
+
+    async def hanging():
+        await asyncio.sleep(10)
+
+    async def succeeding():
+        return {"id": "did:wba:example.com:user:1"}
+
+    async def scenario():
+        assert await guard.call("example.com", failing) is None
+        await asyncio.sleep(0.06)
+
+        # The half-open probe is cancelled, e.g. by a warmup deadline
+        probe = asyncio.ensure_future(guard.call("example.com", hanging))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+        assert await guard.call("example.com", succeeding) is not None
+        assert guard.host("example.com").breaker.state == STATE_CLOSED
+
+    asyncio.run(scenario())
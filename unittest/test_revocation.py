@@ -0,0 +1,60 @@
+"""
+Tests for access token revocation.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth.revocation import RevocationList, SQLiteRevocationLog
+
+
+def test_revocations_sync_between_workers_and_expire(tmp_path):
+    path = str(tmp_path / "revocations.sqlite3")
+    worker_a = RevocationList(token_lifetime=60, log=SQLiteRevocationLog(path))
+    worker_b = RevocationList(token_lifetime=60, log=SQLiteRevocationLog(path))
+    now = time.time()
+    did = "did:wba:example.com:user:alice"
+
+    assert not worker_a.is_revoked("a" * 32, did, now)
+
+    worker_a.revoke_token("a" * 32, now + 30)
+    worker_a.revoke_did("did:wba:example.com:user:bob", revoked_at=now)
+    assert worker_a.is_revoked("a" * 32, did, now)
+
+    # Other workers see the revocations once they sync
+    assert not worker_b.is_revoked("a" * 32, did, now)
+    assert worker_b.sync() == 2
+    assert worker_b.is_revoked("a" * 32, did, now)
+    assert not worker_b.is_revoked("b" * 32, did, now)
+
+    # A DID revocation covers tokens issued up to it, not later ones
+    bob = "did:wba:example.com:user:bob"
+    assert worker_b.is_revoked("c" * 32, bob, now - 10)
+    assert not worker_b.is_revoked("c" * 32, bob, now + 1)
+
+    # Revocations are dropped once the tokens they cover have expired
+    assert worker_b.prune(now + 31) == 1
+    assert not worker_b.is_revoked("a" * 32, did, now)
+    assert worker_b.is_revoked("c" * 32, bob, now - 10)
+    assert worker_b.prune(now + 120) == 1
+    assert worker_b.stats() == {"revoked_tokens": 0, "revoked_dids": 0}
+
+
+def test_log_connects_lazily_per_process(tmp_path, monkeypatch):
+    path = tmp_path / "revocations.sqlite3"
+    log = SQLiteRevocationLog(str(path))
+    assert not path.exists()
+
+    worker = RevocationList(token_lifetime=60, log=log)
+    worker.revoke_token("a" * 32, time.time() + 30)
+    parent_conn = log._connect()
+
+    # A forked worker opens its own connection instead of the parent's
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert log._connect() is not parent_conn
+    assert RevocationList(token_lifetime=60, log=log).sync() == 1
@@ -0,0 +1,69 @@
+"""
+Tests for the pre-fork production launch mode.
+"""
+
+import socket
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import server
+
+
+class RecordingPreforkServer:
+    instances = []
+
+    def __init__(self, app, **kwargs):
+        self.kwargs = kwargs
+        self.ran = False
+        RecordingPreforkServer.instances.append(self)
+
+    def run(self):
+        self.ran = True
+
+
+@pytest.fixture
+def prefork(monkeypatch):
+    RecordingPreforkServer.instances = []
+    monkeypatch.setattr(server, "PreforkServer", RecordingPreforkServer)
+    return RecordingPreforkServer.instances
+
+
+def test_several_workers_require_shared_nonce_store(prefork, monkeypatch):
+    monkeypatch.setattr(server.settings, "NONCE_SQLITE_PATH", "")
+    with pytest.raises(SystemExit):
+        server.run_production_server(object(), workers=4)
+    assert prefork == []
+
+
+def test_single_worker_runs_without_shared_nonce_store(prefork, monkeypatch):
+    monkeypatch.setattr(server.settings, "NONCE_SQLITE_PATH", "")
+    server.run_production_server(object(), workers=1, max_requests=0)
+    assert prefork[0].ran
+    assert prefork[0].kwargs["workers"] == 1
+
+
+def test_several_workers_run_with_shared_nonce_store(prefork, monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        server.settings, "NONCE_SQLITE_PATH", str(tmp_path / "used_nonces.sqlite3")
+    )
+    server.run_production_server(object(), workers=4, max_requests=1000)
+    assert prefork[0].ran
+    assert prefork[0].kwargs["workers"] == 4
+    assert prefork[0].kwargs["max_requests"] == 1000
+
+
+def test_reuse_port_sockets_share_a_port():
+    first = server._bind_socket("127.0.0.1", 0, reuse_port=True, backlog=16)
+    try:
+        port = first.getsockname()[1]
+        second = server._bind_socket("127.0.0.1", port, reuse_port=True, backlog=16)
+        second.close()
+        assert first.get_inheritable()
+        assert first.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT)
+    finally:
+        first.close()
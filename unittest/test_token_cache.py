@@ -0,0 +1,72 @@
+"""
+Tests for the verified-token cache.
+"""
+
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import auth.token_auth as token_auth
+from api import auth_router
+from auth.revocation import RevocationList
+from auth.token_auth import create_access_token, verified_token_cache, verify_access_token
+from core.app import create_app
+from core.config import settings
+
+
+def test_cached_tokens_are_still_checked_for_revocation_and_expiry(monkeypatch):
+    revocations = RevocationList(token_lifetime=3600)
+    monkeypatch.setattr(token_auth, "revocation_list", revocations)
+    did = "did:wba:example.com:user:alice"
+    token = create_access_token({"sub": did})
+
+    assert verify_access_token(token)["sub"] == did
+    hits = verified_token_cache.hits
+    claims = verify_access_token("Bearer " + token)
+    assert verified_token_cache.hits == hits + 1
+
+    revocations.revoke_token(claims["jti"], claims["exp"])
+    with pytest.raises(HTTPException) as exc:
+        verify_access_token(token)
+    assert exc.value.detail == "Token has been revoked"
+
+    # Expired after being cached
+    short = create_access_token({"sub": did}, expires_delta=timedelta(seconds=30))
+    verify_access_token(short)
+    monkeypatch.setattr(token_auth.time, "time", lambda: claims["exp"] + 3600)
+    with pytest.raises(HTTPException) as exc:
+        verify_access_token(short)
+    assert exc.value.detail == "Token has expired"
+
+
+def test_introspection_is_restricted_to_downstream_services(monkeypatch):
+    monkeypatch.setattr(token_auth, "revocation_list", RevocationList(token_lifetime=3600))
+    client = TestClient(create_app(), base_url="http://localhost:8000")
+    service = "did:wba:example.com:user:gateway"
+    token = create_access_token({"sub": "did:wba:example.com:user:alice"})
+    payload = {"tokens": [token, "not-a-token"]}
+
+    def introspect(caller, headers=None):
+        caller_token = create_access_token({"sub": caller})
+        return client.post(
+            "/auth/introspect",
+            json=payload,
+            headers={"Authorization": f"Bearer {caller_token}", **(headers or {})},
+        )
+
+    monkeypatch.setattr(auth_router, "get_introspection_dids", lambda: frozenset([service]))
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "admin-secret")
+    assert introspect("did:wba:example.com:user:mallory").status_code == 403
+    assert introspect("did:wba:example.com:user:mallory", {"X-Admin-Key": "x"}).status_code == 403
+
+    results = introspect(service).json()["results"]
+    assert [result["active"] for result in results] == [True, False]
+    response = introspect("did:wba:example.com:user:mallory", {"X-Admin-Key": "admin-secret"})
+    assert response.status_code == 200
@@ -0,0 +1,100 @@
+"""
+Tests for the persistent client token store.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import jwt
+from aiohttp import web
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth import token_store
+from auth.clock_skew import SkewAwareDIDWbaAuthHeader
+from auth.did_auth import create_did_identity, save_did_identity, send_authenticated_request
+from auth.presign_pool import PresignedHeaderPool
+from auth.token_store import PersistentDomainTokens, SQLiteTokenStore
+
+
+def make_auth_client(user_dir: Path) -> SkewAwareDIDWbaAuthHeader:
+    return SkewAwareDIDWbaAuthHeader(
+        str(user_dir / "did.json"), str(user_dir / "key-1_private.pem")
+    )
+
+
+def test_expired_tokens_are_not_returned(tmp_path):
+    store = SQLiteTokenStore(str(tmp_path / "tokens.sqlite3"), leeway=30)
+    now = time.time()
+    token = jwt.encode({"exp": int(now + 60)}, "secret", algorithm="HS256")
+    store.put("did:wba:x", "example.com", token)
+
+    assert store.get("did:wba:x", "example.com", now) == token
+    assert store.get("did:wba:x", "example.com", now + 31) is None
+    assert store.domains("did:wba:x") == []
+
+
+def test_store_connects_lazily_per_process(tmp_path, monkeypatch):
+    path = tmp_path / "tokens.sqlite3"
+    store = SQLiteTokenStore(str(path))
+    assert not path.exists()
+
+    token = jwt.encode({"exp": int(time.time() + 3600)}, "secret", algorithm="HS256")
+    store.put("did:wba:x", "example.com", token)
+    parent_conn = store._connect()
+
+    # A forked client process opens its own connection instead of the parent's
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert store._connect() is not parent_conn
+    assert store.get("did:wba:x", "example.com") == token
+
+
+def test_pool_shares_tokens_through_the_store(tmp_path, monkeypatch):
+    did_document, keys = create_did_identity("stored")
+    save_did_identity(tmp_path / "stored", did_document, keys)
+    store = SQLiteTokenStore(str(tmp_path / "tokens.sqlite3"))
+    monkeypatch.setattr(token_store, "_default_store", store)
+    token = jwt.encode(
+        {"sub": did_document["id"], "exp": int(time.time() + 3600)}, "secret", algorithm="HS256"
+    )
+    schemes = []
+
+    async def handler(request):
+        authorization = request.headers.get("Authorization", "")
+        schemes.append(authorization.split(" ")[0])
+        if authorization.startswith("DIDWba "):
+            return web.json_response({"ok": True}, headers={"Authorization": f"bearer {token}"})
+        if authorization == f"Bearer {token}":
+            return web.json_response({"ok": True})
+        return web.json_response({"detail": "Invalid token"}, status=401)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/wba/test", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/wba/test"
+        try:
+            # The first process authenticates with a pre-signed header
+            pool = PresignedHeaderPool(make_auth_client(tmp_path / "stored"), [url])
+            await pool.refill()
+            status, data, issued = await send_authenticated_request(url, pool)
+            assert (status, data, issued) == (200, {"ok": True}, token)
+            assert isinstance(pool.auth_client.tokens, PersistentDomainTokens)
+
+            # Another process with its own pool reuses the stored token
+            other = PresignedHeaderPool(make_auth_client(tmp_path / "stored"), [url])
+            status, _, _ = await send_authenticated_request(url, other)
+            assert status == 200
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+    assert schemes == ["DIDWba", "Bearer"]
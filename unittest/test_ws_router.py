@@ -0,0 +1,140 @@
+"""
+Tests for the WebSocket endpoint authenticated once per connection.
+"""
+
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.testclient import WebSocketDenialResponse
+from starlette.websockets import WebSocketDisconnect
+
+# Add parent directory to Python path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api import ws_router
+from api.ws_router import CLOSE_POLICY_VIOLATION
+from auth import auth_middleware, token_auth
+from auth.revocation import RevocationList
+from auth.token_auth import create_access_token
+from core.app import create_app
+from core.config import settings
+from utils import fast_json
+
+DID = "did:wba:example.com:user:alice"
+
+
+@pytest.fixture
+def revocations(monkeypatch):
+    revocations = RevocationList(token_lifetime=3600)
+    monkeypatch.setattr(token_auth, "revocation_list", revocations)
+    monkeypatch.setattr(ws_router, "revocation_list", revocations)
+    return revocations
+
+
+@pytest.fixture
+def client(revocations):
+    return TestClient(create_app(), base_url="http://localhost:8000")
+
+
+def connect(client, token):
+    return client.websocket_connect(
+        "ws://localhost:8000/wba/ws", headers={"Authorization": f"Bearer {token}"}
+    )
+
+
+def test_connection_is_authenticated_once_at_connect(client, monkeypatch):
+    calls = []
+    verify = token_auth.verify_access_token
+
+    def counting_verify(*args, **kwargs):
+        calls.append(args[0])
+        return verify(*args, **kwargs)
+
+    monkeypatch.setattr(token_auth, "verify_access_token", counting_verify)
+    with connect(client, create_access_token({"sub": DID})) as websocket:
+        session = websocket.receive_json()
+        assert session["type"] == "session" and session["did"] == DID
+        for i in range(3):
+            websocket.send_text(fast_json.dumps_str({"id": i, "method": "test"}))
+            assert websocket.receive_json() == {
+                "id": i,
+                "result": {
+                    "status": "success",
+                    "message": "Successfully authenticated",
+                    "did": DID,
+                    "authenticated": True,
+                },
+            }
+        websocket.send_text(fast_json.dumps_str({"id": 9, "method": "nope"}))
+        assert websocket.receive_json() == {"id": 9, "error": "Unknown method"}
+    assert len(calls) == 1
+
+
+def test_invalid_token_is_refused(client):
+    with pytest.raises(WebSocketDenialResponse) as exc_info:
+        with connect(client, "not-a-token") as websocket:
+            websocket.receive_json()
+    assert exc_info.value.status_code == 401
+
+
+def test_connection_closes_when_the_token_expires(client):
+    token = create_access_token({"sub": DID}, expires_delta=timedelta(seconds=1))
+    with connect(client, token) as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+        assert exc_info.value.code == CLOSE_POLICY_VIOLATION
+        assert exc_info.value.reason == "Token expired"
+
+
+def test_revoked_token_closes_the_session_on_the_next_message(client, revocations):
+    token = create_access_token({"sub": DID, "jti": "ws-token"})
+    with connect(client, token) as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        websocket.send_text(fast_json.dumps_str({"id": 1, "method": "ping"}))
+        assert websocket.receive_json() == {"id": 1, "result": {"pong": True}}
+
+        revocations.revoke_token("ws-token", time.time() + 3600)
+        websocket.send_text(fast_json.dumps_str({"id": 2, "method": "ping"}))
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+        assert exc_info.value.code == CLOSE_POLICY_VIOLATION
+        assert exc_info.value.reason == "Token revoked"
+
+
+def test_revoked_did_closes_idle_sessions(client, revocations, monkeypatch):
+    monkeypatch.setattr(settings, "REVOCATION_SYNC_INTERVAL_SECONDS", 0.05)
+    token = create_access_token({"sub": DID})
+    with connect(client, token) as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        # iat has second precision, revoke after the second of issuance
+        revocations.revoke_did(DID, time.time() + 1)
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+        assert exc_info.value.code == CLOSE_POLICY_VIOLATION
+        assert exc_info.value.reason == "Token revoked"
+
+
+def test_handshake_session_carries_the_issued_token_claims(client, monkeypatch):
+    async def handle_did_auth(authorization, domain, tenant=None):
+        return {
+            "access_token": "issued",
+            "did": DID,
+            "expires_at": time.time() + 60,
+            "jti": "handshake-token",
+            "issued_at": float(int(time.time())),
+        }
+
+    monkeypatch.setattr(auth_middleware, "handle_did_auth", handle_did_auth)
+    ws_router.revocation_list.revoke_token("handshake-token", time.time() + 60)
+    with client.websocket_connect(
+        "ws://localhost:8000/wba/ws", headers={"Authorization": "DIDWba did=..."}
+    ) as websocket:
+        assert websocket.receive_json()["access_token"] == "issued"
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+        assert exc_info.value.reason == "Token revoked"
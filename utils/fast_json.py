@@ -0,0 +1,87 @@
+"""
+Fast JSON encoding and decoding, using orjson when installed and the standard
+library json module otherwise.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+# Name of the active backend, "orjson" or "json"
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+if orjson is not None:
+
+    def dumps(obj: Any, indent: bool = False) -> bytes:
+        """Serialize obj to UTF-8 JSON bytes, optionally indented by 2 spaces."""
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Deserialize JSON from bytes or str."""
+        return orjson.loads(data)
+
+else:
+
+    def dumps(obj: Any, indent: bool = False) -> bytes:
+        """Serialize obj to UTF-8 JSON bytes, optionally indented by 2 spaces."""
+        if indent:
+            return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode(
+            "utf-8"
+        )
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Deserialize JSON from bytes or str."""
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+
+def dumps_str(obj: Any) -> str:
+    """Serialize obj to a JSON string, e.g. for aiohttp's json_serialize."""
+    return dumps(obj).decode("utf-8")
+
+
+def load_file(path: Union[str, Path]) -> Any:
+    """
+    Read and parse a JSON file.
+
+    Args:
+        path: File path
+
+    Returns:
+        Any: Parsed document
+    """
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump_file(obj: Any, path: Union[str, Path], indent: bool = True) -> None:
+    """
+    Write obj to a JSON file.
+
+    Args:
+        obj: JSON-serializable document
+        path: File path
+        indent: Whether to indent the output by 2 spaces
+    """
+    with open(path, "wb") as f:
+        f.write(dumps(obj, indent=indent))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the fast JSON backend."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
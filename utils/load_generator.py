@@ -0,0 +1,488 @@
+"""
+Load generator simulating a population of DID WBA agents against a target server.
+
+Each simulated agent owns its own DID and runs the realistic client lifecycle:
+an initial DID WBA handshake, bearer token reuse for subsequent requests, and a
+fresh handshake once its token is considered expired or gets rejected.
+"""
+
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from agent_connect.authentication import generate_auth_header
+
+from core.config import settings
+from auth.did_auth import generate_or_load_did
+from utils import fast_json
+
+# Operations an agent can perform: name -> (HTTP method, path template)
+OPERATIONS: Dict[str, Tuple[str, str]] = {
+    "test": ("GET", "/wba/test"),
+    "ad": ("GET", "/ad.json"),
+    "verify": ("GET", "/auth/verify"),
+    "did": ("GET", "/wba/user/{user_id}/did.json"),
+}
+
+# Operations that do not carry credentials
+UNAUTHENTICATED_OPERATIONS = {"did"}
+
+# Operations that only accept bearer tokens, agents handshake on "test" first
+BEARER_ONLY_OPERATIONS = {"verify"}
+
+DEFAULT_METHOD_MIX = "test=7,ad=2,verify=1"
+
+
+def parse_method_mix(mix: str) -> Dict[str, float]:
+    """
+    Parse a method mix string like 'test=7,ad=2,verify=1' into weights.
+
+    Args:
+        mix: Comma-separated list of operation=weight pairs
+
+    Returns:
+        Dict[str, float]: Operation weights
+
+    Raises:
+        ValueError: If an operation is unknown or no positive weight is given
+    """
+    weights = {}
+    for item in mix.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(
+                f"Unknown operation '{name}', expected one of {sorted(OPERATIONS)}"
+            )
+        weights[name] = float(weight) if weight else 1.0
+
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError(f"Method mix '{mix}' has no positive weights")
+    return weights
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram with O(1) recording and bounded memory.
+
+    Buckets grow by 5% so percentiles are accurate to within a few percent.
+    """
+
+    BASE = 0.00005  # 50 microseconds
+    GROWTH = 1.05
+    BUCKETS = 320  # covers up to ~3 minutes
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._log_growth = math.log(self.GROWTH)
+
+    def record(self, seconds: float) -> None:
+        """Record one latency sample in seconds."""
+        if seconds <= self.BASE:
+            index = 0
+        else:
+            index = min(
+                int(math.log(seconds / self.BASE) / self._log_growth) + 1,
+                self.BUCKETS - 1,
+            )
+        self.counts[index] += 1
+        self.total += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> float:
+        """Return the approximate latency in seconds at the given percentile."""
+        if self.total == 0:
+            return 0.0
+        threshold = self.total * percent / 100.0
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                # The last bucket is unbounded, only the maximum is known
+                if index == self.BUCKETS - 1:
+                    return self.max
+                return min(self.BASE * self.GROWTH**index, self.max)
+        return self.max
+
+    def mean(self) -> float:
+        """Return the mean latency in seconds."""
+        return self.sum / self.total if self.total else 0.0
+
+
+class LoadStats:
+    """Aggregated load test statistics, kept both overall and per report window."""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.overall = LatencyHistogram()
+        self.window = LatencyHistogram()
+        self.window_started_at = self.started_at
+        self.requests = 0
+        self.successes = 0
+        self.handshakes = 0
+        self.token_reuses = 0
+        self.rehandshakes = 0
+        self.sessions_started = 0
+        self.sessions_active = 0
+        self.operations: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.window_errors: Counter = Counter()
+
+    def record(
+        self, operation: str, latency: float, error: Optional[str] = None
+    ) -> None:
+        """Record the outcome of one request."""
+        self.requests += 1
+        self.operations[operation] += 1
+        self.overall.record(latency)
+        self.window.record(latency)
+        if error:
+            self.errors[error] += 1
+            self.window_errors[error] += 1
+        else:
+            self.successes += 1
+
+    def reset_window(self) -> None:
+        """Start a new live report window."""
+        self.window = LatencyHistogram()
+        self.window_errors = Counter()
+        self.window_started_at = time.monotonic()
+
+
+def _format_latencies(histogram: LatencyHistogram) -> str:
+    """Format the usual latency percentiles in milliseconds."""
+    return ", ".join(
+        f"p{p}={histogram.percentile(p) * 1000:.1f}ms" for p in (50, 90, 99)
+    ) + f", max={histogram.max * 1000:.1f}ms"
+
+
+def _format_errors(errors: Counter) -> str:
+    """Format an error breakdown, most frequent first."""
+    if not errors:
+        return "none"
+    return ", ".join(f"{kind}={count}" for kind, count in errors.most_common())
+
+
+class SimulatedAgent:
+    """A single agent identity with its signing key and bearer token state."""
+
+    def __init__(self, unique_id: str, did_document: Dict, private_key_path: Path):
+        self.unique_id = unique_id
+        self.did_document = did_document
+        self.private_key_path = private_key_path
+        self._private_key: Optional[ec.EllipticCurvePrivateKey] = None
+        self.token: Optional[str] = None
+        self.token_acquired_at = 0.0
+
+    def _sign_callback(self, content: bytes, method_fragment: str) -> bytes:
+        """Sign content with the agent private key, loading it on first use."""
+        if self._private_key is None:
+            with open(self.private_key_path, "rb") as f:
+                self._private_key = serialization.load_pem_private_key(
+                    f.read(), password=None
+                )
+        return self._private_key.sign(content, ec.ECDSA(hashes.SHA256()))
+
+    def auth_header(self, domain: str) -> str:
+        """Build a fresh DID WBA authorization header for the given domain."""
+        return generate_auth_header(self.did_document, domain, self._sign_callback)
+
+    def token_valid(self, token_ttl: float) -> bool:
+        """Check whether the agent holds a token it still considers valid."""
+        return (
+            self.token is not None
+            and time.monotonic() - self.token_acquired_at < token_ttl
+        )
+
+
+class LoadGenerator:
+    """
+    Open-model load generator: agent sessions arrive as a Poisson process and
+    each session performs a sequence of requests chosen from the method mix.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        agent_count: int = 1000,
+        arrival_rate: float = 50.0,
+        duration: float = 60.0,
+        method_mix: str = DEFAULT_METHOD_MIX,
+        requests_per_session: int = 5,
+        think_time: float = 0.1,
+        token_ttl: Optional[float] = None,
+        concurrency: int = 1000,
+        report_interval: float = 5.0,
+        request_timeout: float = 30.0,
+        id_prefix: str = "load",
+        admin_key: Optional[str] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.domain = urlparse(self.base_url).hostname or "localhost"
+        self.agent_count = agent_count
+        self.arrival_rate = arrival_rate
+        self.duration = duration
+        self.method_mix = parse_method_mix(method_mix)
+        self.requests_per_session = requests_per_session
+        self.think_time = think_time
+        self.token_ttl = (
+            token_ttl
+            if token_ttl is not None
+            else settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        )
+        self.concurrency = concurrency
+        self.report_interval = report_interval
+        self.request_timeout = request_timeout
+        self.id_prefix = id_prefix
+        self.admin_key = admin_key or settings.ADMIN_API_KEY
+
+        self.stats = LoadStats()
+        self.agents: List[SimulatedAgent] = []
+        self._operation_names = list(self.method_mix)
+        self._operation_weights = [self.method_mix[n] for n in self._operation_names]
+
+    async def prepare_agents(self, session: aiohttp.ClientSession) -> None:
+        """
+        Generate or load the agent identities and register their DID documents
+        with the target server so it can resolve them. Registration requires
+        the server's admin API key (default: ADMIN_API_KEY).
+        """
+        logging.info(f"Preparing {self.agent_count} agent identities...")
+        started = time.monotonic()
+        for index in range(self.agent_count):
+            unique_id = f"{self.id_prefix}_{index}"
+            did_document, _, user_dir = await generate_or_load_did(unique_id)
+            self.agents.append(
+                SimulatedAgent(
+                    unique_id,
+                    did_document,
+                    Path(user_dir) / settings.PRIVATE_KEY_FILENAME,
+                )
+            )
+
+        # Self-hosted DID documents are trusted for authentication, so they
+        # are stored through the admin-keyed bulk endpoint
+        registration_errors = 0
+        batch_size = 200
+        batches = [
+            self.agents[i : i + batch_size]
+            for i in range(0, len(self.agents), batch_size)
+        ]
+        semaphore = asyncio.Semaphore(4)
+
+        async def register(batch: List[SimulatedAgent]) -> None:
+            nonlocal registration_errors
+            payload = {
+                "documents": [
+                    {"user_id": agent.unique_id, "did_document": agent.did_document}
+                    for agent in batch
+                ]
+            }
+            async with semaphore:
+                try:
+                    async with session.post(
+                        f"{self.base_url}/wba/user/_bulk",
+                        json=payload,
+                        headers={"X-Admin-Key": self.admin_key},
+                    ) as response:
+                        if response.status != 200:
+                            registration_errors += len(batch)
+                except aiohttp.ClientError:
+                    registration_errors += len(batch)
+
+        await asyncio.gather(*(register(batch) for batch in batches))
+        logging.info(
+            f"Prepared {len(self.agents)} agents in {time.monotonic() - started:.1f}s "
+            f"({registration_errors} DID registrations failed)"
+        )
+
+    async def _request(
+        self, session: aiohttp.ClientSession, agent: SimulatedAgent, operation: str
+    ) -> None:
+        """Perform one operation for an agent, handshaking when required."""
+        if operation in BEARER_ONLY_OPERATIONS and not agent.token_valid(
+            self.token_ttl
+        ):
+            await self._request(session, agent, "test")
+            if not agent.token_valid(self.token_ttl):
+                return
+
+        method, path = OPERATIONS[operation]
+        url = self.base_url + path.format(user_id=agent.unique_id)
+
+        headers = {}
+        handshake = False
+        if operation not in UNAUTHENTICATED_OPERATIONS:
+            if agent.token_valid(self.token_ttl):
+                headers["Authorization"] = f"Bearer {agent.token}"
+                self.stats.token_reuses += 1
+            else:
+                if agent.token is not None:
+                    self.stats.rehandshakes += 1
+                agent.token = None
+                headers["Authorization"] = agent.auth_header(self.domain)
+                handshake = True
+                self.stats.handshakes += 1
+
+        started = time.monotonic()
+        error = None
+        try:
+            async with session.request(method, url, headers=headers) as response:
+                await response.read()
+                if response.status != 200:
+                    error = f"http_{response.status}"
+                    if response.status == 401 and not handshake:
+                        # Token rejected, force a fresh handshake next time
+                        agent.token = None
+                elif handshake:
+                    auth_header = response.headers.get("Authorization", "")
+                    if auth_header.lower().startswith("bearer "):
+                        agent.token = auth_header[7:]
+                        agent.token_acquired_at = time.monotonic()
+                    else:
+                        error = "no_token"
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except aiohttp.ClientConnectionError:
+            error = "connection"
+        except aiohttp.ClientError as e:
+            error = type(e).__name__
+
+        self.stats.record(operation, time.monotonic() - started, error)
+
+    async def _session(
+        self, session: aiohttp.ClientSession, agent: SimulatedAgent
+    ) -> None:
+        """Run one agent session consisting of several requests."""
+        self.stats.sessions_started += 1
+        self.stats.sessions_active += 1
+        try:
+            operations = random.choices(
+                self._operation_names,
+                weights=self._operation_weights,
+                k=self.requests_per_session,
+            )
+            for index, operation in enumerate(operations):
+                if index and self.think_time > 0:
+                    await asyncio.sleep(random.expovariate(1.0 / self.think_time))
+                await self._request(session, agent, operation)
+        except Exception as e:
+            logging.error(f"Unexpected error in agent session: {e}")
+            self.stats.errors[type(e).__name__] += 1
+        finally:
+            self.stats.sessions_active -= 1
+
+    async def _reporter(self) -> None:
+        """Log live throughput, latency and errors for each report window."""
+        while True:
+            await asyncio.sleep(self.report_interval)
+            stats = self.stats
+            window_seconds = time.monotonic() - stats.window_started_at
+            logging.info(
+                f"[load {time.monotonic() - stats.started_at:6.1f}s] "
+                f"{stats.window.total / window_seconds:8.1f} req/s, "
+                f"active sessions={stats.sessions_active}, "
+                f"{_format_latencies(stats.window)}, "
+                f"errors: {_format_errors(stats.window_errors)}"
+            )
+            stats.reset_window()
+
+    def summary(self) -> str:
+        """Build the final load test report."""
+        stats = self.stats
+        elapsed = time.monotonic() - stats.started_at
+        lines = [
+            "Load test summary",
+            f"  target:            {self.base_url}",
+            f"  duration:          {elapsed:.1f}s",
+            f"  agents:            {len(self.agents)}",
+            f"  sessions:          {stats.sessions_started}",
+            f"  requests:          {stats.requests} "
+            f"({stats.requests / elapsed if elapsed else 0:.1f} req/s)",
+            f"  successes:         {stats.successes}",
+            f"  handshakes:        {stats.handshakes} "
+            f"(re-handshakes: {stats.rehandshakes})",
+            f"  token reuses:      {stats.token_reuses}",
+            f"  latency:           mean={stats.overall.mean() * 1000:.1f}ms, "
+            f"{_format_latencies(stats.overall)}",
+            f"  operations:        "
+            + ", ".join(f"{k}={v}" for k, v in sorted(stats.operations.items())),
+            f"  errors:            {_format_errors(stats.errors)}",
+        ]
+        return "\n".join(lines)
+
+    async def run(self) -> LoadStats:
+        """
+        Run the load test until the configured duration elapses and all
+        in-flight sessions complete.
+
+        Returns:
+            LoadStats: Collected statistics
+        """
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(
+            timeout=timeout,
+            connector=connector,
+            json_serialize=fast_json.dumps_str,
+        ) as session:
+            await self.prepare_agents(session)
+            if not self.agents:
+                logging.error("No agents available, aborting load test")
+                return self.stats
+
+            logging.info(
+                f"Starting load: {self.arrival_rate} sessions/s for {self.duration}s "
+                f"against {self.base_url}, mix={self.method_mix}"
+            )
+            self.stats = LoadStats()
+            reporter = asyncio.create_task(self._reporter())
+            sessions = set()
+            deadline = time.monotonic() + self.duration
+            try:
+                while time.monotonic() < deadline:
+                    agent = random.choice(self.agents)
+                    task = asyncio.create_task(self._session(session, agent))
+                    sessions.add(task)
+                    task.add_done_callback(sessions.discard)
+                    await asyncio.sleep(random.expovariate(self.arrival_rate))
+
+                if sessions:
+                    logging.info(f"Waiting for {len(sessions)} sessions to finish...")
+                    await asyncio.gather(*sessions, return_exceptions=True)
+            finally:
+                reporter.cancel()
+
+        logging.info("\n" + self.summary())
+        return self.stats
+
+
+async def run_load_test(**kwargs) -> LoadStats:
+    """
+    Run a load test against a target server.
+
+    Args:
+        **kwargs: LoadGenerator constructor arguments
+
+    Returns:
+        LoadStats: Collected statistics
+    """
+    generator = LoadGenerator(**kwargs)
+    return await generator.run()
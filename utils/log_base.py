@@ -1,8 +1,21 @@
+import atexit
 import logging
 import logging.handlers
 import os
+import queue
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional, Union
+
+from utils import fast_json
+
+# Format shared by the console and file handlers
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s"
+
+# Active queue pipeline, see setup_logging
+_queue_handler: Optional["DroppingQueueHandler"] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_size = 10000
 
 
 class ColoredFormatter(logging.Formatter):
@@ -22,34 +35,255 @@ class ColoredFormatter(logging.Formatter):
         return color + message + self.COLORS["RESET"]
 
 
-def setup_logging(level=logging.INFO):
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": f"{record.filename}:{record.lineno}",
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return fast_json.dumps(entry).decode("utf-8")
+
+
+class SubsystemLevelFilter(logging.Filter):
+    """
+    Apply per-subsystem minimum levels.
+
+    A subsystem is either a logger name prefix (e.g. "uvicorn.access") or, for
+    the many modules that log through the root logger, the package directory
+    the record comes from (e.g. "auth" or "agent_connect").
+    """
+
+    def __init__(self, levels: Dict[str, int]):
+        super().__init__()
+        self.levels = levels
+        self._path_levels: Dict[str, Optional[int]] = {}
+
+    def _level_for_path(self, pathname: str) -> Optional[int]:
+        """Find the configured level of the package a source file belongs to."""
+        level = self._path_levels.get(pathname, -1)
+        if level != -1:
+            return level
+
+        level = None
+        parts = os.path.normpath(pathname).split(os.sep)
+        # The innermost matching directory wins
+        for part in reversed(parts[:-1]):
+            if part in self.levels:
+                level = self.levels[part]
+                break
+        self._path_levels[pathname] = level
+        return level
+
+    def filter(self, record):
+        if record.name != "root":
+            name = record.name
+            while name:
+                level = self.levels.get(name)
+                if level is not None:
+                    return record.levelno >= level
+                name = name.rpartition(".")[0]
+            return True
+
+        level = self._level_for_path(record.pathname)
+        return level is None or record.levelno >= level
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler feeding a bounded queue that never blocks the caller.
+
+    When the queue is full the new record is dropped ("newest" policy) or the
+    oldest queued record is discarded to make room ("oldest" policy). The number
+    of dropped records is reported once the queue has room again.
+    """
+
+    def __init__(self, log_queue: queue.Queue, drop_policy: str = "newest"):
+        super().__init__(log_queue)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self._unreported_drops = 0
+
+    def prepare(self, record):
+        # Only merge the message arguments here; formatting happens in the
+        # listener thread, off the request path
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._unreported_drops:
+            self._report_drops(record)
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.drop_policy == "oldest":
+                try:
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+            self.dropped += 1
+            self._unreported_drops += 1
+
+    def _report_drops(self, record):
+        """Queue a warning about dropped records if there is room for it."""
+        if self.queue.qsize() >= (self.queue.maxsize or sys.maxsize) // 2:
+            return
+        warning = logging.makeLogRecord(
+            {
+                "name": "utils.log_base",
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Log queue full, dropped {self._unreported_drops} records",
+                "pathname": __file__,
+                "filename": os.path.basename(__file__),
+                "lineno": 0,
+                "created": record.created,
+            }
+        )
+        try:
+            self.queue.put_nowait(warning)
+            self._unreported_drops = 0
+        except queue.Full:
+            pass
+
+
+def _parse_level(level: Union[int, str]) -> int:
+    """Convert a level name or number to a logging level number."""
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(level.strip().upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level: {level}")
+    return value
+
+
+def parse_subsystem_levels(levels: str) -> Dict[str, int]:
+    """
+    Parse per-subsystem levels like 'agent_connect=WARNING,uvicorn.access=ERROR'.
+
+    Args:
+        levels: Comma-separated subsystem=level pairs
+
+    Returns:
+        Dict[str, int]: Logging level by subsystem
+    """
+    result = {}
+    for item in levels.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            result[name.strip()] = _parse_level(level)
+    return result
+
+
+def _get_log_dir(project_name: str, log_dir: Optional[str]) -> str:
+    """Pick a writable log directory without spawning a shell."""
+    project_logs = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs"
+    )
+    candidates = []
+    if log_dir:
+        candidates.append(log_dir)
+    elif sys.platform != "darwin":
+        candidates.append(f"/var/log/{project_name}")
+    candidates.append(project_logs)
+
+    for candidate in candidates:
+        try:
+            os.makedirs(candidate, exist_ok=True)
+            if os.access(candidate, os.W_OK):
+                return candidate
+        except OSError as e:
+            print(f"Cannot use log directory {candidate}: {e}")
+    return project_logs
+
+
+def _start_listener(handlers) -> None:
+    """Create the bounded queue and start the listener thread writing to handlers."""
+    global _listener
+    log_queue = queue.Queue(maxsize=_queue_size)
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def _restart_listener_after_fork() -> None:
+    """Threads do not survive fork, so forked workers start their own listener."""
+    if _queue_handler is not None and _listener is not None:
+        _start_listener(_listener.handlers)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_dropped_log_records() -> int:
+    """Return how many log records were dropped because the queue was full."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def setup_logging(
+    level=logging.INFO,
+    log_format: Optional[str] = None,
+    subsystem_levels: Optional[Union[str, Dict[str, int]]] = None,
+    queue_size: Optional[int] = None,
+    drop_policy: Optional[str] = None,
+    log_dir: Optional[str] = None,
+):
+    """
+    Configure logging through a non-blocking queue pipeline.
+
+    Application threads only put records on a bounded queue; a listener thread
+    formats them and writes to the console and a rotating log file.
+
+    Args:
+        level: Root log level
+        log_format: "text" or "json" (default: LOG_FORMAT setting)
+        subsystem_levels: Per-subsystem levels (default: LOG_LEVELS setting)
+        queue_size: Maximum queued records (default: LOG_QUEUE_SIZE setting)
+        drop_policy: "newest" or "oldest" (default: LOG_DROP_POLICY setting)
+        log_dir: Log directory (default: LOG_DIR setting)
+
+    Returns:
+        logging.Logger: The root logger
+    """
+    global _queue_handler, _queue_size
+    from core.config import settings
+
+    log_format = log_format or settings.LOG_FORMAT
+    if subsystem_levels is None:
+        subsystem_levels = settings.LOG_LEVELS
+    if isinstance(subsystem_levels, str):
+        subsystem_levels = parse_subsystem_levels(subsystem_levels)
+    _queue_size = queue_size or settings.LOG_QUEUE_SIZE
+    drop_policy = drop_policy or settings.LOG_DROP_POLICY
+
     # Get project name
     project_name = os.path.basename(
         os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     ).replace("-", "_")
 
-    # Create log directory
-    if sys.platform == "darwin":  # Mac system
-        log_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs"
-        )
-    else:
-        log_dir = f"/var/log/{project_name}"
-    try:
-        # If directory doesn't exist, create it and set permissions
-        if not os.path.exists(log_dir):
-            os.system("sudo mkdir -p " + log_dir)
-            os.system(
-                f"sudo chown -R {os.getenv('USER')}:{os.getenv('USER')} " + log_dir
-            )
-        os.makedirs(log_dir, exist_ok=True)
-    except Exception as e:
-        print(f"Error setting up log directory: {e}")
-        # If failed, use backup log directory
-        log_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs"
-        )
-        os.makedirs(log_dir, exist_ok=True)
+    log_dir = _get_log_dir(project_name, log_dir or settings.LOG_DIR)
 
     # Generate log filename (including date)
     log_file = os.path.join(
@@ -58,6 +292,9 @@ def setup_logging(level=logging.INFO):
 
     print("Log file: ", log_file)
 
+    # Stop a previously configured pipeline
+    stop_logging()
+
     # Get root logger
     logger = logging.getLogger()
     logger.setLevel(level)
@@ -65,28 +302,39 @@ def setup_logging(level=logging.INFO):
     # Clear existing handlers
     logger.handlers.clear()
 
-    # Configure colored console handler
+    # Named loggers below their subsystem level never create records
+    for name, subsystem_level in subsystem_levels.items():
+        logging.getLogger(name).setLevel(subsystem_level)
+
+    # Configure console handler (colored for text output)
     console_handler = logging.StreamHandler()
     console_handler.setLevel(level)
-    colored_formatter = ColoredFormatter(
-        "%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s\n"
-    )
-    console_handler.setFormatter(colored_formatter)
-    logger.addHandler(console_handler)
+    if log_format == "json":
+        console_handler.setFormatter(JsonFormatter())
+    else:
+        console_handler.setFormatter(ColoredFormatter(LOG_FORMAT + "\n"))
 
     # Configure file handler with the same format (but without colors)
-    file_formatter = logging.Formatter(
-        "%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s"
-    )
     file_handler = logging.handlers.RotatingFileHandler(
         log_file,
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=30,
         encoding="utf-8",
     )
-    file_handler.setFormatter(file_formatter)
+    if log_format == "json":
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
     file_handler.setLevel(level)
-    logger.addHandler(file_handler)
+
+    # Application threads only enqueue, the listener thread does the I/O.
+    # The bounded queue is attached by _start_listener.
+    _queue_handler = DroppingQueueHandler(None, drop_policy)
+    _queue_handler.setLevel(level)
+    if subsystem_levels:
+        _queue_handler.addFilter(SubsystemLevelFilter(subsystem_levels))
+    logger.addHandler(_queue_handler)
+    _start_listener((console_handler, file_handler))
 
     # Prevent log messages from propagating to the root logger
     logger.propagate = False
@@ -94,6 +342,11 @@ def setup_logging(level=logging.INFO):
     return logger
 
 
+atexit.register(stop_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
 # To maintain backward compatibility, keep set_log_color_level function, but make it call setup_logging
 def set_log_color_level(level):
     return setup_logging(level)
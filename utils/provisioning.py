@@ -0,0 +1,212 @@
+"""
+Bulk provisioning of DID identities for load tests and large deployments.
+
+Identities are minted in parallel by a process pool, in batches. Each identity
+is written with its private keys first and its DID document last (atomically),
+so an existing DID document marks a completed identity: an interrupted run can
+simply be started again and only mints what is missing.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from auth.did_auth import create_did_identity, save_did_identity
+from core.config import settings
+from core.did_store import DIDDocumentStore, validate_user_id
+from utils import fast_json
+
+
+def _mint_batch(base_path: str, unique_ids: List[str]) -> List[Tuple[str, Dict]]:
+    """
+    Create and save a batch of identities (runs in a worker process).
+
+    Args:
+        base_path: DID documents directory
+        unique_ids: User IDs to mint
+
+    Returns:
+        List[Tuple[str, Dict]]: (user_id, did_document) pairs
+    """
+    store = DIDDocumentStore(base_path)
+    minted = []
+    for unique_id in unique_ids:
+        did_document, keys = create_did_identity(unique_id)
+        save_did_identity(store.user_dir(unique_id), did_document, keys)
+        minted.append((unique_id, did_document))
+    return minted
+
+
+def _load_batch(store: DIDDocumentStore, unique_ids: List[str]) -> List[Tuple[str, Dict]]:
+    """Load already provisioned DID documents (blocking)."""
+    return [(unique_id, store.load(unique_id)) for unique_id in unique_ids]
+
+
+def _split(items: List[str], size: int) -> List[List[str]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+class BulkProvisioner:
+    """
+    Mints DID identities {prefix}_{start} .. {prefix}_{start + count - 1} and
+    optionally registers their DID documents with a server in bulk.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        prefix: str = "agent",
+        start: int = 0,
+        workers: Optional[int] = None,
+        batch_size: int = 200,
+        register_url: Optional[str] = None,
+        store: Optional[DIDDocumentStore] = None,
+        admin_key: Optional[str] = None,
+    ):
+        """
+        Args:
+            count: Number of identities
+            prefix: User ID prefix
+            start: Index of the first identity
+            workers: Worker processes (default: CPU count)
+            batch_size: Identities per minting batch and per registration request
+            register_url: Server base URL to register DID documents with, or None
+            store: Local identity store (default: DID_DOCUMENTS_PATH)
+            admin_key: Admin API key of the server (default: ADMIN_API_KEY)
+        """
+        self.unique_ids = [f"{prefix}_{i}" for i in range(start, start + count)]
+        # All IDs share the prefix, checking one rejects an unsafe prefix early
+        if self.unique_ids:
+            validate_user_id(self.unique_ids[-1])
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.register_url = register_url.rstrip("/") if register_url else None
+        self.store = store or DIDDocumentStore()
+        self.admin_key = admin_key or settings.ADMIN_API_KEY
+
+        self.minted = 0
+        self.skipped = 0
+        self.registered = 0
+        self.registration_errors = 0
+
+    async def _register(
+        self, session: aiohttp.ClientSession, documents: List[Tuple[str, Dict]]
+    ) -> None:
+        """Register a batch of DID documents with the server."""
+        payload = {
+            "documents": [
+                {"user_id": unique_id, "did_document": did_document}
+                for unique_id, did_document in documents
+            ]
+        }
+        try:
+            async with session.post(
+                f"{self.register_url}/wba/user/_bulk",
+                json=payload,
+                headers={"X-Admin-Key": self.admin_key},
+            ) as response:
+                if response.status == 200:
+                    self.registered += len(documents)
+                    return
+                logging.error(
+                    f"Bulk registration failed with status {response.status}: "
+                    f"{await response.text()}"
+                )
+        except aiohttp.ClientError as e:
+            logging.error(f"Bulk registration failed: {e}")
+        self.registration_errors += len(documents)
+
+    async def run(self) -> Dict:
+        """
+        Provision the identities.
+
+        Returns:
+            Dict: Counts, elapsed time and identities per second
+        """
+        started = time.monotonic()
+        pending, existing = [], []
+        for unique_id in self.unique_ids:
+            if self.store.document_path(unique_id).exists():
+                existing.append(unique_id)
+            else:
+                pending.append(unique_id)
+        self.skipped = len(existing)
+        logging.info(
+            f"Provisioning {len(pending)} identities with {self.workers} workers "
+            f"({self.skipped} already provisioned)"
+        )
+
+        loop = asyncio.get_running_loop()
+        session = None
+        if self.register_url:
+            session = aiohttp.ClientSession(json_serialize=fast_json.dumps_str)
+        registrations = []
+
+        try:
+            # Identities from an earlier run are registered again, registration is idempotent
+            if session is not None:
+                for batch in _split(existing, self.batch_size):
+                    documents = await asyncio.to_thread(_load_batch, self.store, batch)
+                    registrations.append(
+                        asyncio.create_task(self._register(session, documents))
+                    )
+
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = [
+                    loop.run_in_executor(
+                        executor, _mint_batch, str(self.store.base_path), batch
+                    )
+                    for batch in _split(pending, self.batch_size)
+                ]
+                for future in asyncio.as_completed(futures):
+                    documents = await future
+                    self.minted += len(documents)
+                    elapsed = time.monotonic() - started
+                    logging.info(
+                        f"Minted {self.minted}/{len(pending)} identities "
+                        f"({self.minted / elapsed:.0f}/s)"
+                    )
+                    if session is not None:
+                        registrations.append(
+                            asyncio.create_task(self._register(session, documents))
+                        )
+
+            await asyncio.gather(*registrations)
+        finally:
+            if session is not None:
+                await session.close()
+
+        elapsed = time.monotonic() - started
+        result = {
+            "minted": self.minted,
+            "skipped": self.skipped,
+            "registered": self.registered,
+            "registration_errors": self.registration_errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "identities_per_second": round(self.minted / elapsed, 1) if elapsed else 0.0,
+        }
+        logging.info(
+            f"Provisioned {self.minted} identities in {elapsed:.1f}s "
+            f"({result['identities_per_second']}/s), {self.skipped} skipped, "
+            f"{self.registered} registered, {self.registration_errors} registration errors"
+        )
+        return result
+
+
+async def run_provisioning(**kwargs) -> Dict:
+    """
+    Provision identities in bulk.
+
+    Args:
+        **kwargs: BulkProvisioner constructor arguments
+
+    Returns:
+        Dict: Provisioning result
+    """
+    provisioner = BulkProvisioner(**kwargs)
+    return await provisioner.run()